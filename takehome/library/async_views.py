@@ -0,0 +1,178 @@
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, PermissionDenied
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from .authentication import BearerTokenAuthentication
+from .pagination import KeysetPagination
+from .roles import aget_role
+from .serializers import AuthorSerializer, BookSerializer, CheckoutsSerializer, GenreSerializer
+from .timing import phase
+from .views import AuthorViewSet, BookViewSet, CheckoutsViewSet, GenreViewSet
+
+
+class AsyncReadView(View):
+    """
+    A read only list and detail endpoint that runs on the event loop under
+    ASGI, where a DRF view is handed to a worker thread for the whole request.
+
+    It authenticates, checks permissions, filters, paginates and serializes
+    the same way the viewset it mirrors does, but everything that touches
+    the database is awaited through the async ORM. Serializing happens on
+    the event loop, so the queryset has to load every relation it needs up
+    front; a lazy query raises `SynchronousOnlyOperation` instead of
+    quietly blocking.
+
+    Bearer tokens and sessions are accepted, basic auth isn't as it's only
+    meant for fetching a token. Responses aren't conditional or cached.
+    """
+    http_method_names = ['get', 'head', 'options']
+    queryset = None
+    serializer_class = None
+    permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    filter_backends = ()
+    ordering_fields = None
+
+    async def get(self, request, pk=None):
+        self.request = Request(request)
+        self.action = 'list' if pk is None else 'retrieve'
+        try:
+            with phase('auth'):
+                self.request.user, self.request.auth = await self.authenticate(request)
+            with phase('permissions'):
+                self.role = await aget_role(self.request)
+                self.check_permissions(self.request)
+            with phase('view'):
+                if pk is None:
+                    data = await self.list(self.request)
+                else:
+                    data = await self.retrieve(self.request, pk)
+        except Exception as exc:
+            return self.handle_exception(exc)
+        with phase('render'):
+            return self.render(data)
+
+    async def authenticate(self, request):
+        auth = await BearerTokenAuthentication().aauthenticate(request)
+        if auth is not None:
+            return auth
+        user = await request.auser()
+        if not user.is_active:
+            return AnonymousUser(), None
+        return user, None
+
+    def check_permissions(self, request):
+        for permission in self.permission_classes:
+            if not permission().has_permission(request, self):
+                if not request.user.is_authenticated:
+                    raise NotAuthenticated()
+                raise PermissionDenied()
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+    def filter_queryset(self, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.request, queryset, self)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        context = {'request': self.request, 'view': self, 'role': self.role}
+        return self.serializer_class(*args, context=context, **kwargs)
+
+    async def list(self, request):
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(
+            self.filter_queryset(self.get_queryset()), request, view=self)
+        with phase('serialize'):
+            data = self.get_serializer(page, many=True).data
+        return paginator.get_paginated_response(data).data
+
+    async def retrieve(self, request, pk):
+        try:
+            instance = await self.filter_queryset(self.get_queryset()).aget(pk=pk)
+        except self.queryset.model.DoesNotExist:
+            raise Http404
+        with phase('serialize'):
+            return self.get_serializer(instance).data
+
+    def handle_exception(self, exc):
+        response = exception_handler(exc, {'view': self, 'request': self.request})
+        if response is None:
+            raise exc
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            response['WWW-Authenticate'] = BearerTokenAuthentication().authenticate_header(self.request)
+        headers = {name: value for name, value in response.items() if name != 'Content-Type'}
+        return self.render(response.data, response.status_code, headers)
+
+    def render(self, data, status=200, headers=None):
+        return HttpResponse(
+            JSONRenderer().render(data),
+            status=status,
+            headers=headers,
+            content_type='application/json'
+        )
+
+
+class AsyncBookView(AsyncReadView):
+
+    queryset = BookViewSet.queryset
+    serializer_class = BookSerializer
+    permission_classes = BookViewSet.permission_classes
+    pagination_class = BookViewSet.pagination_class
+    filter_backends = BookViewSet.filter_backends
+    ordering_fields = BookViewSet.ordering_fields
+
+
+class AsyncAuthorView(AsyncReadView):
+
+    queryset = AuthorViewSet.queryset
+    serializer_class = AuthorSerializer
+    permission_classes = AuthorViewSet.permission_classes
+    pagination_class = AuthorViewSet.pagination_class
+    filter_backends = AuthorViewSet.filter_backends
+    ordering_fields = AuthorViewSet.ordering_fields
+
+
+class AsyncGenreView(AsyncReadView):
+
+    queryset = GenreViewSet.queryset
+    serializer_class = GenreSerializer
+    permission_classes = GenreViewSet.permission_classes
+
+
+class AsyncCheckoutsView(AsyncReadView):
+    """
+    The user's own checked out books, like `CheckoutsViewSet.list`
+    """
+
+    queryset = CheckoutsViewSet.queryset
+    serializer_class = CheckoutsSerializer
+    permission_classes = CheckoutsViewSet.permission_classes
+    pagination_class = CheckoutsViewSet.pagination_class
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user)
+
+    async def list(self, request):
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(self.get_queryset(), request, view=self)
+        entries = [
+            dict(
+                book_id=leger.book.id,
+                book_title=leger.book.title,
+                due_date=leger.due_date,
+                user=dict(
+                    id=leger.user.id,
+                    first_name=leger.user.first_name,
+                    last_name=leger.user.last_name
+                )
+            ) for leger in page]
+        with phase('serialize'):
+            data = self.get_serializer(entries, many=True).data
+        return paginator.get_paginated_response(data).data
@@ -0,0 +1,149 @@
+import copy
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework import authentication, exceptions
+
+from .models import AccessToken
+
+
+def generate_key():
+    return secrets.token_urlsafe(32)
+
+
+def hash_key(key):
+    """
+    Keys are long and random, so a single fast hash is enough to keep them
+    out of the database; there's nothing for a slow password hash to protect
+    """
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class TokenCache:
+    """
+    A bounded, thread safe LRU of verified token digests and their users.
+
+    Entries expire after `ttl` seconds so a token revoked in another
+    process stops working here within that window; revocations in this
+    process evict immediately.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return user
+
+    def set(self, digest, user):
+        with self._lock:
+            self._entries[digest] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def evict_user(self, user_id):
+        with self._lock:
+            for digest in [d for d, (user, _) in self._entries.items() if user.pk == user_id]:
+                del self._entries[digest]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'ACCESS_TOKEN_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'ACCESS_TOKEN_CACHE_TTL', 60)
+)
+
+
+class BearerTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Authenticate with an `Authorization: Bearer <key>` header.
+
+    A verified key costs a hash and a dictionary lookup; only keys missing
+    from the cache touch the database.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        digest = self.get_digest(request)
+        if digest is None:
+            return None
+        user = token_cache.get(digest)
+        if user is None:
+            user = self.load_user(digest)
+            token_cache.set(digest, user)
+        # Hand each request its own copy so per-request state set on the
+        # user never leaks into the cached instance
+        return (copy.copy(user), digest)
+
+    async def aauthenticate(self, request):
+        """
+        `authenticate` for async views, only a cache miss awaits the database
+        """
+        digest = self.get_digest(request)
+        if digest is None:
+            return None
+        user = token_cache.get(digest)
+        if user is None:
+            user = await self.aload_user(digest)
+            token_cache.set(digest, user)
+        return (copy.copy(user), digest)
+
+    def get_digest(self, request):
+        """
+        The digest of the key in the request's bearer header, None when it
+        doesn't have one
+        """
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid bearer header.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid bearer header.')
+        return hash_key(key)
+
+    def load_user(self, digest):
+        return self.check_token(
+            AccessToken.objects.select_related('user').filter(digest=digest).first())
+
+    async def aload_user(self, digest):
+        return self.check_token(
+            await AccessToken.objects.select_related('user').filter(digest=digest).afirst())
+
+    def check_token(self, token):
+        if token is None:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return token.user
+
+    def authenticate_header(self, request):
+        return f'{self.keyword} realm="api"'
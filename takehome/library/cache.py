@@ -0,0 +1,178 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+'''
+How a cached value was come by
+'''
+HIT = 'HIT'
+MISS = 'MISS'
+COALESCED = 'COALESCED'
+STALE = 'STALE'
+
+'''
+Keys of the counters for each outcome, shared by every process using the cache
+'''
+STATS = {
+    'hits': 'library:stats:hits',
+    'misses': 'library:stats:misses',
+    'coalesced': 'library:stats:coalesced',
+    'stale': 'library:stats:stale',
+}
+
+OUTCOME_STATS = {
+    HIT: 'hits',
+    MISS: 'misses',
+    COALESCED: 'coalesced',
+    STALE: 'stale',
+}
+
+
+def get_cache():
+    return caches[getattr(settings, 'LIBRARY_CACHE', 'default')]
+
+
+def response_key(etag):
+    """
+    A response's ETag already tells apart the URL, the role that sees it and
+    the version of every table it's built from, so it doubles as the key
+    """
+    return 'library:response:' + etag.strip('"')
+
+
+def stale_key(request_key):
+    """
+    The last response built for a URL and role, whatever the versions
+    """
+    return 'library:stale:' + request_key
+
+
+def count(stat):
+    cache = get_cache()
+    try:
+        cache.incr(STATS[stat])
+    except ValueError:
+        # `incr` needs the key to exist, and `add` loses to a concurrent
+        # first count, in which case that one made it exist
+        if not cache.add(STATS[stat], 1):
+            cache.incr(STATS[stat])
+
+
+def get_stats():
+    values = get_cache().get_many(STATS.values())
+    return {stat: values.get(key, 0) for stat, key in STATS.items()}
+
+
+def reset_stats():
+    get_cache().delete_many(STATS.values())
+
+
+class Flight:
+    """
+    A value being built by one thread, that others in the process wait on
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class SingleFlight:
+    """
+    Build a missing cache entry once, however many workers miss it at once.
+
+    In a process, the first thread to miss a key builds it and the others
+    wait for it. Between processes, the building thread first takes a lease
+    on the key with `cache.add`, and a process that can't get the lease
+    waits on the cache instead. Only caches with an atomic `add` (not the
+    file based one) keep two processes from both getting the lease.
+
+    Anyone waiting gets the last value built under the key's `stale` key
+    right away if there is one, and otherwise waits up to `wait` seconds for
+    the new value before giving up and building it too.
+    """
+
+    def __init__(self, wait=None, lease=None, poll=0.05):
+        self.wait = wait if wait is not None else getattr(settings, 'LIBRARY_CACHE_WAIT', 2)
+        self.lease = lease if lease is not None else getattr(settings, 'LIBRARY_CACHE_LEASE', 10)
+        self.poll = poll
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, build, stale=None):
+        """
+        Get the value of `key`, calling `build()` to make it if it's missing.
+        `build()` returns None for a value that shouldn't be cached. Returns
+        the value and how it was come by, which is also counted.
+        """
+        value = get_cache().get(key)
+        if value is not None:
+            return self.outcome(HIT, value)
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leading = flight is None
+            if leading:
+                flight = self._flights[key] = Flight()
+        if not leading:
+            return self.follow(key, build, stale, flight)
+
+        try:
+            outcome, flight.value = self.lead(key, build, stale)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return outcome, flight.value
+
+    def lead(self, key, build, stale):
+        cache = get_cache()
+        lease_key = f'{key}:lease'
+        if not cache.add(lease_key, True, self.lease):
+            return self.follow(key, build, stale)
+        try:
+            return self.build(key, build, stale)
+        finally:
+            cache.delete(lease_key)
+
+    def follow(self, key, build, stale, flight=None):
+        """
+        Wait for a value someone else is building, for the thread building it
+        in this process when there's a `flight` and for the cache otherwise
+        """
+        cache = get_cache()
+        value = cache.get(stale) if stale else None
+        if value is not None:
+            return self.outcome(STALE, value)
+
+        if flight is not None:
+            flight.done.wait(self.wait)
+            value = flight.value
+        else:
+            deadline = time.monotonic() + self.wait
+            while value is None and time.monotonic() < deadline:
+                time.sleep(self.poll)
+                value = cache.get(key)
+        if value is not None:
+            return self.outcome(COALESCED, value)
+        return self.build(key, build, stale)
+
+    def build(self, key, build, stale):
+        # Counted up front, a build that raises still went to the database
+        count(OUTCOME_STATS[MISS])
+        value = build()
+        if value is not None:
+            cache = get_cache()
+            cache.set(key, value, getattr(settings, 'LIBRARY_CACHE_TIMEOUT', 300))
+            if stale:
+                cache.set(stale, value, getattr(settings, 'LIBRARY_STALE_TIMEOUT', 3600))
+        return MISS, value
+
+    def outcome(self, outcome, value):
+        count(OUTCOME_STATS[outcome])
+        return outcome, value
+
+
+response_flight = SingleFlight()
@@ -0,0 +1,124 @@
+import csv
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Author, Book, CheckoutLeger, Genre
+
+FORMATS = ('ndjson', 'csv')
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def keyset_chunks(queryset, chunk_size):
+    """
+    Walk a `values()` queryset in primary key order one chunk at a time, so
+    only a single chunk is ever held in memory and every chunk is a range
+    scan no matter how far into the table it is
+    """
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]['id']
+
+
+def book_rows(chunk_size):
+    books = Book.objects.values('id', 'title', 'publish_year', 'genre_id', 'genre__name')
+    for chunk in keyset_chunks(books, chunk_size):
+        authors = defaultdict(list)
+        links = Book.authors.through.objects.filter(
+            book_id__in=[book['id'] for book in chunk]
+        ).order_by('id').values_list('book_id', 'author_id', 'author__first_name', 'author__last_name')
+        for book_id, author_id, first_name, last_name in links:
+            authors[book_id].append((author_id, f'{first_name} {last_name}'))
+        for book in chunk:
+            yield dict(
+                id=book['id'],
+                title=book['title'],
+                publish_year=book['publish_year'],
+                genre_id=book['genre_id'],
+                genre=book['genre__name'],
+                author_ids=[author_id for author_id, _ in authors[book['id']]],
+                authors=[name for _, name in authors[book['id']]]
+            )
+
+
+def author_rows(chunk_size):
+    authors = Author.objects.values('id', 'first_name', 'last_name')
+    for chunk in keyset_chunks(authors, chunk_size):
+        books = defaultdict(list)
+        links = Book.authors.through.objects.filter(
+            author_id__in=[author['id'] for author in chunk]
+        ).order_by('id').values_list('author_id', 'book_id')
+        for author_id, book_id in links:
+            books[author_id].append(book_id)
+        for author in chunk:
+            yield dict(author, book_ids=books[author['id']])
+
+
+def genre_rows(chunk_size):
+    for chunk in keyset_chunks(Genre.objects.values('id', 'name'), chunk_size):
+        yield from chunk
+
+
+def checkout_rows(chunk_size):
+    entries = CheckoutLeger.objects.values(
+        'id', 'book_id', 'user_id', 'checkout_time', 'return_time', 'due_date')
+    for chunk in keyset_chunks(entries, chunk_size):
+        yield from chunk
+
+
+'''
+Every exportable resource with its columns, in the order they're written
+'''
+RESOURCES = {
+    'books': (book_rows, ('id', 'title', 'publish_year', 'genre_id', 'genre', 'author_ids', 'authors')),
+    'authors': (author_rows, ('id', 'first_name', 'last_name', 'book_ids')),
+    'genres': (genre_rows, ('id', 'name')),
+    'checkouts': (checkout_rows, ('id', 'book_id', 'user_id', 'checkout_time', 'return_time', 'due_date')),
+}
+
+
+class Echo:
+    """
+    A file-like object for `csv.writer` that hands back each line instead
+    of storing it
+    """
+
+    def write(self, value):
+        return value
+
+
+def to_ndjson(rows, columns):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def to_csv(rows, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([
+            '|'.join(str(item) for item in value) if isinstance(value, list) else value
+            for value in (row[column] for column in columns)
+        ])
+
+
+def export(resource, fmt, chunk_size=2000):
+    """
+    Generate the lines of a whole table in the given format. Each chunk is
+    a query of its own and no transaction is held in between, so a slow
+    client never holds up writers. That makes the export a walk over the
+    table rather than a snapshot: rows written while it runs are in it if
+    the walk hasn't passed them yet.
+    """
+    rows, columns = RESOURCES[resource]
+    render = to_ndjson if fmt == 'ndjson' else to_csv
+    yield from render(rows(chunk_size), columns)
@@ -0,0 +1,80 @@
+import hashlib
+
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.relations import PKOnlyObject
+
+from .cache import get_cache
+
+
+def fragment_key(instance, *versions):
+    """
+    A key for an object's representation that changes whenever the object
+    or anything else the representation is built from changes, e.g.
+    `fragment_key(book, book.updated_at, book.genre.updated_at)`
+    """
+    digest = hashlib.sha1(repr(versions).encode()).hexdigest()
+    return f'library:fragment:{instance._meta.model_name}:{instance.pk}:{digest}'
+
+
+class FragmentListSerializer(serializers.ListSerializer):
+    """
+    Assemble a list from the cached representation of every object in it,
+    and only serialize the objects whose representation isn't cached yet.
+
+    The child serializer gives the key of each object with
+    `get_fragment_key()`. Fields named in its `dynamic_fields` depend on
+    more than the object's own versions (e.g. whether a book is checked out
+    or who's asking), so they're left out of the fragments and worked out
+    on every request.
+    """
+
+    def to_representation(self, data):
+        instances = list(data.all() if hasattr(data, 'all') else data)
+        keys = [self.child.get_fragment_key(instance) for instance in instances]
+        cache = get_cache()
+        fragments = cache.get_many(keys)
+
+        missing = {}
+        representations = []
+        for key, instance in zip(keys, instances):
+            fragment = fragments.get(key)
+            if fragment is None:
+                representation = self.child.to_representation(instance)
+                missing[key] = {
+                    name: value for name, value in representation.items()
+                    if name not in self.child.dynamic_fields
+                }
+            else:
+                representation = self.child.with_dynamic_fields(instance, fragment)
+            representations.append(representation)
+
+        if missing:
+            cache.set_many(missing, getattr(settings, 'LIBRARY_FRAGMENT_TIMEOUT', 86400))
+        return representations
+
+
+class FragmentCacheMixin:
+    """
+    For a `ModelSerializer` whose lists are built by `FragmentListSerializer`,
+    which is set up with `list_serializer_class` in its `Meta`
+    """
+    dynamic_fields = ()
+
+    def get_fragment_key(self, instance):
+        raise NotImplementedError('`get_fragment_key()` must be implemented.')
+
+    def with_dynamic_fields(self, instance, fragment):
+        """
+        Complete a cached fragment with the dynamic fields, in field order
+        """
+        representation = {}
+        for field in self._readable_fields:
+            if field.field_name not in self.dynamic_fields:
+                representation[field.field_name] = fragment[field.field_name]
+                continue
+            attribute = field.get_attribute(instance)
+            check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            representation[field.field_name] = (
+                None if check_for_none is None else field.to_representation(attribute))
+        return representation
@@ -0,0 +1,91 @@
+from .models import Author, Book, Genre
+from .transactions import write_atomic
+from .versions import AUTHOR, BOOK, GENRE, bump
+
+'''
+Keep `IN (...)` lookups and multi-row inserts well under SQLite's limit on
+query parameters
+'''
+BATCH_SIZE = 500
+
+
+def batched(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def resolve_genres(names):
+    """
+    Map each genre name to a genre id, creating the genres that don't exist
+    yet. Names aren't unique, so an existing name resolves to its oldest genre.
+    """
+    genre_ids = {}
+    for batch in batched(names):
+        for genre_id, name in Genre.objects.filter(name__in=batch).order_by('-id').values_list('id', 'name'):
+            genre_ids[name] = genre_id
+    missing = [Genre(name=name) for name in names if name not in genre_ids]
+    for genre in Genre.objects.bulk_create(missing, batch_size=BATCH_SIZE):
+        genre_ids[genre.name] = genre.id
+    return genre_ids
+
+
+def resolve_authors(names):
+    """
+    Map each `(first_name, last_name)` to an author id, creating the authors
+    that don't exist yet
+    """
+    author_ids = {}
+    last_names = {last_name for _, last_name in names}
+    for batch in batched(last_names):
+        authors = Author.objects.filter(last_name__in=batch).order_by('-id').values_list(
+            'id', 'first_name', 'last_name')
+        for author_id, first_name, last_name in authors:
+            author_ids[(first_name, last_name)] = author_id
+    missing = [
+        Author(first_name=first_name, last_name=last_name)
+        for first_name, last_name in names if (first_name, last_name) not in author_ids
+    ]
+    for author in Author.objects.bulk_create(missing, batch_size=BATCH_SIZE):
+        author_ids[(author.first_name, author.last_name)] = author.id
+    return author_ids
+
+
+def ingest_books(records):
+    """
+    Create books from validated records with nested genre and author names,
+    and return the new books in the same order.
+
+    Every statement is set based: genres and authors are looked up and
+    created in batches, then the books and their author links are bulk
+    inserted, all in one transaction.
+    """
+    genre_names = list(dict.fromkeys(
+        record['genre'] for record in records if record.get('genre')))
+    author_names = list(dict.fromkeys(
+        (author['first_name'], author['last_name'])
+        for record in records for author in record['authors']))
+
+    with write_atomic():
+        genre_ids = resolve_genres(genre_names)
+        author_ids = resolve_authors(author_names)
+        books = Book.objects.bulk_create([
+            Book(
+                title=record['title'],
+                publish_year=record['publish_year'],
+                genre_id=genre_ids.get(record.get('genre'))
+            ) for record in records
+        ], batch_size=BATCH_SIZE)
+
+        BookAuthors = Book.authors.through
+        links = []
+        for book, record in zip(books, records):
+            book_author_ids = dict.fromkeys(
+                author_ids[(author['first_name'], author['last_name'])]
+                for author in record['authors'])
+            links.extend(
+                BookAuthors(book_id=book.id, author_id=author_id)
+                for author_id in book_author_ids)
+        BookAuthors.objects.bulk_create(links, batch_size=BATCH_SIZE)
+        bump(BOOK, AUTHOR, GENRE)
+    return books
@@ -0,0 +1,179 @@
+'''
+Helpers shared by the benchmark commands, which drive the WSGI and ASGI
+applications in process the way a server would
+'''
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import override_settings
+
+from library.authentication import generate_key, hash_key
+from library.models import AccessToken
+from library.routers import PRIMARY
+
+
+def percentile(timings, fraction):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def wsgi_request(application, method, path, host, key):
+    """
+    Send a request straight to the WSGI application, the way a WSGI
+    server's worker thread would, and return the status code
+    """
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'HTTP_HOST': host,
+        'HTTP_AUTHORIZATION': f'Bearer {key}',
+    }
+    setup_testing_defaults(environ)
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    result = application(environ, start_response)
+    try:
+        b''.join(result)
+    finally:
+        result.close()
+    return statuses[0]
+
+
+async def asgi_request(application, method, path, host, key):
+    """
+    Send a request straight to the ASGI application, the way an ASGI
+    server's event loop would, and return the status code
+    """
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', host.encode()), (b'authorization', f'Bearer {key}'.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': (host, 80),
+    }
+    requested = False
+    statuses = []
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client never disconnects, Django stops listening once it responds
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+def get_user(username=None):
+    """
+    The active user to send requests as, a superuser unless a `username` is given
+    """
+    users = get_user_model().objects.filter(is_active=True)
+    if username:
+        user = users.filter(username=username).first()
+    else:
+        user = users.filter(is_superuser=True).order_by('pk').first()
+    if user is None:
+        raise CommandError('No such active user, pass the username of one with --user')
+    return user
+
+
+def create_token(user, name):
+    """
+    A bearer token for the requests, returns the token and its key
+    """
+    key = generate_key()
+    return AccessToken.objects.create(user=user, name=name, digest=hash_key(key)), key
+
+
+@contextmanager
+def quiet_request_log():
+    """
+    Keep Django from logging every 4xx and 5xx response, the benchmarks
+    count them instead. It's a filter rather than disabling the logger,
+    because building an application sets logging up again, which would
+    enable it.
+    """
+    def drop(record):
+        return False
+
+    logger = logging.getLogger('django.request')
+    logger.addFilter(drop)
+    try:
+        yield
+    finally:
+        logger.removeFilter(drop)
+
+
+def response_caches(keep):
+    """
+    Give the library a cache of its own for the run, so nothing built while
+    benchmarking is left behind in the real one. It's an in-memory cache if
+    the caches are to be kept, and otherwise a dummy one, so every request
+    builds its response from the database. Identical requests arriving
+    together still share one response, that's not a cache.
+    """
+    backend = 'locmem.LocMemCache' if keep else 'dummy.DummyCache'
+    return override_settings(
+        CACHES={**settings.CACHES, 'benchmark': {
+            'BACKEND': f'django.core.cache.backends.{backend}',
+            'LOCATION': 'benchmark',
+        }},
+        LIBRARY_CACHE='benchmark'
+    )
+
+
+@contextmanager
+def database_copy(profile):
+    """
+    Point the primary at a throwaway copy of itself set up with one of
+    `DATABASE_PROFILES`, so the benchmark can write all it likes
+    """
+    original = connections.settings[PRIMARY]
+    source = connections[PRIMARY]
+    with tempfile.TemporaryDirectory() as directory:
+        name = os.path.join(directory, 'db.sqlite3')
+        source.ensure_connection()
+        target = sqlite3.connect(name)
+        source.connection.backup(target)
+        # Start from the default journal, the profile sets its own
+        target.execute('PRAGMA journal_mode=DELETE')
+        target.close()
+
+        connections.close_all()
+        connections.settings[PRIMARY] = {**original, **settings.DATABASE_PROFILES[profile], 'NAME': name}
+        del connections[PRIMARY]
+        try:
+            yield
+        finally:
+            connections.close_all()
+            connections.settings[PRIMARY] = original
+            connections[PRIMARY] = source
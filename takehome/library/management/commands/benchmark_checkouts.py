@@ -0,0 +1,200 @@
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError, connections
+from django.db.models import Count, Exists, OuterRef, Q
+from django.db.models.functions import Coalesce, Now
+from django.test import override_settings
+from django.utils import timezone
+
+from library.authentication import generate_key, hash_key
+from library.models import AccessToken, Book, CheckoutLeger
+from library.roles import GENERAL
+from library.routers import PRIMARY
+from library.seed import LibrarySeeder, popularity
+from ._bench import database_copy, percentile, quiet_request_log, response_caches, wsgi_request
+
+OPERATIONS = ('checkout', 'return')
+
+
+class LockErrors:
+    """
+    Count the requests that failed on SQLite's write lock, which reach
+    the client as a plain 500
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, sender, **kwargs):
+        error = sys.exc_info()[1]
+        if isinstance(error, OperationalError) and ('locked' in str(error) or 'busy' in str(error)):
+            self.count += 1
+
+
+def patron(stop, application, host, key, books, rng, hold, results):
+    """
+    Check out one of the books, mostly a popular one, and if that worked
+    keep it for `hold` seconds and return it. Over and over until told to
+    stop.
+    """
+    book_ids, weights = books
+    try:
+        while not stop.is_set():
+            book_id, = rng.choices(book_ids, cum_weights=weights)
+            start = time.perf_counter()
+            status = wsgi_request(application, 'POST', f'/api/books/{book_id}/checkout', host, key)
+            results.append(('checkout', status, time.perf_counter() - start))
+            if status != 204:
+                continue
+            time.sleep(hold)
+            start = time.perf_counter()
+            status = wsgi_request(application, 'DELETE', f'/api/book-checkouts/{book_id}', host, key)
+            results.append(('return', status, time.perf_counter() - start))
+    finally:
+        connections.close_all()
+
+
+def violations(book_ids, since):
+    """
+    Describe whatever the leger shows went wrong with the books: one
+    checked out twice at once, or loans of one overlapping in time
+    """
+    leger = CheckoutLeger.objects.filter(book_id__in=book_ids)
+    double = leger.filter(return_time=None).values('book').annotate(
+        open=Count('id')).filter(open__gt=1).count()
+    overlapping = leger.filter(checkout_time__gte=since).filter(Exists(CheckoutLeger.objects.filter(
+        Q(return_time=None) | Q(return_time__gt=OuterRef('checkout_time')),
+        book=OuterRef('book'),
+        checkout_time__lt=Coalesce(OuterRef('return_time'), Now()),
+        id__lt=OuterRef('id'),
+    ))).count()
+    found = []
+    if double:
+        found.append(f'{double} books are checked out more than once')
+    if overlapping:
+        found.append(f'{overlapping} loans started before the one before them ended')
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        'Have many patrons check out and return the same few popular books at once through '
+        'the WSGI application, on a copy of the database, and check the leger afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patrons', type=int, default=100, help='Threads checking books out')
+        parser.add_argument('--books', type=int, default=20, help='How many books they compete for')
+        parser.add_argument(
+            '--skew', type=float, default=1.0,
+            help='How much more popular the first book is than the rest, 0 for none')
+        parser.add_argument('--hold', type=float, default=0.01, help='Seconds a patron keeps a book')
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--profile', choices=sorted(settings.DATABASE_PROFILES), default='production')
+        parser.add_argument('--host', default='localhost', help='Host header, must be in ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        if connections[PRIMARY].vendor != 'sqlite':
+            raise CommandError('The profiles are for SQLite')
+        lock_errors = LockErrors()
+        got_request_exception.connect(lock_errors)
+        try:
+            with quiet_request_log(), response_caches(False), override_settings(LIBRARY_REPLICAS=[]):
+                with database_copy(options['profile']):
+                    results, elapsed, found = self.run(options)
+        finally:
+            got_request_exception.disconnect(lock_errors)
+
+        self.report(results, elapsed, lock_errors.count)
+        for violation in found:
+            self.stderr.write(violation)
+        if found:
+            raise CommandError(f'{len(found)} invariant violations in the leger')
+        self.stdout.write('The leger is consistent')
+
+    def run(self, options):
+        if not Group.objects.filter(name=GENERAL).exists():
+            raise CommandError(f'There is no {GENERAL} group for the patrons')
+        rng = random.Random(options['seed'])
+        # Books that are out already would only ever answer with a conflict
+        book_ids = list(Book.objects.filter(~Exists(CheckoutLeger.objects.filter(
+            book=OuterRef('pk'), return_time=None
+        ))).order_by('id').values_list('id', flat=True)[:options['books']])
+        if not book_ids:
+            raise CommandError('There are no books on the shelves')
+        books = (book_ids, popularity(len(book_ids), rng, options['skew']))
+
+        keys = self.create_patrons(options['patrons'], options['seed'])
+        application = get_wsgi_application()
+        since = timezone.now()
+        stop = threading.Event()
+        results = []
+        threads = [
+            threading.Thread(target=patron, args=(
+                stop, application, options['host'], key, books,
+                random.Random(options['seed'] + number), options['hold'], results))
+            for number, key in enumerate(keys)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        found = violations(book_ids, since)
+        new = CheckoutLeger.objects.filter(book_id__in=book_ids, checkout_time__gte=since)
+        checked_out = sum(1 for operation, status, _ in results if operation == 'checkout' and status == 204)
+        returned = sum(1 for operation, status, _ in results if operation == 'return' and status == 204)
+        if new.count() != checked_out:
+            found.append(f'{checked_out} checkouts succeeded but the leger has {new.count()}')
+        closed = new.exclude(return_time=None).count()
+        if closed != returned:
+            found.append(f'{returned} returns succeeded but the leger has {closed}')
+        return results, elapsed, found
+
+    def create_patrons(self, count, seed):
+        """
+        Seed the patrons with a bearer token each, and return the keys
+        """
+        user_ids = LibrarySeeder(seed).users(count, 'benchmark')
+        keys = [generate_key() for _ in user_ids]
+        AccessToken.objects.bulk_create([
+            AccessToken(user_id=user_id, name='benchmark_checkouts', digest=hash_key(key))
+            for user_id, key in zip(user_ids, keys)
+        ])
+        return keys
+
+    def report(self, results, elapsed, lock_errors):
+        timings = defaultdict(list)
+        statuses = defaultdict(Counter)
+        for operation, status, timing in results:
+            timings[operation].append(timing * 1000)
+            statuses[operation][status] += 1
+        self.stdout.write(
+            f'{"operation":<10}{"requests":>10}{"per s":>8}{"ok":>8}{"conflict":>10}{"errors":>8}'
+            f'{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+        for operation in OPERATIONS:
+            operation_timings = timings[operation] or [0]
+            counts = statuses[operation]
+            errors = sum(count for status, count in counts.items() if status >= 500)
+            self.stdout.write(
+                f'{operation:<10}{len(timings[operation]):>10}{len(timings[operation]) / elapsed:>8.1f}'
+                f'{counts[204]:>8}{counts[409]:>10}{errors:>8}'
+                f'{percentile(operation_timings, 0.5):>9.1f}{percentile(operation_timings, 0.95):>9.1f}'
+                f'{percentile(operation_timings, 0.99):>9.1f}'
+            )
+        self.stdout.write(f'{lock_errors} requests failed on a locked database')
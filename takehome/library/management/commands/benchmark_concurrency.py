@@ -0,0 +1,137 @@
+import itertools
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections, transaction
+from django.test import override_settings
+
+from library.models import Book
+from library.routers import PRIMARY
+from ._bench import (
+    create_token, database_copy, get_user, percentile, quiet_request_log, response_caches, wsgi_request
+)
+
+
+def work(stop, requests, results):
+    """
+    Send requests one after the other until told to stop, keeping the
+    status and time of each
+    """
+    try:
+        for request in requests:
+            if stop.is_set():
+                return
+            start = time.perf_counter()
+            status = request()
+            results.append((status, time.perf_counter() - start))
+    finally:
+        # Persistent connections belong to the thread, close them with it
+        connections.close_all()
+
+
+def long_reader(stop, seconds):
+    """
+    Keep a read-only transaction open for `seconds` at a time, the way a
+    long report would, until told to stop
+    """
+    try:
+        while not stop.is_set():
+            with transaction.atomic():
+                list(Book.objects.values_list('id', flat=True)[:100])
+                stop.wait(seconds)
+    finally:
+        connections.close_all()
+
+
+def checkouts(application, book_ids, host, key):
+    """
+    Check out and return each of the books in turn, forever
+    """
+    for book_id in itertools.cycle(book_ids):
+        yield partial(wsgi_request, application, 'POST', f'/api/books/{book_id}/checkout', host, key)
+        yield partial(wsgi_request, application, 'DELETE', f'/api/book-checkouts/{book_id}', host, key)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how many book lists readers get through while a writer checks books out and '
+        'returns them, under each SQLite profile in DATABASE_PROFILES'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', nargs='+', choices=sorted(settings.DATABASE_PROFILES),
+            default=sorted(settings.DATABASE_PROFILES))
+        parser.add_argument('--readers', type=int, default=8, help='Threads listing books')
+        parser.add_argument('--seconds', type=float, default=5, help='How long to run each profile')
+        parser.add_argument('--books', type=int, default=20, help='How many books the writer cycles through')
+        parser.add_argument(
+            '--long-readers', type=int, default=1,
+            help='Threads holding a read-only transaction open while the others run')
+        parser.add_argument(
+            '--transaction-seconds', type=float, default=1.0,
+            help='How long each of their transactions stays open')
+        parser.add_argument('--user', help='Username to send the requests as, defaults to a superuser')
+        parser.add_argument('--host', default='localhost', help='Host header, must be in ALLOWED_HOSTS')
+        parser.add_argument(
+            '--cache',
+            action='store_true',
+            help='Keep the response and fragment caches, by default every read goes to the database'
+        )
+
+    def handle(self, *args, **options):
+        if connections[PRIMARY].vendor != 'sqlite':
+            raise CommandError('The profiles are for SQLite')
+        self.stdout.write(
+            f'{"profile":<14}{"reads/s":>9}{"p50 ms":>9}{"p95 ms":>9}'
+            f'{"writes/s":>10}{"p95 ms":>9}{"errors":>8}')
+        caches = response_caches(options['cache'])
+        with quiet_request_log(), caches, override_settings(LIBRARY_REPLICAS=[]):
+            for profile in options['profiles']:
+                self.report(profile, *self.run(profile, options))
+
+    def run(self, profile, options):
+        with database_copy(profile):
+            _, key = create_token(get_user(options['user']), 'benchmark_concurrency')
+            book_ids = list(Book.objects.order_by('id').values_list('id', flat=True)[:options['books']])
+            if not book_ids:
+                raise CommandError('There are no books to check out')
+            application = get_wsgi_application()
+            host = options['host']
+
+            stop = threading.Event()
+            reads, writes = [], []
+            read = partial(wsgi_request, application, 'GET', '/api/books', host, key)
+            threads = [
+                threading.Thread(target=work, args=(stop, itertools.repeat(read), reads))
+                for _ in range(options['readers'])
+            ]
+            threads.append(threading.Thread(
+                target=work, args=(stop, checkouts(application, book_ids, host, key), writes)))
+            threads.extend(
+                threading.Thread(target=long_reader, args=(stop, options['transaction_seconds']))
+                for _ in range(options['long_readers'])
+            )
+
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            time.sleep(options['seconds'])
+            stop.set()
+            for thread in threads:
+                thread.join()
+            return reads, writes, time.perf_counter() - start
+
+    def report(self, profile, reads, writes, elapsed):
+        read_timings = [timing * 1000 for _, timing in reads] or [0]
+        write_timings = [timing * 1000 for _, timing in writes] or [0]
+        errors = sum(1 for status, _ in reads + writes if status >= 500)
+        self.stdout.write(
+            f'{profile:<14}{len(reads) / elapsed:>9.1f}'
+            f'{percentile(read_timings, 0.5):>9.1f}{percentile(read_timings, 0.95):>9.1f}'
+            f'{len(writes) / elapsed:>10.1f}{percentile(write_timings, 0.95):>9.1f}{errors:>8}'
+        )
@@ -0,0 +1,380 @@
+import gc
+import json
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from library.models import AccessToken, Author, Book, CheckoutLeger, Genre
+from library.roles import ADMINISTRATOR, EDITOR, GENERAL
+from library.seed import LibrarySeeder
+from ._bench import database_copy, percentile, quiet_request_log, response_caches
+
+ROLES = (GENERAL, EDITOR, ADMINISTRATOR)
+
+'''
+The options that size the seeded library
+'''
+SIZES = ('books', 'authors', 'genres', 'users', 'checkouts')
+
+
+class Catalog:
+    """
+    The rows requests are filled in with. Requests that use a row up, like
+    deleting a book or checking it out, get a new one made for them.
+    """
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.book_ids = list(Book.objects.order_by('id').values_list('id', flat=True)[:1000])
+        self.author_ids = list(Author.objects.order_by('id').values_list('id', flat=True)[:1000])
+        self.genre_ids = list(Genre.objects.order_by('id').values_list('id', flat=True)[:1000])
+        if not (self.book_ids and self.author_ids and self.genre_ids):
+            raise CommandError('The catalog needs at least one book, author and genre')
+        self.count = 0
+
+    def name(self, prefix):
+        self.count += 1
+        return f'{prefix} {self.count}'
+
+    def book(self):
+        return self.random.choice(self.book_ids)
+
+    def author(self):
+        return self.random.choice(self.author_ids)
+
+    def genre(self):
+        return self.random.choice(self.genre_ids)
+
+    def new_book(self):
+        book = Book.objects.create(
+            title=self.name('Benchmark Book'), publish_year=2000, genre_id=self.genre())
+        book.authors.add(self.author())
+        return book.id
+
+    def new_author(self):
+        return Author.objects.create(first_name='Benchmark', last_name=self.name('Author')).id
+
+    def new_genre(self):
+        return Genre.objects.create(name=self.name('Benchmark Genre')).id
+
+    def checked_out(self, user):
+        return CheckoutLeger.objects.create(user=user, book_id=self.new_book()).book_id
+
+    def book_data(self):
+        return dict(
+            title=self.name('Benchmark Book'),
+            publish_year=2000,
+            genre=self.genre(),
+            authors=[self.author()]
+        )
+
+
+class Endpoint:
+    """
+    A route and method to time. `kwargs` and `data` make the URL arguments
+    and the JSON body of each request from the catalog and the user sending it.
+    """
+
+    def __init__(self, name, method='GET', query='', kwargs=None, data=None):
+        self.name = name
+        self.method = method
+        self.query = query
+        self.kwargs = kwargs or (lambda catalog, user: {})
+        self.data = data or (lambda catalog, user: None)
+
+    @property
+    def key(self):
+        return f'{self.method} {self.name}' + (f'?{self.query}' if self.query else '')
+
+    def path(self, catalog, user):
+        path = reverse(f'library:{self.name}', kwargs=self.kwargs(catalog, user))
+        return f'{path}?{self.query}' if self.query else path
+
+
+def book(catalog, user):
+    return {'pk': catalog.book()}
+
+
+def author(catalog, user):
+    return {'pk': catalog.author()}
+
+
+def genre(catalog, user):
+    return {'pk': catalog.genre()}
+
+
+def checked_out(catalog, user):
+    return {'pk': catalog.checked_out(user)}
+
+
+'''
+Every route in `library/urls.py` with each of the methods it answers
+'''
+ENDPOINTS = (
+    Endpoint('api-root'),
+    Endpoint('book-list'),
+    Endpoint('book-list', query='available=true&ordering=-publish_year'),
+    Endpoint('book-list', 'POST', data=lambda catalog, user: catalog.book_data()),
+    Endpoint('book-search', query='q=the'),
+    Endpoint('book-detail', kwargs=book),
+    Endpoint('book-detail', 'PATCH', kwargs=book, data=lambda catalog, user: {
+        'title': catalog.name('Title')}),
+    Endpoint('book-detail', 'DELETE', kwargs=lambda catalog, user: {'pk': catalog.new_book()}),
+    Endpoint('book-checkout', 'POST', kwargs=lambda catalog, user: {'pk': catalog.new_book()}),
+    Endpoint('book-bulk-checkout', 'POST', data=lambda catalog, user: {
+        'books': [catalog.new_book() for _ in range(3)]}),
+    Endpoint('book-ingest', 'POST', data=lambda catalog, user: {'books': [
+        dict(catalog.book_data(), genre='Benchmark', authors=[
+            {'first_name': 'Ingest', 'last_name': 'Author'}])
+        for _ in range(10)
+    ]}),
+    Endpoint('checkoutleger-list'),
+    Endpoint('checkoutleger-overdue'),
+    Endpoint('checkoutleger-detail', kwargs=checked_out),
+    Endpoint('checkoutleger-detail', 'PATCH', kwargs=checked_out, data=lambda catalog, user: {
+        'due_date': (date.today() + timedelta(days=30)).isoformat()}),
+    Endpoint('checkoutleger-detail', 'DELETE', kwargs=checked_out),
+    Endpoint('checkoutleger-bulk-return', 'POST', data=lambda catalog, user: {
+        'books': [catalog.checked_out(user) for _ in range(3)]}),
+    Endpoint('author-list'),
+    Endpoint('author-list', 'POST', data=lambda catalog, user: {
+        'first_name': 'Benchmark', 'last_name': catalog.name('Author'), 'books': [catalog.book()]}),
+    Endpoint('author-detail', kwargs=author),
+    Endpoint('author-detail', 'PATCH', kwargs=author, data=lambda catalog, user: {
+        'first_name': catalog.name('Name')}),
+    Endpoint('author-detail', 'DELETE', kwargs=lambda catalog, user: {'pk': catalog.new_author()}),
+    Endpoint('genre-list'),
+    Endpoint('genre-list', 'POST', data=lambda catalog, user: {'name': catalog.name('Benchmark Genre')}),
+    Endpoint('genre-detail', kwargs=genre),
+    Endpoint('genre-detail', 'DELETE', kwargs=lambda catalog, user: {'pk': catalog.new_genre()}),
+    Endpoint('user-list'),
+    Endpoint('accesstoken-list'),
+    Endpoint('accesstoken-list', 'POST', data=lambda catalog, user: {'name': catalog.name('Token')}),
+    Endpoint('accesstoken-detail', 'DELETE', kwargs=lambda catalog, user: {
+        'pk': AccessToken.objects.create(
+            user=user, name=catalog.name('Token'), digest=catalog.name('digest')).pk}),
+    Endpoint('export', kwargs=lambda catalog, user: {'resource': 'books', 'fmt': 'ndjson'}),
+    Endpoint('cache-stats'),
+    Endpoint('async-book-list'),
+    Endpoint('async-book-detail', kwargs=book),
+    Endpoint('async-author-list'),
+    Endpoint('async-author-detail', kwargs=author),
+    Endpoint('async-genre-list'),
+    Endpoint('async-genre-detail', kwargs=genre),
+    Endpoint('async-checkout-list'),
+)
+
+
+def measure(client, endpoint, catalog, user, iterations):
+    """
+    Send the request `iterations` times, after a first one to warm up, and
+    sum up its latency, queries and size
+    """
+    timings, queries, sizes, statuses = [], [], [], []
+    for _ in range(iterations + 1):
+        path = endpoint.path(catalog, user)
+        data = endpoint.data(catalog, user)
+        # The query log is capped, a full one would count no queries at all
+        reset_queries()
+        # Like `timeit`, keep garbage collection pauses out of the timings
+        gc.collect()
+        gc.disable()
+        try:
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = client.generic(
+                    endpoint.method,
+                    path,
+                    json.dumps(data) if data is not None else '',
+                    content_type='application/json'
+                )
+                content = b''.join(response.streaming_content) if response.streaming else response.content
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            gc.enable()
+        queries.append(len(captured))
+        sizes.append(len(content))
+        statuses.append(response.status_code)
+    return dict(
+        status=statistics.mode(statuses[1:]),
+        p50_ms=round(percentile(timings[1:], 0.5), 3),
+        p95_ms=round(percentile(timings[1:], 0.95), 3),
+        queries=statistics.median_low(queries[1:]),
+        bytes=statistics.median_low(sizes[1:]),
+    )
+
+
+def compare(results, baseline, threshold, min_delta_ms, percentile='p50_ms'):
+    """
+    Describe every endpoint and role that got slower, bigger or ran more
+    queries than in the baseline. Latency is judged by `percentile` and has
+    to grow by `threshold` and by `min_delta_ms` to count, so noise on fast
+    endpoints doesn't. Query counts don't vary from run to run, so any
+    extra query counts.
+    """
+    regressions = []
+    for key, roles in results.items():
+        for role, after in roles.items():
+            before = baseline.get(key, {}).get(role)
+            if before is None:
+                continue
+            label = f'{key} as {role}'
+            if after['queries'] > before['queries']:
+                regressions.append(f'{label}: {before["queries"]} -> {after["queries"]} queries')
+            if (after[percentile] > before[percentile] * (1 + threshold)
+                    and after[percentile] - before[percentile] > min_delta_ms):
+                regressions.append(f'{label}: {percentile} {before[percentile]} -> {after[percentile]}')
+            if after['bytes'] > before['bytes'] * (1 + threshold):
+                regressions.append(f'{label}: {before["bytes"]} -> {after["bytes"]} bytes')
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every API route as a General, Editor and Administrator user against a seeded '
+        'catalog, and compare the latencies, query counts and response sizes with a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=2000)
+        parser.add_argument('--authors', type=int, default=500)
+        parser.add_argument('--genres', type=int, default=20)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--checkouts', type=int, default=10000)
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint and role')
+        parser.add_argument('--output', help='File to write the results to as JSON')
+        parser.add_argument('--baseline', help='Results from an earlier run to compare with')
+        parser.add_argument('--threshold', type=float, default=0.5, help='Allowed growth, 0.5 is 50%%')
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=5.0, help='Ignore latency changes below this')
+        parser.add_argument(
+            '--percentile', choices=('p50_ms', 'p95_ms'), default='p50_ms',
+            help='The latency to compare, p95 is noisier')
+        parser.add_argument(
+            '--current-database',
+            action='store_true',
+            help='Benchmark a copy of the configured database, instead of a freshly seeded test database'
+        )
+        parser.add_argument(
+            '--profile', choices=sorted(settings.DATABASE_PROFILES), default='production',
+            help='How the database the requests run against is set up')
+        parser.add_argument('--host', default='localhost', help='Host header, must be in ALLOWED_HOSTS')
+        parser.add_argument(
+            '--cache',
+            action='store_true',
+            help='Keep the response and fragment caches, by default every request builds its response'
+        )
+
+    def handle(self, *args, **options):
+        sizes = {name: options[name] for name in SIZES + ('iterations',)}
+        if options['current_database']:
+            sizes.update(dict.fromkeys(SIZES))
+        baseline = self.load_baseline(options['baseline'], sizes, options['profile'])
+        if connection.vendor != 'sqlite':
+            raise CommandError('The profiles are for SQLite')
+
+        caches = response_caches(options['cache'])
+        with self.database(options), caches, quiet_request_log(), override_settings(LIBRARY_REPLICAS=[]):
+            results = self.run(options)
+
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(
+                    dict(sizes=sizes, profile=options['profile'], results=results),
+                    output, indent=2, sort_keys=True)
+        if baseline is not None:
+            self.check_regressions(compare(
+                results, baseline, options['threshold'], options['min_delta_ms'], options['percentile']))
+
+    @contextmanager
+    def database(self, options):
+        """
+        The requests write to a throwaway copy set up with `--profile`, so
+        they run and commit their transactions the way they would in
+        production
+        """
+        if options['current_database']:
+            with database_copy(options['profile']):
+                yield
+            return
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # The shipped roles, and a few users and books along with them
+            call_command('loaddata', settings.BASE_DIR / 'data.json', verbosity=0)
+            self.seed(options)
+            # The test database may be in memory, the copy is a file
+            with database_copy(options['profile']):
+                yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, options):
+        seeder = LibrarySeeder()
+        genre_ids = seeder.genres(options['genres'])
+        book_ids = seeder.books(options['books'], seeder.authors(options['authors']), genre_ids)
+        user_ids = seeder.users(options['users'], 'benchmark')
+        if book_ids and user_ids:
+            seeder.checkouts(options['checkouts'], book_ids, user_ids)
+
+    def run(self, options):
+        catalog = Catalog()
+        results = {endpoint.key: {} for endpoint in ENDPOINTS}
+        for role in ROLES:
+            user = self.create_user(role)
+            client = Client(HTTP_HOST=options['host'])
+            client.force_login(user)
+            for endpoint in ENDPOINTS:
+                results[endpoint.key][role] = measure(client, endpoint, catalog, user, options['iterations'])
+        return results
+
+    def create_user(self, role):
+        group = Group.objects.filter(name=role).first()
+        if group is None:
+            raise CommandError(f'There is no {role} group')
+        user = get_user_model().objects.create_user(username=f'benchmark-{role.lower()}')
+        user.groups.add(group)
+        return user
+
+    def load_baseline(self, path, sizes, profile):
+        if not path:
+            return None
+        with open(path) as baseline:
+            baseline = json.load(baseline)
+        if baseline['sizes'] != sizes:
+            raise CommandError(f'The baseline was run with {baseline["sizes"]}, not {sizes}')
+        if baseline.get('profile') != profile:
+            raise CommandError(
+                f'The baseline was run with the {baseline.get("profile")} profile, not {profile}')
+        return baseline['results']
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"endpoint":<54}{"role":<15}{"status":>7}{"p50 ms":>9}{"p95 ms":>9}'
+            f'{"queries":>9}{"bytes":>10}')
+        for key, roles in results.items():
+            for role, metrics in roles.items():
+                self.stdout.write(
+                    f'{key:<54}{role:<15}{metrics["status"]:>7}{metrics["p50_ms"]:>9.1f}'
+                    f'{metrics["p95_ms"]:>9.1f}{metrics["queries"]:>9}{metrics["bytes"]:>10}'
+                )
+
+    def check_regressions(self, regressions):
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions against the baseline')
+        self.stdout.write('No regressions against the baseline')
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+from ._bench import asgi_request, create_token, get_user, percentile, response_caches, wsgi_request
+
+'''
+The read paths there's an async view for, relative to `/api/`
+'''
+PATHS = ('books', 'authors', 'genres', 'book-checkouts')
+
+
+def request_path(path, number):
+    """
+    Tell the requests apart with a query parameter the views ignore. The
+    DRF views build a response once for every request waiting on the same
+    one, so a run of identical requests would mostly measure waiting for
+    someone else's response, which the async views don't do.
+    """
+    return f'{path}?request={number}'
+
+
+def run_wsgi(path, requests, concurrency, host, key):
+    application = get_wsgi_application()
+
+    def timed(number):
+        start = time.perf_counter()
+        status = wsgi_request(application, 'GET', request_path(path, number), host, key)
+        return status, time.perf_counter() - start
+
+    wsgi_request(application, 'GET', path, host, key)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(timed, range(requests)))
+
+
+def run_asgi(path, requests, concurrency, host, key):
+    application = get_asgi_application()
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed(number):
+            async with semaphore:
+                start = time.perf_counter()
+                status = await asgi_request(application, 'GET', request_path(path, number), host, key)
+                return status, time.perf_counter() - start
+
+        await asgi_request(application, 'GET', path, host, key)
+        return await asyncio.gather(*(timed(number) for number in range(requests)))
+
+    return asyncio.run(run())
+
+
+'''
+Each way of serving a read path: the handler, and the prefix of the views
+it's sent to
+'''
+MODES = (
+    ('wsgi', run_wsgi, '/api/'),
+    ('asgi', run_asgi, '/api/'),
+    ('asgi-async', run_asgi, '/api/async/'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the read throughput of the DRF views under WSGI, the same views under ASGI '
+        'and the async views under ASGI, by driving each application in process'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paths', nargs='+', choices=PATHS, default=PATHS)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per path and mode')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--user', help='Username to send the requests as, defaults to a superuser')
+        parser.add_argument('--host', default='localhost', help='Host header, must be in ALLOWED_HOSTS')
+        parser.add_argument(
+            '--cache',
+            action='store_true',
+            help='Keep the fragment cache, by default every request serializes every object'
+        )
+
+    def handle(self, *args, **options):
+        token, key = create_token(get_user(options['user']), 'compare_async')
+        try:
+            with response_caches(options['cache']):
+                self.stdout.write(
+                    f'{"mode":<12}{"path":<16}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"errors":>8}')
+                for path in options['paths']:
+                    for mode, run, prefix in MODES:
+                        start = time.perf_counter()
+                        results = run(
+                            prefix + path,
+                            options['requests'],
+                            options['concurrency'],
+                            options['host'],
+                            key
+                        )
+                        self.report(mode, path, results, time.perf_counter() - start)
+        finally:
+            token.delete()
+
+    def report(self, mode, path, results, elapsed):
+        timings = [timing * 1000 for _, timing in results]
+        errors = sum(1 for status, _ in results if status != 200)
+        self.stdout.write(
+            f'{mode:<12}{path:<16}{len(results) / elapsed:>9.1f}'
+            f'{percentile(timings, 0.5):>9.1f}{percentile(timings, 0.95):>9.1f}{errors:>8}'
+        )
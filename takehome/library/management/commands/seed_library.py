@@ -0,0 +1,46 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.seed import LibrarySeeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk generate books, authors, genres, users and a checkout history for load testing. '
+        'The same seed, sizes and --today make the same library.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10000)
+        parser.add_argument('--authors', type=int, default=2000)
+        parser.add_argument('--genres', type=int, default=50)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--checkouts', type=int, default=50000, help='About how many loans to make')
+        parser.add_argument('--years', type=int, default=3, help='How far back the checkout history goes')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--today', type=date.fromisoformat, help='Date the history ends on, defaults to today')
+        parser.add_argument('--password', default='library', help='Password of every seeded user')
+
+    def handle(self, *args, **options):
+        if options['books'] and not options['authors']:
+            raise CommandError('Books need at least one author')
+        if options['checkouts'] and not (options['books'] and options['users']):
+            raise CommandError('Checkouts need at least one book and one user')
+
+        seeder = LibrarySeeder(options['seed'], options['today'], options['years'])
+        genre_ids = self.step('genres', seeder.genres, options['genres'])
+        author_ids = self.step('authors', seeder.authors, options['authors'])
+        book_ids = self.step('books', seeder.books, options['books'], author_ids, genre_ids)
+        user_ids = self.step('users', seeder.users, options['users'], options['password'])
+        if options['checkouts']:
+            self.step('checkouts', seeder.checkouts, options['checkouts'], book_ids, user_ids)
+
+    def step(self, name, seed, *args):
+        start = time.perf_counter()
+        rows = seed(*args)
+        count = rows if isinstance(rows, int) else len(rows)
+        self.stdout.write(f'{name:<10}{count:>12,}{time.perf_counter() - start:>10.1f}s')
+        return rows
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from library.routers import PRIMARY, get_replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database over every replica, standing in for replication '
+        'when trying out replicas locally'
+    )
+
+    def handle(self, *args, **options):
+        primary = connections[PRIMARY]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only SQLite databases can be copied to their replicas')
+        if not get_replicas():
+            raise CommandError('There are no replicas, list their files in LIBRARY_REPLICAS')
+
+        primary.ensure_connection()
+        for alias in get_replicas():
+            replica = connections[alias]
+            replica.ensure_connection()
+            # The backup API copies a consistent snapshot, even while the
+            # primary is being written to
+            primary.connection.backup(replica.connection)
+            replica.close()
+            self.stdout.write(f'Copied {PRIMARY} to {alias}')
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_access_token'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='checkoutleger',
+            index=models.Index(condition=models.Q(('return_time__isnull', True)), fields=['book'], name='checkout_active_book_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkoutleger',
+            index=models.Index(condition=models.Q(('return_time__isnull', True)), fields=['user', 'due_date'], name='checkout_active_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkoutleger',
+            index=models.Index(condition=models.Q(('return_time__isnull', True)), fields=['due_date'], name='checkout_active_due_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def return_duplicate_checkouts(apps, schema_editor):
+    """
+    Before the constraint existed a book could be checked out twice at
+    once. Keep the latest open entry for each book and mark the rest returned.
+    """
+    CheckoutLeger = apps.get_model('library', 'CheckoutLeger')
+    open_entries = CheckoutLeger.objects.filter(return_time__isnull=True)
+    duplicated_books = open_entries.values('book').annotate(
+        entries=Count('id')).filter(entries__gt=1, book__isnull=False)
+    for duplicate in duplicated_books:
+        latest = open_entries.filter(book=duplicate['book']).latest('checkout_time', 'id')
+        open_entries.filter(book=duplicate['book']).exclude(pk=latest.pk).update(
+            return_time=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_checkout_leger_active_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='checkoutleger',
+            name='checkout_active_book_idx',
+        ),
+        migrations.RunPython(return_duplicate_checkouts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='checkoutleger',
+            constraint=models.UniqueConstraint(condition=models.Q(('return_time__isnull', True)), fields=('book',), name='unique_active_checkout_per_book'),
+        ),
+    ]
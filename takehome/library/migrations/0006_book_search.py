@@ -0,0 +1,99 @@
+from django.db import migrations
+
+'''
+An FTS5 index over book titles and author names. The `authors` column of
+a book is all of its author names, rebuilt whenever one of its author links
+or one of its authors changes. Title matches weigh more than author matches.
+'''
+BOOK_AUTHORS = '''
+    coalesce((
+        SELECT group_concat(a.first_name || ' ' || a.last_name, ' ')
+        FROM library_book_authors ba
+        JOIN library_author a ON a.id = ba.author_id
+        WHERE ba.book_id = {book_id}
+    ), '')
+'''
+
+CREATE_INDEX = [
+    "CREATE VIRTUAL TABLE library_book_search USING fts5("
+    "title, authors, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "INSERT INTO library_book_search(library_book_search, rank) VALUES('rank', 'bm25(10.0, 1.0)')",
+    f'''
+    INSERT INTO library_book_search(rowid, title, authors)
+    SELECT b.id, b.title, {BOOK_AUTHORS.format(book_id='b.id')} FROM library_book b
+    ''',
+]
+
+CREATE_TRIGGERS = [
+    '''
+    CREATE TRIGGER library_book_search_book_insert AFTER INSERT ON library_book BEGIN
+        INSERT INTO library_book_search(rowid, title, authors) VALUES (new.id, new.title, '');
+    END
+    ''',
+    '''
+    CREATE TRIGGER library_book_search_book_update AFTER UPDATE OF title ON library_book BEGIN
+        UPDATE library_book_search SET title = new.title WHERE rowid = new.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER library_book_search_book_delete AFTER DELETE ON library_book BEGIN
+        DELETE FROM library_book_search WHERE rowid = old.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER library_book_search_link_insert AFTER INSERT ON library_book_authors BEGIN
+        UPDATE library_book_search SET authors = {BOOK_AUTHORS.format(book_id='new.book_id')}
+        WHERE rowid = new.book_id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER library_book_search_link_delete AFTER DELETE ON library_book_authors BEGIN
+        UPDATE library_book_search SET authors = {BOOK_AUTHORS.format(book_id='old.book_id')}
+        WHERE rowid = old.book_id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER library_book_search_author_update
+    AFTER UPDATE OF first_name, last_name ON library_author BEGIN
+        UPDATE library_book_search SET authors = {BOOK_AUTHORS.format(book_id='library_book_search.rowid')}
+        WHERE rowid IN (SELECT book_id FROM library_book_authors WHERE author_id = new.id);
+    END
+    ''',
+]
+
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS library_book_search_book_insert',
+    'DROP TRIGGER IF EXISTS library_book_search_book_update',
+    'DROP TRIGGER IF EXISTS library_book_search_book_delete',
+    'DROP TRIGGER IF EXISTS library_book_search_link_insert',
+    'DROP TRIGGER IF EXISTS library_book_search_link_delete',
+    'DROP TRIGGER IF EXISTS library_book_search_author_update',
+]
+
+DROP_INDEX = [
+    'DROP TABLE IF EXISTS library_book_search',
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite's, other databases would need their own index
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_unique_active_checkout'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_sqlite(CREATE_INDEX + CREATE_TRIGGERS),
+            run_on_sqlite(DROP_TRIGGERS + DROP_INDEX)
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_book_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['last_name', 'first_name'], name='author_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['first_name'], name='author_first_name_idx'),
+        ),
+        # The composite index covers last name lookups. Altering the field
+        # would rebuild the whole table on SQLite (dropping the search
+        # triggers with it), so only the old index is dropped.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='author',
+                    name='last_name',
+                    field=models.CharField(max_length=64),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX "library_author_last_name_0ef2fe97"',
+                    'CREATE INDEX "library_author_last_name_0ef2fe97" ON "library_author" ("last_name")',
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['publish_year'], name='book_publish_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['genre', 'title'], name='book_genre_title_idx'),
+        ),
+    ]
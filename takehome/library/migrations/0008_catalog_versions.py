@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:02
+
+from importlib import import_module
+
+import django.utils.timezone
+from django.db import migrations, models
+
+book_search = import_module('library.migrations.0006_book_search')
+
+RESOURCES = ('book', 'author', 'genre', 'checkout')
+
+
+def create_versions(apps, schema_editor):
+    CatalogVersion = apps.get_model('library', 'CatalogVersion')
+    CatalogVersion.objects.bulk_create(
+        [CatalogVersion(resource=resource) for resource in RESOURCES])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_catalog_filter_indexes'),
+    ]
+
+    operations = [
+        # Adding a column rebuilds the table on SQLite, which would take the
+        # search index triggers with it, so they're set aside until it's done
+        migrations.RunPython(
+            book_search.run_on_sqlite(book_search.DROP_TRIGGERS),
+            book_search.run_on_sqlite(book_search.CREATE_TRIGGERS)
+        ),
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=32, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'library_catalog_version',
+            },
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(
+            book_search.run_on_sqlite(book_search.CREATE_TRIGGERS),
+            book_search.run_on_sqlite(book_search.DROP_TRIGGERS)
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,173 @@
+import hashlib
+import time
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from rest_framework.response import Response
+
+from .cache import response_flight, response_key, stale_key
+from .roles import get_role
+from .timing import get_timer, phase
+from .versions import get_versions
+
+
+class RoleMixin:
+    """
+    Make the role resolved for the request available to the view as
+    `self.role` and to its serializers as `context['role']`
+    """
+
+    @property
+    def role(self):
+        return get_role(self.request)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['role'] = self.role
+        return context
+
+
+class TimingMixin:
+    """
+    Time the phases of a request sampled by `ServerTimingMiddleware`:
+    authentication, the permission classes, the handler with its queries,
+    serialization, which is also part of the handler, and rendering. Each
+    phase includes the queries it runs, which are also timed on their own
+    as `db`.
+    """
+
+    def perform_authentication(self, request):
+        with phase('auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with phase('permissions'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with phase('permissions'):
+            super().check_object_permissions(request, obj)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.handler_started = time.perf_counter()
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if get_timer() is not None and 'data' not in kwargs:
+            # The handler reads the data right after, it's done here to time it
+            with phase('serialize'):
+                serializer.data
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        timer = get_timer()
+        if timer is None:
+            return response
+        # Not there when authentication or permissions turned the request away
+        if getattr(self, 'handler_started', None) is not None:
+            timer.add('view', time.perf_counter() - self.handler_started)
+        if isinstance(response, Response):
+            # Django would render it right after, it's done here to time it
+            with timer.phase('render'):
+                response.render()
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer `If-None-Match` and `If-Modified-Since` on the list and detail
+    views from the change counters of `catalog_resources`, the tables the
+    responses are built from, so an unchanged resource is a 304 without
+    loading or serializing a single row.
+    """
+    catalog_resources = ()
+
+    def get_request_key(self, request):
+        """
+        Everything about the request that changes the response, except for
+        the state of the catalog
+        """
+        # Pages hold links back to the API, so the host is part of the key
+        key = [request.build_absolute_uri(), repr(sorted(self.kwargs.items())), str(self.role.is_admin)]
+        return hashlib.sha1('|'.join(key).encode()).hexdigest()
+
+    def get_validators(self, request):
+        """
+        An ETag from the request and the versions of every table it reads,
+        and the time any of them last changed. Both are None while a table
+        has no counter (e.g. right after a flush, until its next write), as
+        there's nothing to tell its changes apart by.
+        """
+        versions = get_versions(self.catalog_resources)
+        if len(versions) < len(self.catalog_resources):
+            return None, None
+        key = [self.get_request_key(request)]
+        for resource in sorted(versions):
+            version, changed_at = versions[resource]
+            key.append(f'{resource}:{version}:{changed_at.isoformat()}')
+        etag = '"%s"' % hashlib.sha1('|'.join(key).encode()).hexdigest()
+        last_modified = max(changed_at for _, changed_at in versions.values())
+        return etag, int(last_modified.timestamp())
+
+    def conditional_response(self, request, respond, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        if etag is None:
+            return respond(request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.build_response(etag, respond, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            # A response built before the latest change keeps its own ETag
+            if not response.has_header('ETag'):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+            # Admins see more than anyone else, so only the client's own
+            # cache may keep it and it has to check back every time
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return response
+
+    def build_response(self, etag, respond, request, *args, **kwargs):
+        return respond(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+
+class CachedResponseMixin(ConditionalGetMixin):
+    """
+    Keep the data of successful list and detail responses in the library
+    cache under their ETag. Any change to a table a response is built from
+    changes its ETag, so a cached response is never served after a write
+    and old ones just age out.
+
+    A missing response is only built by one worker at a time. Meanwhile the
+    others get the response from before the latest change, with its own
+    ETag, or wait for the new one if there isn't any.
+    """
+
+    def build_response(self, etag, respond, request, *args, **kwargs):
+        built = []
+
+        def build():
+            response = respond(request, *args, **kwargs)
+            built.append(response)
+            return (etag, response.data) if response.status_code == 200 else None
+
+        outcome, value = response_flight.get(
+            response_key(etag), build, stale=stale_key(self.get_request_key(request)))
+        if built:
+            response = built[0]
+        else:
+            value_etag, data = value
+            response = Response(data)
+            if value_etag != etag:
+                response['ETag'] = value_etag
+        response['X-Cache'] = outcome
+        return response
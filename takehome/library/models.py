@@ -1,20 +1,39 @@
 from datetime import datetime, timedelta
 
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
 class Author(models.Model):
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_name', 'first_name'], name='author_name_idx'),
+            # Authors with a first name in the list's order, by last name
+            models.Index(fields=['first_name', 'last_name'], name='author_first_name_idx'),
+        ]
+    
     first_name = models.CharField(max_length=64)
     last_name = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class Genre(models.Model):
     name = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class Book(models.Model):
-    title = models.CharField(max_length=128)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['publish_year'], name='book_publish_year_idx'),
+            # A genre's books in title order
+            models.Index(fields=['genre', 'title'], name='book_genre_title_idx'),
+        ]
+    
+    title = models.CharField(max_length=128, db_index=True)
     publish_year = models.PositiveIntegerField()
     genre = models.ForeignKey(
         Genre,
@@ -25,6 +44,7 @@ class Book(models.Model):
         Author,
         related_name='books'
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 def due_date_default():
@@ -41,6 +61,29 @@ class CheckoutLeger(models.Model):
     
     class Meta:
         db_table = 'library_checkout_leger'
+        # Every hot lookup is over the unreturned rows only, which stay a
+        # small slice of an ever growing leger
+        indexes = [
+            models.Index(
+                fields=['user', 'due_date'],
+                condition=models.Q(return_time__isnull=True),
+                name='checkout_active_user_idx'
+            ),
+            models.Index(
+                fields=['due_date'],
+                condition=models.Q(return_time__isnull=True),
+                name='checkout_active_due_idx'
+            ),
+        ]
+        # A book can only be checked out by one user at a time, this also
+        # serves as the index for looking up a book's open entry
+        constraints = [
+            models.UniqueConstraint(
+                fields=['book'],
+                condition=models.Q(return_time__isnull=True),
+                name='unique_active_checkout_per_book'
+            ),
+        ]
     
     user = models.ForeignKey(
         User,
@@ -59,3 +102,38 @@ class CheckoutLeger(models.Model):
     checkout_time = models.DateTimeField(auto_now_add=True)
     return_time = models.DateTimeField(null=True)
     due_date = models.DateField(default=due_date_default)
+
+
+class AccessToken(models.Model):
+    """
+    A bearer token for API clients. Only a SHA-256 digest of the key is
+    stored, the key itself is shown once when the token is created
+    """
+    
+    class Meta:
+        db_table = 'library_access_token'
+    
+    digest = models.CharField(max_length=64, unique=True, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='access_tokens',
+        editable=False
+    )
+    name = models.CharField(max_length=64, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class CatalogVersion(models.Model):
+    """
+    A change counter for one of the catalog tables, counted up by every
+    write to it. Responses built from those tables can be validated from
+    the counters alone, without reading any of the rows.
+    """
+    
+    class Meta:
+        db_table = 'library_catalog_version'
+    
+    resource = models.CharField(max_length=32, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
@@ -0,0 +1,240 @@
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    )
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over a composite, unique ordering.
+
+    DRF's cursor only remembers the first ordering field and skips rows
+    sharing that value with an offset, so paging through a column with many
+    duplicates (titles, last names, due dates) gets slower the deeper you go.
+    Here the cursor holds the value of every ordering field, and the primary
+    key is always appended as the final tie breaker, so every page is a
+    single range scan from an index no matter how deep it is. The cursor
+    also holds the ordering it was made for, so it can't be reused after
+    the ordering has changed.
+    """
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            descending = ordering[-1].startswith('-')
+            ordering = (*ordering, '-id' if descending else 'id')
+        return ordering
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            keyset = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(keyset, dict) or keyset.get('ordering') != list(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        position = keyset.get('position')
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=cursor.offset, reverse=cursor.reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        if isinstance(cursor.position, list):
+            cursor = Cursor(
+                offset=cursor.offset,
+                reverse=cursor.reverse,
+                position=json.dumps(
+                    {'ordering': list(self.ordering), 'position': cursor.position},
+                    cls=DjangoJSONEncoder
+                )
+            )
+        return super().encode_cursor(cursor)
+
+    def clean_position(self, queryset, position):
+        """
+        Convert the cursor's values to the types of the fields they're
+        compared with, a value that doesn't fit its field makes the cursor
+        invalid
+        """
+        opts = queryset.model._meta
+        values = []
+        for field, value in zip(self.ordering, position):
+            field_name = field.lstrip('-')
+            model_field = opts.pk if field_name == 'pk' else opts.get_field(field_name)
+            # NULLs can't be compared in a range, so no position has them
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                values.append(model_field.to_python(value))
+            except (TypeError, ValueError, DjangoValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            field_name = field.lstrip('-')
+            if isinstance(instance, dict):
+                value = instance[field_name]
+            else:
+                value = getattr(instance, field_name)
+            position.append(value)
+        # Round trip through JSON so positions compare equal to decoded cursors
+        return json.loads(json.dumps(position, cls=DjangoJSONEncoder))
+
+    def get_position_filter(self, position, reverse):
+        """
+        Build the row-value comparison `(f1, f2, ...) > (v1, v2, ...)`
+        expanded into plain lookups. The leading field is repeated as an
+        inclusive bound so the database can turn it into an index range.
+        """
+        lookups = []
+        for field in self.ordering:
+            # Test for: (cursor reversed) XOR (field reversed)
+            lookup = 'lt' if reverse != field.startswith('-') else 'gt'
+            lookups.append((field.lstrip('-'), lookup))
+
+        keyset = Q()
+        for index, (field_name, lookup) in enumerate(lookups):
+            ties = {name: value for (name, _), value in zip(lookups[:index], position)}
+            keyset |= Q(**ties, **{f'{field_name}__{lookup}': position[index]})
+
+        leading_name, leading_lookup = lookups[0]
+        return Q(**{f'{leading_name}__{leading_lookup}e': position[0]}) & keyset
+
+    def set_link_positions(self, current_position, following_position, offset, reverse):
+        """
+        Work out which links the page has and where they point, the same way
+        DRF does for its cursors
+        """
+        has_current = (current_position is not None) or (offset > 0)
+        has_following = following_position is not None
+        if reverse:
+            self.has_next, self.has_previous = has_current, has_following
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.has_next, self.has_previous = has_following, has_current
+            self.next_position, self.previous_position = following_position, current_position
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        `paginate_queryset` for async views, the page is read without
+        blocking the event loop
+        """
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([item async for item in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        The rows of the requested page and the first row of the next one,
+        None when the request doesn't want a page
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        (offset, reverse, current_position) = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(
+            *(reverse_ordering(self.ordering) if reverse else self.ordering))
+
+        if current_position is not None:
+            position = self.clean_position(queryset, current_position)
+            queryset = queryset.filter(self.get_position_filter(position, reverse))
+
+        # Positions are unique, so the offset is only ever non-zero for
+        # cursors handed out before a position existed (e.g. an empty page)
+        return queryset[offset:offset + self.page_size + 1]
+
+    def set_page(self, results):
+        (offset, reverse, current_position) = self.cursor or (0, False, None)
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+        self.set_link_positions(current_position, following_position, offset, reverse)
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class BookPagination(KeysetPagination):
+    ordering = ('title',)
+
+
+class AuthorPagination(KeysetPagination):
+    ordering = ('last_name', 'first_name')
+
+
+class CheckoutPagination(KeysetPagination):
+    ordering = ('due_date',)
+
+
+class SearchPagination(LimitOffsetPagination):
+    """
+    Limit and offset over ranked search results. Ranks don't make a stable
+    keyset, and counting every match would cost more than finding the page,
+    so one extra row is read to tell whether there's a next page.
+    """
+    default_limit = 50
+    max_limit = 500
+    display_page_controls = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        return results[:self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        return Response(dict(
+            next=self.get_next_link(),
+            previous=self.get_previous_link(),
+            results=data
+        ))
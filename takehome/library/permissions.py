@@ -1,21 +1,29 @@
 from rest_framework import permissions
 
+from .roles import get_role
+
 
 class BookPermissions(permissions.BasePermission):
     
     def has_permission(self, request, view):
         
-        if view.action in ('retrieve', 'list'):
-            return request.user.has_perm('library.view_book')
+        if view.action in ('retrieve', 'list', 'search'):
+            return get_role(request).has_perm('library.view_book')
         elif view.action in ('create', 'update', 'partial_update'):
-            return request.user.has_perms((
+            return get_role(request).has_perms((
                 'library.add_book',
                 'library.change_book'
             ))
         elif view.action == 'destroy':
-            return request.user.has_perm('library.delete_book')
-        elif view.action == 'checkout':
-            return request.user.has_perm('library.add_checkoutleger')
+            return get_role(request).has_perm('library.delete_book')
+        elif view.action == 'ingest':
+            return get_role(request).has_perms((
+                'library.add_book',
+                'library.add_author',
+                'library.add_genre'
+            ))
+        elif view.action in ('checkout', 'bulk_checkout'):
+            return get_role(request).has_perm('library.add_checkoutleger')
         else:
             return False
 
@@ -25,14 +33,14 @@ class AuthorPermissions(permissions.BasePermission):
     def has_permission(self, request, view):
         
         if view.action in ('retrieve', 'list'):
-            return request.user.has_perm('library.view_author')
+            return get_role(request).has_perm('library.view_author')
         elif view.action in ('create', 'update', 'partial_update'):
-            return request.user.has_perms((
+            return get_role(request).has_perms((
                 'library.add_author',
                 'library.change_author'
             ))
         elif view.action == 'destroy':
-            return request.user.has_perm('library.delete_author')
+            return get_role(request).has_perm('library.delete_author')
         else:
             return False
 
@@ -41,12 +49,12 @@ class GenrePermissions(permissions.BasePermission):
     
     def has_permission(self, request, view):
         
-        if view.action == 'list':
-            return request.user.has_perm('library.view_genre')
+        if view.action in ('retrieve', 'list'):
+            return get_role(request).has_perm('library.view_genre')
         elif view.action == 'create':
-            return request.user.has_perm('library.add_genre')
+            return get_role(request).has_perm('library.add_genre')
         elif view.action == 'destroy':
-            return request.user.has_perm('library.delete_genre')
+            return get_role(request).has_perm('library.delete_genre')
         else:
             return False
 
@@ -55,7 +63,7 @@ class UserPermissions(permissions.BasePermission):
     
     def has_permission(self, request, view):
         if view.action == 'list':
-            return request.user.has_perm('auth.view_user')
+            return get_role(request).has_perm('auth.view_user')
 
 
 class CheckoutPermissions(permissions.BasePermission):
@@ -63,13 +71,26 @@ class CheckoutPermissions(permissions.BasePermission):
     def has_permission(self, request, view):
         
         if view.action in ('retrieve', 'list', 'overdue'):
-            return request.user.has_perm('library.view_checkoutleger')
+            return get_role(request).has_perm('library.view_checkoutleger')
         elif view.action in ('update', 'partial_update'):
-            return request.user.has_perms((
+            return get_role(request).has_perms((
                 'library.add_checkoutleger',
                 'library.change_checkoutleger'
             ))
-        elif view.action == 'destroy':
-            return request.user.has_perm('library.delete_checkoutleger')
+        elif view.action in ('destroy', 'bulk_return'):
+            return get_role(request).has_perm('library.delete_checkoutleger')
         else:
             return False
+
+
+class ExportPermissions(permissions.BasePermission):
+    
+    def has_permission(self, request, view):
+        resource = view.kwargs.get('resource')
+        if resource == 'checkouts':
+            return get_role(request).is_admin
+        elif resource in ('books', 'authors', 'genres'):
+            return get_role(request).has_perm(f'library.view_{resource[:-1]}')
+        else:
+            # Nothing to protect, the view answers 404 for an unknown resource
+            return True
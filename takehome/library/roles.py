@@ -0,0 +1,140 @@
+from django.contrib.auth.models import Group, Permission
+from django.db.models import Case, CharField, IntegerField, Value, When
+
+ADMINISTRATOR = 'Administrator'
+EDITOR = 'Editor'
+GENERAL = 'General'
+
+'''
+When a user belongs to several groups the most privileged one is their role
+'''
+ROLE_PRECEDENCE = (ADMINISTRATOR, EDITOR, GENERAL)
+
+
+def role_precedence(field='name'):
+    """
+    Rank group names by `ROLE_PRECEDENCE` in the database, the most
+    privileged first and any other group last, to order a user's groups by
+    """
+    return Case(
+        *(When(**{field: name}, then=Value(rank)) for rank, name in enumerate(ROLE_PRECEDENCE)),
+        default=Value(len(ROLE_PRECEDENCE)),
+        output_field=IntegerField()
+    )
+
+
+class Role:
+    """
+    A user's role and every permission they hold, in the same
+    `app_label.codename` form Django's `has_perm` uses
+    """
+
+    def __init__(self, user_id=None, name=None, permissions=(), is_superuser=False):
+        self.user_id = user_id
+        self.name = name
+        self.permissions = frozenset(permissions)
+        self.is_superuser = is_superuser
+
+    @property
+    def is_admin(self):
+        return self.is_superuser or self.name == ADMINISTRATOR
+
+    def has_perm(self, perm):
+        return self.is_superuser or perm in self.permissions
+
+    def has_perms(self, perms):
+        return all(self.has_perm(perm) for perm in perms)
+
+
+def fixed_role(user):
+    """
+    The role of a user whose groups don't come into it, None for everyone else
+    """
+    if not user.is_authenticated or not user.is_active:
+        return Role(user_id=user.pk)
+    if user.is_superuser:
+        return Role(user_id=user.pk, name=ADMINISTRATOR, is_superuser=True)
+    return None
+
+
+def permission_rows(user):
+    """
+    One `(group name, app label, codename)` row for each of the user's
+    groups and permissions, both direct and through their groups
+    """
+    group_rows = Group.objects.filter(user=user).values_list(
+        'name',
+        'permissions__content_type__app_label',
+        'permissions__codename'
+    ).order_by()
+    user_rows = Permission.objects.filter(user=user).annotate(
+        group_name=Value(None, output_field=CharField())
+    ).values_list('group_name', 'content_type__app_label', 'codename').order_by()
+    return group_rows.union(user_rows, all=True)
+
+
+def role_from_rows(user, rows):
+    groups = []
+    permissions = set()
+    for group_name, app_label, codename in rows:
+        if group_name is not None and group_name not in groups:
+            groups.append(group_name)
+        if codename is not None:
+            permissions.add(f'{app_label}.{codename}')
+
+    name = next(
+        (role for role in ROLE_PRECEDENCE if role in groups),
+        groups[0] if groups else None
+    )
+    return Role(user_id=user.pk, name=name, permissions=permissions)
+
+
+def resolve_role(user):
+    """
+    Load a user's groups and permissions, both direct and through their
+    groups, in a single query
+    """
+    role = fixed_role(user)
+    if role is None:
+        role = role_from_rows(user, permission_rows(user))
+    return role
+
+
+async def aresolve_role(user):
+    """
+    `resolve_role` for async views
+    """
+    role = fixed_role(user)
+    if role is None:
+        role = role_from_rows(user, [row async for row in permission_rows(user)])
+    return role
+
+
+def get_role(request):
+    """
+    Resolve the role of the request's user once and keep it on the
+    underlying `HttpRequest`, so permission classes, views and serializers
+    all share the same answer
+    """
+    user = request.user
+    http_request = getattr(request, '_request', request)
+    role = getattr(http_request, 'library_role', None)
+    if role is None or role.user_id != user.pk:
+        role = resolve_role(user)
+        http_request.library_role = role
+    return role
+
+
+async def aget_role(request):
+    """
+    `get_role` for async views. Once it has run, `get_role` finds the role
+    already on the request, so permission classes can go on calling it
+    without touching the database.
+    """
+    user = request.user
+    http_request = getattr(request, '_request', request)
+    role = getattr(http_request, 'library_role', None)
+    if role is None or role.user_id != user.pk:
+        role = await aresolve_role(user)
+        http_request.library_role = role
+    return role
@@ -0,0 +1,207 @@
+import contextvars
+import hashlib
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from .cache import get_cache
+
+PRIMARY = 'default'
+
+'''
+Models whose reads a replica can serve, by `app_label.model_name`. The
+catalog versions come along so a response and its ETag are always read
+from the same copy. Checkouts, tokens, roles, sessions and users are only
+ever read from the primary, logging in must never see an old password or
+miss a new account. The user list reads a replica on its own, with
+`read_database()`.
+'''
+REPLICATED_MODELS = frozenset((
+    'library.book',
+    'library.book_authors',
+    'library.author',
+    'library.genre',
+    'library.catalogversion',
+))
+
+'''
+HTTP methods that don't write
+'''
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_pinned = contextvars.ContextVar('library_pinned', default=False)
+_replica = contextvars.ContextVar('library_replica', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'LIBRARY_REPLICAS', ())
+
+
+def pick_replica():
+    replicas = get_replicas()
+    return random.choice(replicas) if replicas else PRIMARY
+
+
+def read_database():
+    """
+    The database reads that a replica can serve go to: the request's
+    replica, unless its reads are pinned to the primary or a transaction
+    on the primary is open
+    """
+    if _pinned.get() or connections[PRIMARY].in_atomic_block:
+        return PRIMARY
+    return _replica.get() or pick_replica()
+
+
+@contextmanager
+def use_primary():
+    """
+    Read everything from the primary for the duration
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads of the catalog to a replica and everything else to the
+    primary, `default`. The replica aliases are listed in `LIBRARY_REPLICAS`.
+
+    A request reads from a single replica throughout, so it never mixes two
+    copies that are behind by different amounts. Reads inside a transaction
+    on the primary stay on the primary, so they see the transaction's writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if model._meta.label_lower not in REPLICATED_MODELS:
+            return PRIMARY
+        return read_database()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias is a copy of the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return False if db in get_replicas() else None
+
+
+def writer_key(request):
+    """
+    The cache key recording that whoever sent the request wrote recently.
+    This runs before DRF authenticates, so clients are told apart by their
+    credentials, the bearer header or the session cookie, rather than by user.
+    """
+    credential = (request.META.get('HTTP_AUTHORIZATION')
+                  or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    if not credential:
+        return None
+    return 'library:primary:' + hashlib.sha1(credential.encode()).hexdigest()
+
+
+class ReplicaMiddleware:
+    """
+    Pick the replica a request reads from, or pin it to the primary.
+
+    Writes read from the primary throughout. Once a client has written,
+    its reads stick to the primary for `LIBRARY_PRIMARY_STICKY_SECONDS`, long
+    enough for the replicas to catch up, so it always reads its own writes.
+    The window is kept in the library cache, which has to be shared by every
+    process for it to hold across them.
+
+    A streamed response reads as it's sent, after the middleware has
+    returned, so its content is wrapped to read from the same database.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key, tokens = self.route(request)
+        try:
+            response = self.get_response(request)
+            self.keep_route(response)
+        finally:
+            self.reset(tokens)
+        self.record_write(request, response, key)
+        return response
+
+    async def __acall__(self, request):
+        key, tokens = self.route(request)
+        try:
+            response = await self.get_response(request)
+            self.keep_route(response)
+        finally:
+            self.reset(tokens)
+        self.record_write(request, response, key)
+        return response
+
+    def route(self, request):
+        key = writer_key(request)
+        pinned = request.method not in SAFE_METHODS or (key is not None and get_cache().get(key))
+        return key, (_pinned.set(bool(pinned)), _replica.set(pick_replica()))
+
+    def reset(self, tokens):
+        pinned, replica = tokens
+        _pinned.reset(pinned)
+        _replica.reset(replica)
+
+    def keep_route(self, response):
+        if not response.streaming:
+            return
+        route = (_pinned.get(), _replica.get())
+        if response.is_async:
+            response.streaming_content = self.astream(response.streaming_content, route)
+        else:
+            response.streaming_content = self.stream(response.streaming_content, route)
+
+    def stream(self, content, route):
+        """
+        Read each chunk of `content` as the request that made it would
+        """
+        pinned, replica = route
+        chunks = iter(content)
+        while True:
+            tokens = (_pinned.set(pinned), _replica.set(replica))
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                self.reset(tokens)
+            yield chunk
+
+    async def astream(self, content, route):
+        pinned, replica = route
+        chunks = aiter(content)
+        while True:
+            tokens = (_pinned.set(pinned), _replica.set(replica))
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                return
+            finally:
+                self.reset(tokens)
+            yield chunk
+
+    def record_write(self, request, response, key):
+        if key is not None and request.method not in SAFE_METHODS and response.status_code < 400:
+            get_cache().set(key, True, getattr(settings, 'LIBRARY_PRIMARY_STICKY_SECONDS', 10))
@@ -0,0 +1,47 @@
+import re
+
+from django.db import connections, router
+
+from .models import Book
+
+'''
+Full-text index over book titles and author names. It's an FTS5 table
+keyed by book id and kept up to date by triggers on the book, author and
+book-author tables (see migration 0006), so bulk inserts and raw updates
+are indexed just the same as model saves.
+'''
+SEARCH_TABLE = 'library_book_search'
+
+TOKEN = re.compile(r'\w+')
+
+
+def match_expression(text):
+    """
+    Turn free text into an FTS5 query where every word has to match the
+    start of a word in the title or author names, e.g. `tolk hobb` finds
+    "The Hobbit" by J.R.R. Tolkien. Words are quoted, so nothing the user
+    types is read as FTS5 syntax.
+    """
+    return ' '.join(f'"{token}"*' for token in TOKEN.findall(text))
+
+
+class BookSearch:
+    """
+    The ids of the books matching a search, best match first. Slice it to
+    run the query for just that page.
+    """
+
+    def __init__(self, text):
+        self.match = match_expression(text)
+
+    def __bool__(self):
+        return bool(self.match)
+
+    def __getitem__(self, page):
+        with connections[router.db_for_read(Book)].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.match, page.stop - page.start, page.start]
+            )
+            return [book_id for book_id, in cursor.fetchall()]
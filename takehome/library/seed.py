@@ -0,0 +1,231 @@
+import itertools
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from faker_music.genres import genre_list
+
+from .models import Author, Book, CheckoutLeger, Genre
+from .roles import ADMINISTRATOR, EDITOR, GENERAL
+from .versions import AUTHOR, BOOK, CHECKOUT, GENRE, bump
+
+'''
+Rows are written this many at a time, each chunk in its own transaction, so
+memory stays flat and a million rows aren't one long write lock
+'''
+CHUNK_SIZE = 5000
+
+'''
+Faker picks names by frequency, which is slow, so a pool of each is drawn
+once and combined
+'''
+NAME_POOL = 1000
+
+'''
+How the seeded users are split between the roles
+'''
+ROLE_WEIGHTS = {GENERAL: 90, EDITOR: 8, ADMINISTRATOR: 2}
+
+LOAN_DAYS = 14
+
+'''
+The share of books that are checked out right now. Half of those are
+overdue.
+'''
+OPEN_LOANS = 0.1
+
+'''
+The leger columns the history is written to
+'''
+LOAN_FIELDS = ('user', 'book', 'checkout_time', 'return_time', 'due_date')
+
+
+def chunked(items, size=CHUNK_SIZE):
+    items = iter(items)
+    while chunk := list(itertools.islice(items, size)):
+        yield chunk
+
+
+def popularity(count, rng, skew=1.0):
+    """
+    Cumulative weights for `random.choices` that make a few of `count`
+    items far more popular than the rest, the way a few books and readers
+    account for most loans. The popular ones are spread out at random
+    rather than being the first ones.
+    """
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    return list(itertools.accumulate(rank ** -skew for rank in ranks))
+
+
+class LibrarySeeder:
+    """
+    Generate a library with Faker and one seeded random generator, so the
+    same seed, sizes and `today` always make the same rows. The rows are
+    bulk inserted and the catalog versions bumped once per table.
+    """
+
+    def __init__(self, seed=0, today=None, years=3):
+        self.random = random.Random(seed)
+        self.faker = Faker(locale='en_US')
+        self.faker.seed_instance(seed)
+        if today is None:
+            self.now = timezone.now()
+            self.today = timezone.localdate(self.now)
+        else:
+            # The history has to end at the same time for the same rows
+            self.now = timezone.make_aware(datetime.combine(today, time(12)))
+            self.today = today
+        self.start = self.now - timedelta(days=365 * years)
+        self.first_names = [self.faker.first_name() for _ in range(NAME_POOL)]
+        self.last_names = [self.faker.last_name() for _ in range(NAME_POOL)]
+
+    def genres(self, count):
+        # `faker_music` picks from the global random generator, so pick from its list here
+        names = sorted({name for genre in genre_list for name in genre['subgenres']})
+        self.random.shuffle(names)
+        with transaction.atomic():
+            genres = Genre.objects.bulk_create([
+                # There are a few hundred subgenres, after that they repeat with a number
+                Genre(name=names[number % len(names)] + (
+                    f' {number // len(names) + 1}' if number >= len(names) else ''))
+                for number in range(count)
+            ])
+            bump(GENRE)
+        return [genre.id for genre in genres]
+
+    def authors(self, count):
+        ids = []
+        for chunk in chunked(range(count)):
+            with transaction.atomic():
+                ids.extend(author.id for author in Author.objects.bulk_create([
+                    Author(
+                        first_name=self.random.choice(self.first_names),
+                        last_name=self.random.choice(self.last_names)
+                    ) for _ in chunk
+                ]))
+        with transaction.atomic():
+            bump(AUTHOR)
+        return ids
+
+    def books(self, count, author_ids, genre_ids):
+        """
+        Books with one to three authors each, most by a handful of prolific
+        authors, and publish years leaning towards recent ones
+        """
+        weights = popularity(len(author_ids), self.random)
+        BookAuthors = Book.authors.through
+        ids = []
+        for chunk in chunked(range(count)):
+            with transaction.atomic():
+                books = Book.objects.bulk_create([
+                    Book(
+                        title=self.faker.catch_phrase(),
+                        publish_year=int(self.random.triangular(1900, self.today.year, self.today.year)),
+                        genre_id=self.random.choice(genre_ids) if genre_ids else None
+                    ) for _ in chunk
+                ])
+                BookAuthors.objects.bulk_create([
+                    BookAuthors(book_id=book.id, author_id=author_id)
+                    for book in books
+                    for author_id in dict.fromkeys(self.random.choices(
+                        author_ids, cum_weights=weights, k=self.random.choice((1, 1, 1, 2, 2, 3))))
+                ])
+            ids.extend(book.id for book in books)
+        with transaction.atomic():
+            bump(BOOK)
+        return ids
+
+    def users(self, count, password):
+        """
+        Users split between the roles that exist, all with the same
+        password, which is hashed only once
+        """
+        password = make_password(password)
+        groups = dict(Group.objects.filter(name__in=ROLE_WEIGHTS).values_list('name', 'id'))
+        group_ids = [groups[name] for name in ROLE_WEIGHTS if name in groups]
+        group_weights = [ROLE_WEIGHTS[name] for name in ROLE_WEIGHTS if name in groups]
+        # Usernames are numbered on from the existing users, so seeding again doesn't clash
+        offset = User.objects.aggregate(Max('id'))['id__max'] or 0
+        UserGroups = User.groups.through
+        ids = []
+        for chunk in chunked(range(offset + 1, offset + count + 1)):
+            users = []
+            for number in chunk:
+                first_name = self.random.choice(self.first_names)
+                last_name = self.random.choice(self.last_names)
+                users.append(User(
+                    username=f'{first_name}.{last_name}.{number}'.lower(),
+                    first_name=first_name,
+                    last_name=last_name,
+                    email=f'{first_name}.{last_name}.{number}@example.com'.lower(),
+                    password=password,
+                ))
+            with transaction.atomic():
+                users = User.objects.bulk_create(users)
+                if group_ids:
+                    UserGroups.objects.bulk_create([
+                        UserGroups(user_id=user.id, group_id=self.random.choices(
+                            group_ids, weights=group_weights)[0])
+                        for user in users
+                    ])
+            ids.extend(user.id for user in users)
+        return ids
+
+    def loans(self, count, book_ids, user_ids):
+        """
+        `(user_id, book_id, checkout_time, return_time, due_date)` for about
+        `count` loans. Each book's loans follow one another back from today,
+        so a book is never out twice at once, and some books have many more
+        of them than others. About one in five loans came back late.
+        """
+        weights = popularity(len(user_ids), self.random)
+        mean = count / len(book_ids)
+        for book_id in book_ids:
+            loans = int(self.random.expovariate(1 / mean) + 0.5) if mean else 0
+            end = self.now
+            if loans and self.random.random() < OPEN_LOANS:
+                checkout = end - timedelta(days=self.random.uniform(0, LOAN_DAYS * 2))
+                user_id, = self.random.choices(user_ids, cum_weights=weights)
+                yield user_id, book_id, checkout, None, (checkout + timedelta(days=LOAN_DAYS)).date()
+                end = checkout
+                loans -= 1
+            for _ in range(loans):
+                returned = end - timedelta(days=self.random.expovariate(1 / 7))
+                checkout = returned - timedelta(days=self.random.triangular(0.5, LOAN_DAYS * 1.5, 10))
+                if checkout < self.start:
+                    break
+                user_id, = self.random.choices(user_ids, cum_weights=weights)
+                yield user_id, book_id, checkout, returned, (checkout + timedelta(days=LOAN_DAYS)).date()
+                end = checkout
+
+    def checkouts(self, count, book_ids, user_ids):
+        """
+        Write the loan history straight to the leger. `bulk_create` would
+        stamp every `checkout_time` with now, being `auto_now_add`.
+        """
+        connection = connections[router.db_for_write(CheckoutLeger)]
+        fields = [CheckoutLeger._meta.get_field(name) for name in LOAN_FIELDS]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(CheckoutLeger._meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields))
+        )
+        written = 0
+        for chunk in chunked(self.loans(count, book_ids, user_ids)):
+            rows = [
+                [field.get_db_prep_save(value, connection) for field, value in zip(fields, loan)]
+                for loan in chunk
+            ]
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+            written += len(rows)
+        with transaction.atomic():
+            bump(CHECKOUT)
+        return written
@@ -2,6 +2,7 @@ from django.contrib.auth.models import User, Permission
 
 from rest_framework import serializers
 
+from .fragments import FragmentCacheMixin, FragmentListSerializer, fragment_key
 from .models import *
 
 
@@ -12,13 +13,24 @@ class AuthorBookSerializer(serializers.ModelSerializer):
         fields = ('id', 'title')
         
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(FragmentCacheMixin, serializers.ModelSerializer):
+    """
+    Expects authors prefetched with their `books`, as done by `AuthorViewSet`
+    """
     
     books = AuthorBookSerializer(many=True)
     
     class Meta:
         model = Author
         fields = ('id', 'first_name', 'last_name', 'books')
+        list_serializer_class = FragmentListSerializer
+    
+    def get_fragment_key(self, obj: Author):
+        return fragment_key(
+            obj,
+            obj.updated_at,
+            [(book.pk, book.updated_at) for book in obj.books.all()]
+        )
 
 
 class AuthorDeserializer(serializers.ModelSerializer):
@@ -29,12 +41,56 @@ class AuthorDeserializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookGenreSerializer(serializers.ModelSerializer):
+    
+    class Meta:
+        model = Genre
+        fields = ('id', 'name')
+
+
+class BookAuthorSerializer(serializers.ModelSerializer):
+    
+    class Meta:
+        model = Author
+        fields = ('id', 'first_name', 'last_name')
+
+
+class BookSerializer(FragmentCacheMixin, serializers.ModelSerializer):
+    """
+    Expects books annotated with `checkout_due_date`, the due date of their
+    open checkout if they have one, as done by `BookViewSet`
+    """
+    
+    genre = BookGenreSerializer(read_only=True)
+    authors = BookAuthorSerializer(many=True, read_only=True)
+    is_available = serializers.SerializerMethodField()
+    due_date = serializers.DateField(source='checkout_due_date', read_only=True)
+    
+    dynamic_fields = ('is_available', 'due_date')
     
     class Meta:
         model = Book
-        fields = ('id', 'title', 'publish_year', 'genre', 'authors')
-        depth = 1
+        fields = ('id', 'title', 'publish_year', 'genre', 'authors', 'is_available', 'due_date')
+        list_serializer_class = FragmentListSerializer
+    
+    def get_fragment_key(self, obj: Book):
+        return fragment_key(
+            obj,
+            obj.updated_at,
+            obj.genre and (obj.genre.pk, obj.genre.updated_at),
+            [(author.pk, author.updated_at) for author in obj.authors.all()]
+        )
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        role = self.context.get('role')
+        if role is None or not role.is_admin:
+            # Only admins get to see when a book is coming back
+            fields.pop('due_date')
+        return fields
+    
+    def get_is_available(self, obj: Book):
+        return obj.checkout_due_date is None
         
 
 class BookDeserializer(serializers.ModelSerializer):
@@ -45,6 +101,35 @@ class BookDeserializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
         
 
+class IngestAuthorSerializer(serializers.Serializer):
+    first_name = serializers.CharField(max_length=64)
+    last_name = serializers.CharField(max_length=64)
+
+
+class IngestBookSerializer(serializers.Serializer):
+    """
+    A single book record for bulk ingest, with its genre and authors given
+    by name rather than by id
+    """
+    title = serializers.CharField(max_length=128)
+    publish_year = serializers.IntegerField(min_value=0)
+    genre = serializers.CharField(max_length=64, required=False, allow_null=True)
+    authors = IngestAuthorSerializer(many=True, allow_empty=False)
+
+
+class IngestSerializer(serializers.Serializer):
+    """
+    Records are checked one by one with `IngestBookSerializer` so a bad
+    record, even one that isn't an object, doesn't hold up the rest of the
+    shipment
+    """
+    books = serializers.ListField(
+        child=serializers.JSONField(allow_null=True),
+        allow_empty=False,
+        max_length=5000
+    )
+    
+
 class CheckoutsSerializer(serializers.Serializer):
     book_id = serializers.IntegerField()
     book_title = serializers.CharField(max_length=128)
@@ -61,27 +146,50 @@ class CheckoutsSerializer(serializers.Serializer):
         return instance
     
 
+class BookIdsSerializer(serializers.Serializer):
+    """
+    A batch of book ids for the bulk checkout and return endpoints
+    """
+    books = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+    
+    def validate_books(self, value):
+        return list(dict.fromkeys(value))
+    
+
 class GenreSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Genre
-        fields = '__all__'
+        fields = ('id', 'name')
 
 
 class UserSerializer(serializers.ModelSerializer):
+    """
+    Expects users annotated with their `role` and prefetched with their
+    `active_checkouts`, as done by `UserViewSet`
+    """
     
-    role = serializers.SerializerMethodField()
+    role = serializers.CharField(read_only=True)
     books = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = ('id', 'first_name', 'last_name', 'role', 'books')
-        depth = 2
-    
-    def get_role(self, obj: User):
-        return obj.groups.first().name if obj.groups.exists() else None
     
     def get_books(self, obj: User):
-        books = obj.checkout_leger.filter(
-            return_time__isnull=True).values_list('book_id', 'book__title')
-        return [{'id': book_id, 'title': title} for book_id, title in books]
+        return [
+            {'id': leger.book_id, 'title': leger.book.title}
+            for leger in obj.active_checkouts
+        ]
+
+
+class AccessTokenSerializer(serializers.ModelSerializer):
+    
+    class Meta:
+        model = AccessToken
+        fields = ('id', 'name', 'created')
+        read_only_fields = ('id', 'created')
@@ -0,0 +1,64 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import token_cache
+from .models import AccessToken, Author, Book, CheckoutLeger, Genre
+from .timing import time_query
+from .versions import AUTHOR, BOOK, CHECKOUT, GENRE, bump
+
+VERSIONED_MODELS = {
+    Book: BOOK,
+    Author: AUTHOR,
+    Genre: GENRE,
+    CheckoutLeger: CHECKOUT,
+}
+
+
+@receiver(post_delete, sender=AccessToken)
+def evict_revoked_token(sender, instance, **kwargs):
+    token_cache.evict(instance.digest)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_user_tokens(sender, instance, **kwargs):
+    """
+    Make a deactivated or deleted user, or one whose details changed,
+    go back to the database on their next request
+    """
+    token_cache.evict_user(instance.pk)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=CheckoutLeger)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=CheckoutLeger)
+def count_catalog_change(sender, **kwargs):
+    """
+    Bulk inserts and queryset updates don't send these, so the code doing
+    them bumps the versions itself
+    """
+    bump(VERSIONED_MODELS[sender])
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def count_authorship_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump(BOOK)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    """
+    Count the queries of requests `ServerTimingMiddleware` samples. It goes
+    first, as the outermost wrapper, so that an `execute_wrapper()` block
+    open while the connection is made still pops its own wrapper.
+    """
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_query)
@@ -0,0 +1,21 @@
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def json_array_stream(rows, batch_size=500):
+    """
+    Render an iterable of dicts as a JSON array a batch of rows at a time,
+    so the whole document never has to sit in memory
+    """
+    encoder = DjangoJSONEncoder()
+    yield '['
+    batch = []
+    separator = ''
+    for row in rows:
+        batch.append(encoder.encode(row))
+        if len(batch) == batch_size:
+            yield separator + ','.join(batch)
+            separator = ','
+            batch = []
+    if batch:
+        yield separator + ','.join(batch)
+    yield ']'
@@ -0,0 +1,126 @@
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from library import models
+from library.authentication import hash_key, token_cache
+from .test_data_helper import create_default_groups, create_user
+
+
+class AccessTokensTest(APITestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        admin_group, editor_group, general_group = create_default_groups()
+        self.general_user = create_user(
+            username='general',
+            groups=[general_group]
+        )
+        self.admin_user = create_user(
+            username='admin',
+            groups=[admin_group]
+        )
+
+    def create_token(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.post('/api/auth-tokens', data={'name': 'kiosk'}, format='json')
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        return response.data
+
+    def bearer_client(self, key):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {key}')
+        return client
+
+    def test_create_token(self):
+        """
+        A new token's key is only returned once and only its digest is stored
+        """
+        data = self.create_token(self.general_user)
+
+        token = models.AccessToken.objects.get()
+        self.assertEqual('kiosk', data['name'])
+        self.assertEqual(hash_key(data['token']), token.digest)
+        self.assertEqual(self.general_user, token.user)
+
+    def test_authenticate_with_token(self):
+        """
+        A verified token is served from the cache on later requests
+        """
+        key = self.create_token(self.general_user)['token']
+        client = self.bearer_client(key)
+
+        response = client.get('/api/genres')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(1, len(token_cache))
+
+        # role and catalog versions, the genres page is cached and the
+        # token isn't looked up
+        with self.assertNumQueries(2):
+            response = client.get('/api/genres')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_invalid_token(self):
+        response = self.bearer_client('not-a-token').get('/api/genres')
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+        self.assertEqual('Bearer realm="api"', response['WWW-Authenticate'])
+
+    def test_revoke_token(self):
+        """
+        A revoked token stops working right away
+        """
+        data = self.create_token(self.general_user)
+        client = self.bearer_client(data['token'])
+        self.assertEqual(status.HTTP_200_OK, client.get('/api/genres').status_code)
+
+        response = client.delete(f'/api/auth-tokens/{data["id"]}')
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
+
+        self.assertEqual(0, len(token_cache))
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, client.get('/api/genres').status_code)
+
+    def test_cannot_revoke_someone_elses_token(self):
+        data = self.create_token(self.admin_user)
+
+        client = APIClient()
+        client.force_authenticate(user=self.general_user)
+        response = client.delete(f'/api/auth-tokens/{data["id"]}')
+
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        self.assertEqual(1, models.AccessToken.objects.count())
+
+    def test_admin_can_revoke_any_token(self):
+        data = self.create_token(self.general_user)
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin_user)
+        response = client.delete(f'/api/auth-tokens/{data["id"]}')
+
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
+        self.assertEqual(0, models.AccessToken.objects.count())
+
+    def test_list_only_own_tokens(self):
+        self.create_token(self.general_user)
+        self.create_token(self.admin_user)
+
+        client = APIClient()
+        client.force_authenticate(user=self.general_user)
+        response = client.get('/api/auth-tokens')
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(1, len(response.data['results']))
+        self.assertNotIn('token', response.data['results'][0])
+
+    def test_deactivated_user(self):
+        """
+        Deactivating a user evicts their cached tokens
+        """
+        key = self.create_token(self.general_user)['token']
+        client = self.bearer_client(key)
+        self.assertEqual(status.HTTP_200_OK, client.get('/api/genres').status_code)
+
+        self.general_user.is_active = False
+        self.general_user.save()
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, client.get('/api/genres').status_code)
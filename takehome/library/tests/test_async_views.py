@@ -0,0 +1,155 @@
+import json
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.test import AsyncClient, TransactionTestCase
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from library import models
+from library.authentication import generate_key, hash_key, token_cache
+from .test_data_helper import (
+    create_author,
+    create_book,
+    create_checkout_leger,
+    create_default_groups,
+    create_genre,
+    create_user
+)
+
+
+class AsyncViewTest(APITestCase):
+    """
+    The async endpoints answer like the viewsets they mirror
+    """
+
+    def setUp(self):
+        admin_group, editor_group, general_group = create_default_groups()
+        self.general_user = create_user(username='general', groups=[general_group])
+        self.admin_user = create_user(username='admin', groups=[admin_group])
+        self.genre = create_genre(name='Sci-Fi')
+        self.author = create_author(first_name='Jane', last_name='Doe')
+        self.books = [
+            create_book(title=f'Book Title {index}', genre=self.genre, authors=[self.author])
+            for index in range(5)
+        ]
+        create_checkout_leger(book=self.books[0], user=self.general_user, return_time=None)
+        token_cache.clear()
+        self.async_client = AsyncClient()
+
+    async def login(self, user):
+        await self.async_client.aforce_login(user)
+
+    def sync_get(self, path, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client.get(path)
+
+    async def assertSameAsSync(self, path, user):
+        response = await self.async_client.get(f'/api/async/{path}')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual('application/json', response['Content-Type'])
+        expected = await sync_to_async(self.sync_get)(f'/api/{path}', user)
+        self.assertEqual(
+            json.loads(expected.content.replace(b'/api/', b'/api/async/')),
+            json.loads(response.content)
+        )
+        return response
+
+    async def test_lists_and_details(self):
+        await self.login(self.general_user)
+        for path in (
+            'books',
+            f'books/{self.books[0].id}',
+            'authors',
+            f'authors/{self.author.id}',
+            'genres',
+            f'genres/{self.genre.id}',
+            'book-checkouts',
+        ):
+            with self.subTest(path=path):
+                await self.assertSameAsSync(path, self.general_user)
+
+    async def test_admin_sees_due_dates(self):
+        await self.login(self.admin_user)
+        response = await self.assertSameAsSync(f'books/{self.books[0].id}', self.admin_user)
+        self.assertIsNotNone(json.loads(response.content)['due_date'])
+
+    async def test_filter_and_order(self):
+        await self.login(self.general_user)
+        await self.assertSameAsSync('books?available=true&ordering=-title', self.general_user)
+
+        response = await self.async_client.get('/api/async/books?genre=x')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertIn('genre', json.loads(response.content))
+
+    async def test_pages(self):
+        await self.login(self.general_user)
+        response = await self.async_client.get('/api/async/books?page_size=2')
+        titles = []
+        while True:
+            page = json.loads(response.content)
+            titles.extend(book['title'] for book in page['results'])
+            if page['next'] is None:
+                break
+            response = await self.async_client.get(page['next'])
+        self.assertEqual([book.title for book in self.books], titles)
+
+    async def test_not_found(self):
+        await self.login(self.general_user)
+        response = await self.async_client.get('/api/async/books/0')
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    async def test_unauthenticated(self):
+        response = await self.async_client.get('/api/async/books')
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+        self.assertEqual('Bearer realm="api"', response['WWW-Authenticate'])
+
+        response = await self.async_client.get(
+            '/api/async/books', headers={'Authorization': 'Bearer not-a-key'})
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+    async def test_forbidden(self):
+        await self.login(await sync_to_async(create_user)())
+        response = await self.async_client.get('/api/async/books')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+    async def test_bearer_token(self):
+        key = generate_key()
+        await models.AccessToken.objects.acreate(
+            user=self.general_user, name='async', digest=hash_key(key))
+
+        response = await self.async_client.get(
+            '/api/async/book-checkouts', headers={'Authorization': f'Bearer {key}'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(
+            [self.books[0].id],
+            [entry['book_id'] for entry in json.loads(response.content)['results']]
+        )
+
+    async def test_read_only(self):
+        await self.login(self.admin_user)
+        response = await self.async_client.post('/api/async/books', {})
+        self.assertEqual(status.HTTP_405_METHOD_NOT_ALLOWED, response.status_code)
+
+
+class CompareAsyncCommandTest(TransactionTestCase):
+    """
+    Committed rows, so the threads serving the requests can see them
+    """
+
+    def test_every_mode_answers(self):
+        admin_group, _, _ = create_default_groups()
+        create_user(username='admin', groups=[admin_group])
+        create_genre(name='Sci-Fi')
+        out = StringIO()
+
+        call_command(
+            'compare_async', paths=['genres'], requests=4, concurrency=2, user='admin',
+            host='testserver', stdout=out)
+
+        rows = [line.split() for line in out.getvalue().splitlines()[1:]]
+        self.assertEqual(['wsgi', 'asgi', 'asgi-async'], [row[0] for row in rows])
+        self.assertEqual(['0', '0', '0'], [row[-1] for row in rows])
+        self.assertFalse(models.AccessToken.objects.exists())
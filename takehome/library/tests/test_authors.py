@@ -146,31 +146,31 @@ class AuthorsTest(APITestCase):
         
         response = view(request)
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(2, len(response.data))
+        self.assertEqual(2, len(response.data['results']))
         self.assertListEqual([
             {
-                'id': 1,
-                'first_name': 'Joey',
-                'last_name': 'Jay',
+                'id': 2,
+                'first_name': 'Jane',
+                'last_name': 'Doe',
                 'books': [
                     {
-                        'id': 1,
-                        'title': 'Book Title 1'
+                        'id': 2,
+                        'title': 'Book Title 2'
                     }
                 ]
             },
             {
-                'id': 2,
-                'first_name': 'Jane',
-                'last_name': 'Doe',
+                'id': 1,
+                'first_name': 'Joey',
+                'last_name': 'Jay',
                 'books': [
                     {
-                        'id': 2,
-                        'title': 'Book Title 2'
+                        'id': 1,
+                        'title': 'Book Title 1'
                     }
                 ]
             }],
-            response.data
+            response.data['results']
         )
     
     def test_editor_create_author(self):
@@ -351,3 +351,27 @@ class AuthorsTest(APITestCase):
         
         self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
         self.assertEqual(1, len(models.Author.objects.all()))
+    
+    def test_filter_and_order_authors(self):
+        """
+        Authors are listed by last then first name and can be filtered by either
+        """
+        create_author(first_name='John', last_name='Doe')
+        create_author(first_name='Jane', last_name='Doe')
+        create_author(first_name='Jane', last_name='Austen')
+        view = views.AuthorViewSet.as_view({'get': 'list'})
+        
+        for params, expected in (
+            ({}, [3, 2, 1]),
+            ({'last_name': 'Doe'}, [2, 1]),
+            ({'first_name': 'Jane'}, [3, 2]),
+            ({'ordering': 'first_name'}, [2, 3, 1]),
+            ({'ordering': '-last_name,-first_name'}, [1, 2, 3]),
+        ):
+            request = self.factory.get('/authors/', params)
+            force_authenticate(request, user=self.general_user)
+            response = view(request)
+            
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            self.assertListEqual(
+                expected, [author['id'] for author in response.data['results']], params)
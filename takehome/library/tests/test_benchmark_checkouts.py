@@ -0,0 +1,68 @@
+import datetime
+import logging
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.wsgi import get_wsgi_application
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from library import models
+from library.management.commands._bench import quiet_request_log
+from library.management.commands.benchmark_checkouts import violations
+from .test_data_helper import create_book, create_checkout_leger, create_default_groups
+
+
+class ViolationsTest(TestCase):
+
+    def test_consistent_history(self):
+        book = create_book()
+        since = timezone.now() - datetime.timedelta(hours=1)
+        first = create_checkout_leger(book=book, return_time=timezone.now())
+        create_checkout_leger(book=book, user=first.user, return_time=None)
+
+        self.assertEqual([], violations([book.id], since))
+
+    def test_overlapping_loans(self):
+        book = create_book()
+        since = timezone.now() - datetime.timedelta(hours=1)
+        first = create_checkout_leger(book=book, return_time=timezone.now())
+        second = create_checkout_leger(book=book, user=first.user, return_time=None)
+        # A return recorded after the next checkout started
+        models.CheckoutLeger.objects.filter(pk=first.pk).update(
+            return_time=second.checkout_time + datetime.timedelta(seconds=1))
+
+        self.assertEqual(['1 loans started before the one before them ended'], violations([book.id], since))
+
+
+class QuietRequestLogTest(TestCase):
+
+    def test_survives_building_an_application(self):
+        with quiet_request_log():
+            # Sets logging up again
+            get_wsgi_application()
+            with self.assertNoLogs('django.request'):
+                logging.getLogger('django.request').warning('Conflict: /api/books/1/checkout')
+
+
+class BenchmarkCheckoutsCommandTest(TransactionTestCase):
+
+    def test_patrons_compete(self):
+        create_default_groups()
+        create_book()
+        create_book()
+        out = StringIO()
+
+        call_command(
+            'benchmark_checkouts', patrons=5, books=2, hold=0, seconds=0.5, host='testserver', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        rows = {line.split()[0]: line.split() for line in lines[1:3]}
+        self.assertEqual({'checkout', 'return'}, set(rows))
+        self.assertGreater(int(rows['checkout'][3]), 0)
+        self.assertEqual(rows['checkout'][3], rows['return'][3])
+        self.assertEqual('The leger is consistent', lines[-1])
+        # The patrons and their loans were in the copy
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(models.CheckoutLeger.objects.exists())
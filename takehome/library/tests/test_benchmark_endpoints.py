@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase
+from django.urls import get_resolver
+
+from library import models
+from library.management.commands.benchmark_endpoints import ENDPOINTS
+from .test_data_helper import create_book, create_default_groups
+
+
+class BenchmarkEndpointsCommandTest(TransactionTestCase):
+
+    def setUp(self):
+        create_default_groups()
+        for _ in range(3):
+            create_book()
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, 'results.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def benchmark(self, **options):
+        call_command(
+            'benchmark_endpoints', current_database=True, iterations=1, host='testserver',
+            output=self.output, stdout=StringIO(), stderr=StringIO(), **options)
+        with open(self.output) as output:
+            return json.load(output)
+
+    def test_every_route_is_timed(self):
+        routes = {name for name in get_resolver('library.urls').reverse_dict if isinstance(name, str)}
+        self.assertEqual(routes, {endpoint.name for endpoint in ENDPOINTS})
+
+    def test_results_and_baseline(self):
+        results = self.benchmark()
+
+        self.assertEqual({endpoint.key for endpoint in ENDPOINTS}, set(results['results']))
+        for key, roles in results['results'].items():
+            self.assertEqual({'General', 'Editor', 'Administrator'}, set(roles), key)
+        results = results['results']
+        self.assertEqual(200, results['GET book-list']['Administrator']['status'])
+        self.assertEqual(201, results['POST book-list']['Administrator']['status'])
+        self.assertEqual(403, results['POST book-list']['General']['status'])
+        self.assertGreater(results['GET book-list']['Administrator']['queries'], 0)
+        # The requests wrote to a copy
+        self.assertEqual(3, models.Book.objects.count())
+        self.assertFalse(models.CheckoutLeger.objects.exists())
+
+        baseline = os.path.join(self.directory.name, 'baseline.json')
+        os.replace(self.output, baseline)
+        self.benchmark(baseline=baseline, threshold=1000, min_delta_ms=1000)
+
+    def test_more_queries_is_a_regression(self):
+        baseline = os.path.join(self.directory.name, 'baseline.json')
+        results = self.benchmark()
+        results['results']['GET book-list']['General']['queries'] -= 1
+        with open(baseline, 'w') as output:
+            json.dump(results, output)
+
+        with self.assertRaisesMessage(CommandError, '1 regressions'):
+            self.benchmark(baseline=baseline, threshold=1000, min_delta_ms=1000)
+
+    def test_baseline_of_another_size(self):
+        baseline = os.path.join(self.directory.name, 'baseline.json')
+        with open(baseline, 'w') as output:
+            json.dump({'sizes': {'books': 1}, 'profile': 'production', 'results': {}}, output)
+
+        with self.assertRaises(CommandError):
+            self.benchmark(baseline=baseline)
+
+    def test_baseline_of_another_profile(self):
+        baseline = os.path.join(self.directory.name, 'baseline.json')
+        results = self.benchmark(profile='development')
+        with open(baseline, 'w') as output:
+            json.dump(results, output)
+
+        with self.assertRaisesMessage(CommandError, 'development profile'):
+            self.benchmark(baseline=baseline)
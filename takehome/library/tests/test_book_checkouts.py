@@ -1,9 +1,14 @@
 import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 
 from rest_framework import status
 from rest_framework.test import (
     APIRequestFactory,
     APITestCase,
+    APITransactionTestCase,
     force_authenticate
 )
 
@@ -15,7 +20,8 @@ from .test_data_helper import (
     create_user,
     create_group,
     get_permissions,
-    create_checkout_leger
+    create_checkout_leger,
+    create_default_groups
 )
 
 
@@ -184,7 +190,7 @@ class CheckoutsTests(APITestCase):
                     'last_name': 'Smith'
                 }
             }],
-            response.data
+            response.data['results']
         )
 
     def test_checkout_successful(self):
@@ -222,7 +228,7 @@ class CheckoutsTests(APITestCase):
                     'last_name': 'Collins'
                 }
             }],
-            response.data
+            response.data['results']
         )
 
     def test_checkout_failure(self):
@@ -248,7 +254,21 @@ class CheckoutsTests(APITestCase):
         view = views.BookViewSet.as_view({'post': 'checkout'})
         response = view(request2, pk=1)
 
-        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual(status.HTTP_409_CONFLICT, response.status_code)
+
+    def test_one_open_checkout_per_book(self):
+        """
+        The database refuses a second unreturned entry for the same book,
+        whatever path it's written through
+        """
+        book = create_book()
+        create_checkout_leger(book=book, user=self.general_user_1, return_time=None)
+        create_checkout_leger(book=book, user=self.general_user_1)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            create_checkout_leger(book=book, user=self.general_user_2, return_time=None)
+
+        self.assertEqual(2, models.CheckoutLeger.objects.filter(book=book).count())
 
     def test_return_successful(self):
         """
@@ -438,5 +458,204 @@ class CheckoutsTests(APITestCase):
                     'last_name': 'Anderson'
                 }
             }],
+            response.data['results']
+        )
+
+    def create_overdue_checkouts(self):
+        today = datetime.date.today()
+        for user, days in ((self.general_user_1, 1), (self.general_user_2, 10),
+                           (self.general_user_1, 20), (self.editor_user, -5)):
+            create_checkout_leger(
+                book=create_book(),
+                user=user,
+                return_time=None,
+                due_date=today - datetime.timedelta(days=days)
+            )
+        create_checkout_leger(
+            book=create_book(),
+            user=self.general_user_1,
+            due_date=today - datetime.timedelta(days=30)
+        )
+
+    def get_overdue(self, **params):
+        request = self.factory.get('/book-checkouts/overdue', params)
+        force_authenticate(request, user=self.admin_user)
+        view = views.CheckoutsViewSet.as_view({'get': 'overdue'})
+        return view(request)
+
+    def test_overdue_filters(self):
+        """
+        The overdue report can be narrowed down by how late the books are
+        and by who has them
+        """
+        self.create_overdue_checkouts()
+
+        response = self.get_overdue(older_than_days=5)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertListEqual([3, 2], [entry['book_id'] for entry in response.data['results']])
+
+        response = self.get_overdue(user=self.general_user_1.pk)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertListEqual([3, 1], [entry['book_id'] for entry in response.data['results']])
+
+        response = self.get_overdue(older_than_days='soon')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+        response = self.get_overdue(older_than_days=99999999)
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_overdue_query_count(self):
+        """
+        A page of the overdue report is a single query after the role lookup
+        """
+        self.create_overdue_checkouts()
+        self.admin_user = get_user_model().objects.get(pk=self.admin_user.pk)
+
+        with self.assertNumQueries(2):
+            response = self.get_overdue()
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(3, len(response.data['results']))
+
+    def test_stream_overdue(self):
+        """
+        The whole overdue report can be streamed in the same shape as a page
+        """
+        self.create_overdue_checkouts()
+
+        response = self.get_overdue(stream='true')
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response.streaming)
+        entries = json.loads(b''.join(response.streaming_content))
+        self.assertListEqual(self.get_overdue().data['results'], entries)
+
+    def test_general_cannot_view_overdue(self):
+        request = self.factory.get('/book-checkouts/overdue')
+        force_authenticate(request, user=self.general_user_1)
+        view = views.CheckoutsViewSet.as_view({'get': 'overdue'})
+        response = view(request)
+
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+    def test_bulk_checkout(self):
+        """
+        A batch of books is checked out in one request, with a result for
+        each of them
+        """
+        book1, book2, book3 = create_book(), create_book(), create_book()
+        create_checkout_leger(book=book2, user=self.general_user_2, return_time=None)
+        create_checkout_leger(book=book3, user=self.general_user_2)
+
+        request = self.factory.post(
+            '/books/checkout',
+            data={'books': [book1.pk, book2.pk, book3.pk, 99, book1.pk]},
+            format='json'
+        )
+        force_authenticate(
+            request, user=get_user_model().objects.get(pk=self.general_user_1.pk))
+        view = views.BookViewSet.as_view({'post': 'bulk_checkout'})
+        # role, availability, savepoint, insert, version bump, confirmation,
+        # release
+        with self.assertNumQueries(7):
+            response = view(request)
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertListEqual([
+            {'book_id': book1.pk, 'status': 'checked_out'},
+            {'book_id': book2.pk, 'status': 'conflict'},
+            {'book_id': book3.pk, 'status': 'checked_out'},
+            {'book_id': 99, 'status': 'not_found'}],
             response.data
         )
+        self.assertSetEqual(
+            {book1.pk, book3.pk},
+            set(models.CheckoutLeger.objects.filter(
+                user=self.general_user_1,
+                return_time__isnull=True
+            ).values_list('book_id', flat=True))
+        )
+
+    def test_bulk_checkout_needs_books(self):
+        request = self.factory.post('/books/checkout', data={'books': []}, format='json')
+        force_authenticate(request, user=self.general_user_1)
+        view = views.BookViewSet.as_view({'post': 'bulk_checkout'})
+        response = view(request)
+
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def bulk_return(self, user, book_ids):
+        request = self.factory.post(
+            '/book-checkouts/return', data={'books': book_ids}, format='json')
+        force_authenticate(request, user=user)
+        view = views.CheckoutsViewSet.as_view({'post': 'bulk_return'})
+        return view(request)
+
+    def test_bulk_return(self):
+        """
+        A user can return a batch of their own books, but not anybody else's
+        """
+        book1, book2, book3 = create_book(), create_book(), create_book()
+        create_checkout_leger(book=book1, user=self.general_user_1, return_time=None)
+        create_checkout_leger(book=book2, user=self.general_user_2, return_time=None)
+
+        response = self.bulk_return(self.general_user_1, [book1.pk, book2.pk, book3.pk])
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertListEqual([
+            {'book_id': book1.pk, 'status': 'returned'},
+            {'book_id': book2.pk, 'status': 'forbidden'},
+            {'book_id': book3.pk, 'status': 'not_checked_out'}],
+            response.data
+        )
+        self.assertListEqual(
+            [book2.pk],
+            list(models.CheckoutLeger.objects.filter(
+                return_time__isnull=True).values_list('book_id', flat=True))
+        )
+
+    def test_admin_bulk_return(self):
+        book1, book2 = create_book(), create_book()
+        create_checkout_leger(book=book1, user=self.general_user_1, return_time=None)
+        create_checkout_leger(book=book2, user=self.general_user_2, return_time=None)
+
+        response = self.bulk_return(self.admin_user, [book1.pk, book2.pk])
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertListEqual(
+            ['returned', 'returned'], [result['status'] for result in response.data])
+        self.assertFalse(models.CheckoutLeger.objects.filter(return_time__isnull=True).exists())
+
+
+class CheckoutCommitTests(APITransactionTestCase):
+    """
+    Checkouts whose outcome is only known once the insert is committed
+    """
+
+    def setUp(self):
+        admin_group, editor_group, general_group = create_default_groups()
+        self.general_user = create_user(groups=[general_group])
+        self.factory = APIRequestFactory()
+
+    def test_checkout_missing_book(self):
+        """
+        Checking out a book that doesn't exist is a 404, not a conflict
+        """
+        request = self.factory.post('/books/1/checkout/')
+        force_authenticate(request, user=self.general_user)
+        view = views.BookViewSet.as_view({'post': 'checkout'})
+        response = view(request, pk=1)
+
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        self.assertEqual(0, models.CheckoutLeger.objects.count())
+
+    def test_checkout_conflict(self):
+        book = create_book()
+        create_checkout_leger(book=book, return_time=None)
+
+        request = self.factory.post('/books/1/checkout/')
+        force_authenticate(request, user=self.general_user)
+        view = views.BookViewSet.as_view({'post': 'checkout'})
+        response = view(request, pk=book.pk)
+
+        self.assertEqual(status.HTTP_409_CONFLICT, response.status_code)
@@ -0,0 +1,138 @@
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import (
+    APIRequestFactory,
+    APITestCase,
+    force_authenticate
+)
+
+from library import views
+from .test_data_helper import (
+    create_author,
+    create_book,
+    create_default_groups,
+    create_genre,
+    create_user
+)
+
+
+'''
+Query budgets for every `/api/books` action.
+
+Each budget is the total number of queries a single request is allowed
+to make, including the permission lookups for a user whose permission
+cache is cold. If a change to the books endpoints pushes a count over its
+budget, either the change introduced an N+1 or the budget needs to be
+consciously revised here. Savepoints for atomic blocks nested in the
+test's transaction are counted too.
+
+Reads look up the catalog versions for their ETag, and writes bump them
+once per row saved and once per change to a book's authors. Listening for
+author changes makes `add()` look up the links that already exist, so a
+create or update that sets authors makes three more queries than it
+otherwise would.
+'''
+BOOK_QUERY_BUDGETS = {
+    'list': 4,
+    'retrieve': 4,
+    'create': 11,
+    'partial_update': 10,
+    'destroy': 7,
+    'checkout': 5,
+}
+
+
+class BookQueryBudgetTest(APITestCase):
+
+    def setUp(self):
+        admin_group, editor_group, general_group = create_default_groups()
+        self.general_user = create_user(
+            username='general',
+            groups=[general_group]
+        )
+        self.editor_user = create_user(
+            username='editor',
+            groups=[editor_group]
+        )
+        self.admin_user = create_user(
+            username='admin',
+            groups=[admin_group]
+        )
+        self.factory = APIRequestFactory()
+
+    def create_books(self, count):
+        genre = create_genre()
+        authors = [create_author(), create_author()]
+        return [create_book(genre=genre, authors=authors) for _ in range(count)]
+
+    def assertWithinBudget(self, action, request, user, **kwargs):
+        """
+        Run a single request against the book viewset with a freshly loaded
+        user, so permission lookups are counted the same way every time
+        """
+        user = get_user_model().objects.get(pk=user.pk)
+        force_authenticate(request, user=user)
+        method = request.method.lower()
+        view = views.BookViewSet.as_view({method: action})
+        with self.assertNumQueries(BOOK_QUERY_BUDGETS[action]):
+            response = view(request, **kwargs)
+            response.render()
+        return response
+
+    def test_list_is_constant(self):
+        """
+        Listing books costs the same number of queries for any number of books
+        """
+        self.create_books(1)
+        response = self.assertWithinBudget(
+            'list', self.factory.get('/books/'), self.general_user)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+        self.create_books(20)
+        response = self.assertWithinBudget(
+            'list', self.factory.get('/books/'), self.general_user)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_retrieve(self):
+        book, = self.create_books(1)
+        response = self.assertWithinBudget(
+            'retrieve', self.factory.get('/books/'), self.general_user, pk=book.pk)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_create(self):
+        self.create_books(1)
+        request = self.factory.post(
+            path='/books/',
+            data={
+                'title': 'Book Title 1',
+                'genre': 1,
+                'authors': [1, 2],
+                'publish_year': 2021
+            },
+            format='json'
+        )
+        response = self.assertWithinBudget('create', request, self.editor_user)
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+
+    def test_partial_update(self):
+        book, = self.create_books(1)
+        request = self.factory.patch(
+            path='/books/',
+            data={'title': 'Book Title 2', 'authors': [1]},
+            format='json'
+        )
+        response = self.assertWithinBudget(
+            'partial_update', request, self.editor_user, pk=book.pk)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_destroy(self):
+        book, = self.create_books(1)
+        response = self.assertWithinBudget(
+            'destroy', self.factory.delete('/books/'), self.admin_user, pk=book.pk)
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
+
+    def test_checkout(self):
+        book, = self.create_books(1)
+        response = self.assertWithinBudget(
+            'checkout', self.factory.post('/books/1/checkout/'), self.general_user, pk=book.pk)
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
@@ -0,0 +1,100 @@
+from unittest import skipUnless
+
+from django.db import connection
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from library import models, views
+from library.ingest import ingest_books
+from .test_data_helper import create_author, create_book, create_default_groups, create_user
+
+
+@skipUnless(connection.vendor == 'sqlite', 'The search index is SQLite FTS5')
+class BookSearchTest(APITestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        admin_group, editor_group, general_group = create_default_groups()
+        self.user = create_user(groups=[general_group])
+        self.tolkien = create_author(first_name='John', last_name='Tolkien')
+        self.hobbit = create_book(title='The Hobbit', authors=[self.tolkien])
+        self.rings = create_book(title='The Fellowship of the Ring', authors=[self.tolkien])
+        self.companion = create_book(
+            title='A Tolkien Companion',
+            authors=[create_author(first_name='John', last_name='Tyler')]
+        )
+
+    def search(self, **params):
+        request = self.factory.get('/books/search', params)
+        force_authenticate(request, user=self.user)
+        return views.BookViewSet.as_view({'get': 'search'})(request)
+
+    def found(self, q):
+        response = self.search(q=q)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return [book['id'] for book in response.data['results']]
+
+    def test_search_title_and_authors(self):
+        self.assertEqual([self.hobbit.id], self.found('hobb'))
+        self.assertEqual([self.rings.id], self.found('tolk fellow'))
+        # A title match outranks an author match
+        self.assertEqual(self.companion.id, self.found('tolkien')[0])
+        self.assertCountEqual(
+            [self.hobbit.id, self.rings.id, self.companion.id], self.found('tolkien'))
+
+    def test_search_results(self):
+        response = self.search(q='hobbit')
+        book = response.data['results'][0]
+
+        self.assertEqual('The Hobbit', book['title'])
+        self.assertTrue(book['is_available'])
+
+    def test_index_follows_changes(self):
+        self.hobbit.title = 'There and Back Again'
+        self.hobbit.save()
+        self.assertEqual([], self.found('hobbit'))
+        self.assertEqual([self.hobbit.id], self.found('back again'))
+
+        self.tolkien.last_name = 'Tolkein'
+        self.tolkien.save()
+        self.assertCountEqual([self.hobbit.id, self.rings.id], self.found('tolkein'))
+
+        self.rings.authors.set([create_author(first_name='Ann', last_name='Other')])
+        self.assertEqual([self.hobbit.id], self.found('tolkein'))
+        self.assertEqual([self.rings.id], self.found('other'))
+
+        self.rings.delete()
+        self.assertEqual([], self.found('fellowship'))
+
+    def test_ingested_books_are_indexed(self):
+        ingest_books([dict(
+            title='The Silmarillion',
+            publish_year=1977,
+            genre='Fantasy',
+            authors=[dict(first_name='Christopher', last_name='Tolkien')]
+        )])
+        book = models.Book.objects.get(title='The Silmarillion')
+
+        self.assertEqual([book.id], self.found('christopher silm'))
+
+    def test_search_pages(self):
+        for number in range(5):
+            create_book(title=f'Hobbit Sequel {number}')
+
+        response = self.search(q='hobbit', limit=4)
+        self.assertEqual(4, len(response.data['results']))
+        self.assertIsNone(response.data['previous'])
+        self.assertIn('offset=4', response.data['next'])
+
+        response = self.search(q='hobbit', limit=4, offset=4)
+        self.assertEqual(2, len(response.data['results']))
+        self.assertIsNone(response.data['next'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual([self.hobbit.id], self.found('"hobbit" ^(*:'))
+        # Operators are just more words to match
+        self.assertEqual([], self.found('hobbit OR fellowship'))
+
+    def test_empty_query(self):
+        response = self.search(q=' ?! ')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
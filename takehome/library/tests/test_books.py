@@ -1,3 +1,7 @@
+import datetime
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.test import (
     APIRequestFactory,
@@ -12,7 +16,8 @@ from .test_data_helper import (
     create_genre,
     create_user,
     create_group,
-    get_permissions
+    get_permissions,
+    create_checkout_leger
 )
 
 
@@ -124,7 +129,8 @@ class BooksTest(APITestCase):
                 'genre': {
                     'id': 1,
                     'name': 'Mystery'
-                }
+                },
+                'is_available': True
             },
             response1.data
         )
@@ -142,7 +148,8 @@ class BooksTest(APITestCase):
                 'genre': {
                     'id': 2,
                     'name': 'Romance'
-                }
+                },
+                'is_available': True
             },
             response2.data
         )
@@ -171,7 +178,7 @@ class BooksTest(APITestCase):
 
         response = view(request)
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(2, len(response.data))
+        self.assertEqual(2, len(response.data['results']))
         self.assertListEqual([
             {
                 'id': 1,
@@ -183,7 +190,8 @@ class BooksTest(APITestCase):
                 'genre': {
                     'id': 1,
                     'name': 'Mystery'
-                }
+                },
+                'is_available': True
             },
             {
                 'id': 2,
@@ -195,9 +203,10 @@ class BooksTest(APITestCase):
                 'genre': {
                     'id': 2,
                     'name': 'Romance'
-                }
+                },
+                'is_available': True
             }],
-            response.data
+            response.data['results']
         )
 
     def test_editor_create_book(self):
@@ -425,3 +434,234 @@ class BooksTest(APITestCase):
 
         self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
         self.assertEqual(1, len(models.Book.objects.all()))
+
+    def test_book_availability(self):
+        """
+        Books say whether they're on the shelf, and only admins see when a
+        checked out book is due back
+        """
+        book1 = create_book(title='Book Title 1')
+        create_book(title='Book Title 2')
+        due_date = datetime.date.today() + datetime.timedelta(days=3)
+        create_checkout_leger(book=book1, return_time=None, due_date=due_date)
+        
+        request = self.factory.get('/books/')
+        force_authenticate(request, user=self.general_user)
+        view = views.BookViewSet.as_view({'get': 'list'})
+        response = view(request)
+        
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertListEqual(
+            [(1, False), (2, True)],
+            [(book['id'], book['is_available']) for book in response.data['results']]
+        )
+        self.assertNotIn('due_date', response.data['results'][0])
+        
+        request = self.factory.get('/books/')
+        force_authenticate(request, user=self.admin_user)
+        view = views.BookViewSet.as_view({'get': 'retrieve'})
+        response = view(request, pk=1)
+        
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertFalse(response.data['is_available'])
+        self.assertEqual(str(due_date), response.data['due_date'])
+        
+    def test_filter_available_books(self):
+        """
+        Books can be filtered by whether they can be borrowed right now
+        """
+        book1 = create_book(title='Book Title 1')
+        book2 = create_book(title='Book Title 2')
+        create_book(title='Book Title 3')
+        create_checkout_leger(book=book1, return_time=None)
+        create_checkout_leger(book=book2)
+        
+        view = views.BookViewSet.as_view({'get': 'list'})
+        for available, expected in (('true', [2, 3]), ('false', [1])):
+            request = self.factory.get('/books/', {'available': available})
+            force_authenticate(request, user=self.general_user)
+            response = view(request)
+            
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            self.assertListEqual(
+                expected, [book['id'] for book in response.data['results']])
+        
+        request = self.factory.get('/books/', {'available': 'maybe'})
+        force_authenticate(request, user=self.general_user)
+        response = view(request)
+        
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def ingest(self, user, records):
+        request = self.factory.post('/books/ingest', data={'books': records}, format='json')
+        force_authenticate(request, user=user)
+        view = views.BookViewSet.as_view({'post': 'ingest'})
+        return view(request)
+
+    def test_editor_ingest_books(self):
+        """
+        An editor can add a batch of books with their authors and genres by
+        name, reusing the ones that already exist
+        """
+        create_genre(name='Mystery')
+        create_author(first_name='Jane', last_name='Doe')
+        
+        response = self.ingest(self.editor_user, [
+            {
+                'title': 'Book Title 1',
+                'publish_year': 2001,
+                'genre': 'Mystery',
+                'authors': [{'first_name': 'Jane', 'last_name': 'Doe'}]
+            },
+            {
+                'title': 'Book Title 2',
+                'publish_year': 2002,
+                'genre': 'Romance',
+                'authors': [
+                    {'first_name': 'Jane', 'last_name': 'Doe'},
+                    {'first_name': 'Joey', 'last_name': 'Jay'}
+                ]
+            },
+            {
+                'title': 'Book Title 3',
+                'publish_year': 2003,
+                'authors': []
+            },
+        ])
+        
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertEqual(2, response.data['created'])
+        self.assertEqual({'index': 0, 'id': 1}, response.data['results'][0])
+        self.assertEqual({'index': 1, 'id': 2}, response.data['results'][1])
+        self.assertIn('authors', response.data['results'][2]['errors'])
+        
+        self.assertEqual(2, models.Genre.objects.count())
+        self.assertEqual(2, models.Author.objects.count())
+        book1, book2 = models.Book.objects.order_by('id')
+        self.assertEqual('Mystery', book1.genre.name)
+        self.assertEqual('Romance', book2.genre.name)
+        self.assertListEqual(
+            [('Jane', 'Doe'), ('Joey', 'Jay')],
+            list(book2.authors.order_by('id').values_list('first_name', 'last_name'))
+        )
+        
+    def test_ingest_records_that_are_not_objects(self):
+        """
+        A record that isn't an object is rejected on its own
+        """
+        response = self.ingest(self.editor_user, [
+            'Book Title 1',
+            {
+                'title': 'Book Title 2',
+                'publish_year': 2002,
+                'authors': [{'first_name': 'Jane', 'last_name': 'Doe'}]
+            },
+            None,
+            [],
+        ])
+        
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertEqual(1, response.data['created'])
+        self.assertEqual({'index': 1, 'id': 1}, response.data['results'][1])
+        for index in (0, 2, 3):
+            self.assertEqual(index, response.data['results'][index]['index'])
+            self.assertIn('non_field_errors', response.data['results'][index]['errors'])
+        
+    def test_ingest_query_count(self):
+        """
+        Ingesting costs the same number of queries for any number of books
+        """
+        def records(count):
+            return [
+                {
+                    'title': f'Book Title {index}',
+                    'publish_year': 2000 + index,
+                    'genre': f'Genre {index % 3}',
+                    'authors': [{'first_name': 'Jane', 'last_name': f'Doe {index}'}]
+                } for index in range(count)
+            ]
+        
+        # role, savepoint, genre and author lookups and inserts, books,
+        # author links, version bump and release
+        self.editor_user = get_user_model().objects.get(pk=self.editor_user.pk)
+        with self.assertNumQueries(10):
+            self.ingest(self.editor_user, records(2))
+        self.editor_user = get_user_model().objects.get(pk=self.editor_user.pk)
+        with self.assertNumQueries(10):
+            response = self.ingest(self.editor_user, records(40))
+        
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertEqual(42, models.Book.objects.count())
+        self.assertEqual(42, models.Book.authors.through.objects.count())
+        
+    def test_general_cannot_ingest_books(self):
+        response = self.ingest(self.general_user, [
+            {
+                'title': 'Book Title 1',
+                'publish_year': 2001,
+                'authors': [{'first_name': 'Jane', 'last_name': 'Doe'}]
+            }
+        ])
+        
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+        self.assertEqual(0, models.Book.objects.count())
+    
+    def list_books(self, params):
+        request = self.factory.get('/books/', params)
+        force_authenticate(request, user=self.general_user)
+        view = views.BookViewSet.as_view({'get': 'list'})
+        return view(request)
+    
+    def test_filter_books(self):
+        """
+        Books can be filtered by genre, publish year and author
+        """
+        mystery = create_genre(name='Mystery')
+        doe = create_author(first_name='Jane', last_name='Doe')
+        other_doe = create_author(first_name='John', last_name='Doe')
+        create_book(title='Book Title 1', publish_year=1990, genre=mystery, authors=[doe, other_doe])
+        create_book(title='Book Title 2', publish_year=2000, genre=mystery)
+        create_book(title='Book Title 3', publish_year=2010, authors=[other_doe])
+        
+        for params, expected in (
+            ({'genre': mystery.id}, [1, 2]),
+            ({'publish_year_min': 2000}, [2, 3]),
+            ({'publish_year_max': 2000}, [1, 2]),
+            ({'publish_year_min': 1995, 'publish_year_max': 2005}, [2]),
+            ({'author': doe.id}, [1]),
+            ({'author_last_name': 'Doe'}, [1, 3]),
+            ({'genre': mystery.id, 'author': other_doe.id}, [1]),
+        ):
+            response = self.list_books(params)
+            
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            self.assertListEqual(
+                expected, [book['id'] for book in response.data['results']], params)
+        
+        response = self.list_books({'publish_year_min': 'recent'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+    
+    def test_order_books(self):
+        """
+        Books are in title order unless ordered by publish year, and paging
+        follows the chosen order
+        """
+        create_book(title='Book Title A', publish_year=2010)
+        create_book(title='Book Title B', publish_year=1990)
+        create_book(title='Book Title C', publish_year=2010)
+        
+        for ordering, expected in (
+            (None, [1, 2, 3]),
+            ('publish_year', [2, 1, 3]),
+            ('-publish_year', [3, 1, 2]),
+            ('-title', [3, 2, 1]),
+        ):
+            params = {'ordering': ordering} if ordering else {}
+            response = self.list_books(params)
+            self.assertListEqual(
+                expected, [book['id'] for book in response.data['results']], ordering)
+        
+        response = self.list_books({'ordering': '-publish_year', 'page_size': 2})
+        next_page = parse_qs(urlparse(response.data['next']).query)
+        response = self.list_books(next_page)
+        self.assertListEqual([2], [book['id'] for book in response.data['results']])
@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from library import models
+from library.ingest import ingest_books
+from .test_data_helper import (
+    create_author,
+    create_book,
+    create_checkout_leger,
+    create_default_groups,
+    create_genre,
+    create_user
+)
+
+
+class ConditionalGetTest(APITestCase):
+
+    def setUp(self):
+        admin_group, editor_group, general_group = create_default_groups()
+        self.general_user = create_user(username='general', groups=[general_group])
+        self.admin_user = create_user(username='admin', groups=[admin_group])
+        self.book = create_book(title='Book Title 1')
+        self.client = self.client_for(self.general_user)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def assertNotModified(self, path, response, client=None):
+        client = client or self.client
+        revalidated = client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, revalidated.status_code)
+        return revalidated
+
+    def assertModified(self, path, response, client=None):
+        client = client or self.client
+        revalidated = client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(status.HTTP_200_OK, revalidated.status_code)
+        self.assertNotEqual(response['ETag'], revalidated['ETag'])
+        return revalidated
+
+    def test_validators(self):
+        response = self.client.get('/api/books')
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+
+    def test_not_modified_loads_no_rows(self):
+        """
+        A revalidated list costs the role and the versions, and nothing else
+        """
+        response = self.client.get('/api/books')
+        self.client.force_authenticate(
+            user=get_user_model().objects.get(pk=self.general_user.pk))
+
+        with self.assertNumQueries(2):
+            revalidated = self.assertNotModified('/api/books', response)
+        self.assertEqual(response['ETag'], revalidated['ETag'])
+        self.assertEqual(b'', revalidated.content)
+
+    def test_if_modified_since(self):
+        response = self.client.get('/api/genres')
+
+        revalidated = self.client.get(
+            '/api/genres', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, revalidated.status_code)
+
+    def test_detail(self):
+        path = f'/api/books/{self.book.id}'
+        response = self.client.get(path)
+        self.assertNotModified(path, response)
+
+        self.book.title = 'Book Title 2'
+        self.book.save()
+        response = self.assertModified(path, response)
+        self.assertEqual('Book Title 2', response.data['title'])
+
+    def test_changes_invalidate(self):
+        """
+        Every kind of write to a table the books are built from is seen,
+        including bulk ones that skip model signals
+        """
+        changes = (
+            lambda: create_book(),
+            lambda: self.book.authors.add(create_author()),
+            lambda: models.Author.objects.filter(pk=self.book.authors.first().pk).first().save(),
+            lambda: create_genre(),
+            lambda: create_checkout_leger(book=self.book, user=self.general_user, return_time=None),
+            lambda: self.client.post('/api/book-checkouts/return', {'books': [self.book.id]}),
+            lambda: ingest_books([dict(
+                title='Book Title 3',
+                publish_year=2001,
+                authors=[dict(first_name='Jane', last_name='Doe')]
+            )]),
+        )
+        response = self.client.get('/api/books')
+        for change in changes:
+            change()
+            response = self.assertModified('/api/books', response)
+
+    def test_unrelated_changes_keep_validators(self):
+        response = self.client.get('/api/genres')
+
+        create_author()
+        create_checkout_leger(book=self.book, return_time=None)
+
+        self.assertNotModified('/api/genres', response)
+
+    def test_validators_differ_by_role(self):
+        """
+        Admins see due dates, so their copy never validates someone else's
+        """
+        response = self.client.get('/api/books')
+
+        admin = self.client_for(self.admin_user)
+        revalidated = admin.get('/api/books', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(status.HTTP_200_OK, revalidated.status_code)
+
+    def test_counters_recreated(self):
+        """
+        Changes are still counted if the counters were wiped
+        """
+        response = self.client.get('/api/genres')
+        models.CatalogVersion.objects.all().delete()
+
+        create_genre()
+
+        self.assertModified('/api/genres', response)
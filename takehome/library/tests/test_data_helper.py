@@ -97,4 +97,64 @@ def create_checkout_leger(book=None, user=None, **kwargs):
     )
     if kwargs:
         defaults.update(**kwargs)
-    return models.CheckoutLeger.objects.create(**defaults)
\ No newline at end of file
+    return models.CheckoutLeger.objects.create(**defaults)
+
+
+def create_default_groups():
+    """
+    Create the Administrator, Editor and General groups with the same
+    permissions that are shipped in `data.json`
+    """
+    admin_group = create_group(
+        name='Administrator',
+        permissions=get_permissions(
+            'add_author',
+            'change_author',
+            'view_author',
+            'delete_author',
+            'add_book',
+            'view_book',
+            'change_book',
+            'delete_book',
+            'add_checkoutleger',
+            'change_checkoutleger',
+            'view_checkoutleger',
+            'delete_checkoutleger',
+            'add_genre',
+            'change_genre',
+            'view_genre',
+            'delete_genre',
+            'view_user'
+        )
+    )
+    editor_group = create_group(
+        name='Editor',
+        permissions=get_permissions(
+            'add_author',
+            'change_author',
+            'view_author',
+            'add_book',
+            'change_book',
+            'view_book',
+            'add_checkoutleger',
+            'change_checkoutleger',
+            'view_checkoutleger',
+            'delete_checkoutleger',
+            'add_genre',
+            'change_genre',
+            'view_genre'
+        )
+    )
+    general_group = create_group(
+        name='General',
+        permissions=get_permissions(
+            'view_author',
+            'view_book',
+            'add_checkoutleger',
+            'change_checkoutleger',
+            'view_checkoutleger',
+            'delete_checkoutleger',
+            'view_genre'
+        )
+    )
+    return admin_group, editor_group, general_group
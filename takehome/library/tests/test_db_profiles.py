@@ -0,0 +1,86 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.utils import load_backend
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from library import models
+from library.transactions import write_atomic
+from .test_data_helper import create_book, create_user
+
+
+class ProductionProfileTest(SimpleTestCase):
+
+    def connect(self, directory):
+        settings_dict = {
+            **connections.settings['default'],
+            **settings.DATABASE_PROFILES['production'],
+            'NAME': os.path.join(directory, 'db.sqlite3'),
+        }
+        return load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'production')
+
+    def test_transactions_are_deferred(self):
+        self.assertNotIn('transaction_mode', settings.DATABASE_PROFILES['production']['OPTIONS'])
+
+    def test_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            connection = self.connect(directory)
+            try:
+                with connection.cursor() as cursor:
+                    pragmas = {}
+                    for pragma in ('journal_mode', 'synchronous', 'temp_store', 'busy_timeout'):
+                        pragmas[pragma] = cursor.execute(f'PRAGMA {pragma}').fetchone()[0]
+            finally:
+                connection.close()
+        # synchronous=NORMAL is 1 and temp_store=MEMORY is 2
+        self.assertEqual(
+            {'journal_mode': 'wal', 'synchronous': 1, 'temp_store': 2, 'busy_timeout': 20000},
+            pragmas
+        )
+
+
+class BenchmarkConcurrencyCommandTest(TransactionTestCase):
+
+    def test_every_profile_runs(self):
+        create_user(username='admin', is_superuser=True)
+        create_book()
+        out = StringIO()
+
+        call_command(
+            'benchmark_concurrency', seconds=0.5, readers=2, host='testserver', stdout=out)
+
+        rows = [line.split() for line in out.getvalue().splitlines()[1:]]
+        self.assertEqual(sorted(settings.DATABASE_PROFILES), [row[0] for row in rows])
+        for row in rows:
+            self.assertGreater(float(row[1]), 0)
+            self.assertGreater(float(row[4]), 0)
+            self.assertEqual('0', row[-1])
+        # Every write went to the copy
+        self.assertFalse(models.CheckoutLeger.objects.exists())
+        self.assertFalse(models.AccessToken.objects.exists())
+
+
+class WriteAtomicTest(TransactionTestCase):
+
+    def begins(self, atomic):
+        with CaptureQueriesContext(connection) as queries:
+            with atomic():
+                models.Genre.objects.count()
+            with transaction.atomic():
+                models.Genre.objects.count()
+        return [query['sql'] for query in queries if query['sql'].startswith('BEGIN')]
+
+    def test_write_lock_up_front(self):
+        self.assertEqual(['BEGIN IMMEDIATE', 'BEGIN'], self.begins(write_atomic))
+        self.assertEqual(['BEGIN', 'BEGIN'], self.begins(transaction.atomic))
+
+    def test_nested(self):
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            with write_atomic():
+                models.Genre.objects.count()
+        self.assertFalse([query for query in queries if query['sql'].startswith('BEGIN')])
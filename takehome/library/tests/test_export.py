@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from library import models
+from library.export import export
+from .test_data_helper import (
+    create_author,
+    create_book,
+    create_checkout_leger,
+    create_default_groups,
+    create_genre,
+    create_user
+)
+
+
+class ExportTest(APITestCase):
+
+    def setUp(self):
+        admin_group, editor_group, general_group = create_default_groups()
+        self.admin_user = create_user(username='admin', groups=[admin_group])
+        self.general_user = create_user(username='general', groups=[general_group])
+        self.genre = create_genre(name='Jazz')
+        self.authors = [
+            create_author(first_name='Ada', last_name='Lovelace'),
+            create_author(first_name='Alan', last_name='Turing'),
+        ]
+        self.books = [
+            create_book(title=f'Book {i}', genre=self.genre, authors=self.authors)
+            for i in range(5)
+        ]
+        create_checkout_leger(book=self.books[0], user=self.general_user, return_time=None)
+
+    def get(self, user, path):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client.get(path)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_books_ndjson(self):
+        response = self.get(self.general_user, '/api/export/books.ndjson')
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual('application/x-ndjson', response['Content-Type'])
+        self.assertIn('filename="books.ndjson"', response['Content-Disposition'])
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([book.id for book in self.books], [row['id'] for row in rows])
+        self.assertEqual('Jazz', rows[0]['genre'])
+        self.assertEqual([author.id for author in self.authors], rows[0]['author_ids'])
+        self.assertEqual(['Ada Lovelace', 'Alan Turing'], rows[0]['authors'])
+
+    def test_authors_csv(self):
+        response = self.get(self.general_user, '/api/export/authors.csv')
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual('text/csv', response['Content-Type'])
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual(2, len(rows))
+        self.assertEqual('Lovelace', rows[0]['last_name'])
+        self.assertEqual('|'.join(str(book.id) for book in self.books), rows[0]['book_ids'])
+
+    def test_checkouts_admin_only(self):
+        response = self.get(self.general_user, '/api/export/checkouts.ndjson')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+        response = self.get(self.admin_user, '/api/export/checkouts.ndjson')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(1, len(rows))
+        self.assertEqual(self.books[0].id, rows[0]['book_id'])
+
+    def test_unknown_format(self):
+        response = self.get(self.admin_user, '/api/export/books.xml')
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_unknown_export_is_not_found(self):
+        """
+        Any user gets 404 rather than 403 for an export that doesn't exist
+        """
+        for path in ('/api/export/nothing.csv', '/api/export/books.xml'):
+            response = self.get(self.general_user, path)
+            self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code, path)
+
+    def test_export_command(self):
+        """
+        Walking the table in small chunks still exports every row once
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'books.csv')
+            call_command('export_library', 'books', format='csv', output=path, chunk_size=2)
+            with open(path, newline='') as output:
+                rows = list(csv.DictReader(output))
+
+        self.assertEqual(models.Book.objects.count(), len(rows))
+        self.assertEqual([str(book.id) for book in self.books], [row['id'] for row in rows])
+
+
+class ExportTransactionTest(TransactionTestCase):
+
+    def test_no_transaction_between_chunks(self):
+        """
+        A download held open by a slow client mustn't hold a lock, and the
+        walk picks up rows written ahead of it
+        """
+        books = [create_book(title=f'Book {i}') for i in range(3)]
+        lines = export('books', 'ndjson', chunk_size=1)
+
+        self.assertEqual(books[0].id, json.loads(next(lines))['id'])
+        self.assertFalse(connection.in_atomic_block)
+        added = create_book(title='Book 3')
+        self.assertEqual(
+            [book.id for book in books[1:]] + [added.id], [json.loads(line)['id'] for line in lines])
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from library import mixins, serializers, views
+from library.cache import get_cache
+from .test_data_helper import (
+    create_author,
+    create_book,
+    create_checkout_leger,
+    create_default_groups,
+    create_genre,
+    create_user
+)
+
+
+class FragmentCacheTest(APITestCase):
+    """
+    Lists are serialized straight from the viewsets so the whole response
+    cache doesn't get in the way
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.factory = APIRequestFactory()
+        admin_group, editor_group, general_group = create_default_groups()
+        self.general_user = create_user(username='general', groups=[general_group])
+        self.admin_user = create_user(username='admin', groups=[admin_group])
+        self.genre = create_genre(name='Jazz')
+        self.author = create_author(first_name='Jane', last_name='Doe')
+        self.books = [
+            create_book(title=f'Book Title {i}', genre=self.genre, authors=[self.author])
+            for i in range(1, 4)
+        ]
+
+    def list(self, viewset, user=None):
+        request = self.factory.get('/list/')
+        force_authenticate(request, user=user or self.general_user)
+        view = viewset.as_view({'get': 'list'})
+        with mock.patch.object(
+            mixins.CachedResponseMixin, 'build_response', mixins.ConditionalGetMixin.build_response
+        ):
+            return view(request)
+
+    def serialized_books(self, user=None):
+        """
+        The ids of the books serialized from scratch to list them
+        """
+        with mock.patch.object(
+            serializers.BookSerializer,
+            'to_representation',
+            autospec=True,
+            side_effect=serializers.BookSerializer.to_representation
+        ) as to_representation:
+            response = self.list(views.BookViewSet, user)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return sorted(call.args[1].id for call in to_representation.call_args_list), response
+
+    def test_only_changed_rows_serialized(self):
+        serialized, first = self.serialized_books()
+        self.assertEqual([1, 2, 3], serialized)
+
+        serialized, second = self.serialized_books()
+        self.assertEqual([], serialized)
+        self.assertEqual(first.data['results'], second.data['results'])
+
+        self.books[1].title = 'Book Title 2b'
+        self.books[1].save()
+        serialized, response = self.serialized_books()
+        self.assertEqual([2], serialized)
+        self.assertEqual('Book Title 2b', response.data['results'][1]['title'])
+
+    def test_related_changes(self):
+        self.serialized_books()
+
+        self.author.last_name = 'Smith'
+        self.author.save()
+        serialized, response = self.serialized_books()
+        self.assertEqual([1, 2, 3], serialized)
+        self.assertEqual('Smith', response.data['results'][0]['authors'][0]['last_name'])
+
+        self.books[0].authors.add(create_author())
+        serialized, response = self.serialized_books()
+        self.assertEqual([1], serialized)
+        self.assertEqual(2, len(response.data['results'][0]['authors']))
+
+    def test_dynamic_fields(self):
+        """
+        Availability and due dates are worked out fresh around cached fragments
+        """
+        self.serialized_books()
+        leger = create_checkout_leger(book=self.books[0], return_time=None)
+
+        serialized, response = self.serialized_books()
+        self.assertEqual([], serialized)
+        book = response.data['results'][0]
+        self.assertFalse(book['is_available'])
+        self.assertNotIn('due_date', book)
+        self.assertEqual(
+            ['id', 'title', 'publish_year', 'genre', 'authors', 'is_available'], list(book))
+
+        serialized, response = self.serialized_books(self.admin_user)
+        self.assertEqual([], serialized)
+        self.assertEqual(str(leger.due_date), response.data['results'][0]['due_date'])
+        self.assertIsNone(response.data['results'][1]['due_date'])
+
+    def test_authors(self):
+        self.list(views.AuthorViewSet)
+        self.books[2].title = 'Book Title 3b'
+        self.books[2].save()
+
+        response = self.list(views.AuthorViewSet)
+        self.assertEqual(
+            ['Book Title 1', 'Book Title 2', 'Book Title 3b'],
+            [book['title'] for book in response.data['results'][0]['books']]
+        )
@@ -101,7 +101,7 @@ class GenresTest(APITestCase):
         
         response = view(request)
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(2, len(response.data))
+        self.assertEqual(2, len(response.data['results']))
         self.assertListEqual([
             {
                 'id': 1,
@@ -111,7 +111,7 @@ class GenresTest(APITestCase):
                 'id': 2,
                 'name': 'Romance'
             }],
-            response.data
+            response.data['results']
         )
     
     def test_editor_create_genre(self):
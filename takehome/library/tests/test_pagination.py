@@ -0,0 +1,176 @@
+import datetime
+import json
+from base64 import b64encode
+from urllib.parse import urlencode, urlparse
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import (
+    APIRequestFactory,
+    APITestCase,
+    force_authenticate
+)
+
+from library import views
+from .test_data_helper import (
+    create_author,
+    create_book,
+    create_checkout_leger,
+    create_default_groups,
+    create_genre,
+    create_user
+)
+
+
+class PaginationTest(APITestCase):
+
+    def setUp(self):
+        admin_group, editor_group, general_group = create_default_groups()
+        self.general_user = create_user(
+            username='general',
+            groups=[general_group]
+        )
+        self.factory = APIRequestFactory()
+
+    def get_page(self, viewset, url):
+        request = self.factory.get(url)
+        force_authenticate(request, user=self.general_user)
+        view = viewset.as_view({'get': 'list'})
+        response = view(request)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return response.data
+
+    def walk(self, viewset, url, link='next'):
+        """
+        Follow the cursor links from `url` and collect every result
+        """
+        results = []
+        while url:
+            data = self.get_page(viewset, url)
+            results.extend(data['results'])
+            url = data[link]
+            if url:
+                parsed = urlparse(url)
+                url = f'{parsed.path}?{parsed.query}'
+        return results
+
+    def test_books_page_through_duplicate_titles(self):
+        """
+        Every book is returned exactly once even when titles repeat
+        across page boundaries
+        """
+        genre = create_genre()
+        author = create_author()
+        for title in ('B', 'A', 'B', 'B', 'C', 'B', 'A'):
+            create_book(title=title, genre=genre, authors=[author])
+
+        results = self.walk(views.BookViewSet, '/books/?page_size=2')
+
+        self.assertListEqual(
+            [('A', 2), ('A', 7), ('B', 1), ('B', 3), ('B', 4), ('B', 6), ('C', 5)],
+            [(book['title'], book['id']) for book in results]
+        )
+
+    def test_books_page_backwards(self):
+        """
+        Following the previous links returns the same pages in reverse
+        """
+        genre = create_genre()
+        author = create_author()
+        for title in ('B', 'A', 'B', 'B', 'C'):
+            create_book(title=title, genre=genre, authors=[author])
+
+        data = self.get_page(views.BookViewSet, '/books/?page_size=2')
+        while data['next']:
+            parsed = urlparse(data['next'])
+            data = self.get_page(views.BookViewSet, f'{parsed.path}?{parsed.query}')
+        parsed = urlparse(data['previous'])
+        results = data['results'] + self.walk(
+            views.BookViewSet, f'{parsed.path}?{parsed.query}', link='previous')
+
+        self.assertCountEqual([1, 2, 3, 4, 5], [book['id'] for book in results])
+
+    def test_deep_pages_do_not_offset(self):
+        """
+        A page after the first one is found with a range filter on the
+        ordering columns instead of an OFFSET
+        """
+        genre = create_genre()
+        author = create_author()
+        for _ in range(5):
+            create_book(title='Same Title', genre=genre, authors=[author])
+
+        data = self.get_page(views.BookViewSet, '/books/?page_size=2')
+        parsed = urlparse(data['next'])
+        with CaptureQueriesContext(connection) as queries:
+            self.get_page(views.BookViewSet, f'{parsed.path}?{parsed.query}')
+
+        book_query, = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "library_book"')
+        ]
+        self.assertNotIn('OFFSET', book_query)
+
+    def test_invalid_cursor(self):
+        request = self.factory.get('/books/?cursor=cD0lNUIx')
+        force_authenticate(request, user=self.general_user)
+        view = views.BookViewSet.as_view({'get': 'list'})
+        response = view(request)
+
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_cursor_values_must_fit_fields(self):
+        """
+        A cursor whose values can't be compared with the ordering fields
+        is invalid, not a server error
+        """
+        create_book()
+        for position in (['abc', 'x'], [None, 1], ['A'], 'A'):
+            with self.subTest(position=position):
+                keyset = json.dumps({'ordering': ['title', 'id'], 'position': position})
+                cursor = b64encode(urlencode({'p': keyset}).encode()).decode()
+                request = self.factory.get(f'/books/?cursor={cursor}')
+                force_authenticate(request, user=self.general_user)
+                response = views.BookViewSet.as_view({'get': 'list'})(request)
+
+                self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_cursor_is_for_one_ordering(self):
+        """
+        A cursor can't be reused after changing the ordering
+        """
+        genre = create_genre()
+        author = create_author()
+        for title in ('A', 'B', 'C'):
+            create_book(title=title, genre=genre, authors=[author])
+
+        data = self.get_page(views.BookViewSet, '/books/?page_size=2')
+        parsed = urlparse(data['next'])
+        request = self.factory.get(f'{parsed.path}?{parsed.query}&ordering=publish_year')
+        force_authenticate(request, user=self.general_user)
+        response = views.BookViewSet.as_view({'get': 'list'})(request)
+
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_checkouts_page_by_due_date(self):
+        """
+        A user's checkouts are paged by due date
+        """
+        today = datetime.date.today()
+        for days in (3, 1, 3, 2):
+            create_checkout_leger(
+                user=self.general_user,
+                return_time=None,
+                due_date=today + datetime.timedelta(days=days)
+            )
+
+        results = self.walk(views.CheckoutsViewSet, '/book-checkouts/?page_size=3')
+
+        self.assertListEqual(
+            [
+                str(today + datetime.timedelta(days=days))
+                for days in (1, 2, 3, 3)
+            ],
+            [entry['due_date'] for entry in results]
+        )
@@ -0,0 +1,156 @@
+import datetime
+
+from urllib.parse import urlparse
+
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+from unittest import skipUnless
+
+from library import models, views
+from .test_data_helper import create_author, create_book, create_checkout_leger, create_user
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+class CheckoutLegerQueryPlanTest(TestCase):
+    """
+    Run `EXPLAIN QUERY PLAN` over the hot checkout leger queries and fail
+    if any of them has to scan the whole table
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        book = create_book()
+        for days in range(-3, 3):
+            create_checkout_leger(book=book, user=cls.user)
+            create_checkout_leger(
+                book=create_book(),
+                user=cls.user,
+                return_time=None,
+                due_date=datetime.date.today() + datetime.timedelta(days=days)
+            )
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        leger_steps = [
+            step for step in plan.splitlines()
+            if 'library_checkout_leger' in step
+        ]
+        self.assertTrue(leger_steps, plan)
+        for step in leger_steps:
+            self.assertIn('SEARCH', step, plan)
+        self.assertIn(f'USING INDEX {index_name}', plan)
+
+    def active(self):
+        return views.CheckoutsViewSet.queryset
+
+    def test_book_availability(self):
+        """
+        Checking whether a book is checked out, which is also what the
+        unique constraint does on every checkout
+        """
+        queryset = models.CheckoutLeger.objects.filter(
+            book_id=1,
+            return_time__isnull=True
+        )
+        self.assertUsesIndex(queryset, 'unique_active_checkout_per_book')
+
+    def test_checked_out_entry(self):
+        """
+        Finding the open leger entry of a book to return it or change its due date
+        """
+        queryset = self.active().filter(book_id=1)
+        self.assertUsesIndex(queryset, 'unique_active_checkout_per_book')
+
+    def test_users_checkouts(self):
+        """
+        A page of the user's checkouts ordered by due date
+        """
+        queryset = self.active().filter(user=self.user).order_by('due_date', 'id')
+        self.assertUsesIndex(queryset[:51], 'checkout_active_user_idx')
+        self.assertNotIn('TEMP B-TREE', queryset[:51].explain())
+
+    def test_overdue(self):
+        """
+        A page of the overdue books ordered by due date
+        """
+        queryset = self.active().filter(
+            due_date__lt=datetime.date.today()
+        ).order_by('due_date', 'id')
+        self.assertUsesIndex(queryset[:51], 'checkout_active_due_idx')
+        self.assertNotIn('TEMP B-TREE', queryset[:51].explain())
+
+    def test_available_books(self):
+        """
+        A page of the books that are on the shelf right now
+        """
+        queryset = views.BookViewSet.queryset.filter(
+            checkout_due_date__isnull=True
+        ).order_by('title', 'id')
+        plan = queryset[:51].explain()
+        # The leger is only ever probed from a correlated subquery per book
+        self.assertIn('SCAN library_book USING INDEX', plan)
+        self.assertNotIn('SCAN U0', plan)
+        self.assertIn('SEARCH U0 USING INDEX unique_active_checkout_per_book', plan)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+class CatalogFilterQueryPlanTest(TestCase):
+    """
+    Filtered and reordered catalog pages are index searches, not scans
+    followed by a sort
+    """
+
+    def assertSearchesIndex(self, queryset, index_name):
+        plan = queryset[:51].explain()
+        self.assertRegex(plan, f'USING (COVERING )?INDEX {index_name}')
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def books(self):
+        return views.BookViewSet.queryset
+
+    def test_books_of_genre(self):
+        queryset = self.books().filter(genre_id=1).order_by('title', 'id')
+        self.assertSearchesIndex(queryset, 'book_genre_title_idx')
+
+    def test_books_by_year(self):
+        queryset = self.books().filter(publish_year__gte=2000).order_by('publish_year', 'id')
+        self.assertSearchesIndex(queryset, 'book_publish_year_idx')
+        queryset = self.books().order_by('-publish_year', '-id')
+        self.assertSearchesIndex(queryset, 'book_publish_year_idx')
+
+    def page_query(self, viewset, url):
+        """
+        The paginator of `viewset.list` and the query it runs for a page of
+        `url`, filtered and ordered by its filter backends and paginator
+        """
+        view = viewset(action_map={'get': 'list'}, args=(), kwargs={}, format_kwarg=None)
+        view.request = view.initialize_request(APIRequestFactory().get(url))
+        queryset = view.filter_queryset(view.get_queryset())
+        return view.paginator, view.paginator.get_page_queryset(queryset, view.request, view)
+
+    def test_authors_by_name(self):
+        paginator, queryset = self.page_query(views.AuthorViewSet, '/authors')
+        self.assertSearchesIndex(queryset, 'author_name_idx')
+        paginator, queryset = self.page_query(views.AuthorViewSet, '/authors?last_name=Doe')
+        self.assertSearchesIndex(queryset, 'author_name_idx')
+
+    def test_authors_by_first_name(self):
+        for last_name in ('Doe', 'Roe'):
+            create_author(first_name='Jane', last_name=last_name)
+        paginator, queryset = self.page_query(views.AuthorViewSet, '/authors?first_name=Jane&page_size=1')
+        self.assertSearchesIndex(queryset, 'author_first_name_idx')
+
+        # The next page starts from a cursor
+        paginator.set_page(list(queryset))
+        next_url = urlparse(paginator.get_next_link())
+        paginator, queryset = self.page_query(views.AuthorViewSet, f'{next_url.path}?{next_url.query}')
+        self.assertSearchesIndex(queryset, 'author_first_name_idx')
+
+    def test_authors_ordered_by_first_name(self):
+        paginator, queryset = self.page_query(views.AuthorViewSet, '/authors?ordering=first_name')
+        plan = queryset[:51].explain()
+        # Read in first name order, only authors sharing one are sorted by id
+        self.assertIn('USING INDEX author_first_name_idx', plan)
+        self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
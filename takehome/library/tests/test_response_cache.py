@@ -0,0 +1,207 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from library.cache import COALESCED, HIT, MISS, STALE, SingleFlight, get_cache, get_stats
+from .test_data_helper import (
+    create_author,
+    create_book,
+    create_default_groups,
+    create_genre,
+    create_user
+)
+
+
+class ResponseCacheTest(APITestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        admin_group, editor_group, general_group = create_default_groups()
+        self.general_user = create_user(username='general', groups=[general_group])
+        self.admin_user = create_user(username='admin', groups=[admin_group])
+        self.author = create_author(first_name='Jane', last_name='Doe')
+        self.book = create_book(title='Book Title 1', authors=[self.author])
+
+    def get(self, path, user=None):
+        return self.client_for(user or self.general_user).get(path)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user=get_user_model().objects.get(pk=user.pk))
+        return client
+
+    def test_hit(self):
+        """
+        A cached author list costs the role and the versions, not the
+        authors and all of their books
+        """
+        response = self.get('/api/authors')
+        self.assertEqual('MISS', response['X-Cache'])
+
+        client = self.client_for(self.general_user)
+        with self.assertNumQueries(2):
+            cached = client.get('/api/authors')
+        self.assertEqual(status.HTTP_200_OK, cached.status_code)
+        self.assertEqual('HIT', cached['X-Cache'])
+        self.assertEqual(response.content, cached.content)
+        self.assertEqual(dict(hits=1, misses=1, coalesced=0, stale=0), get_stats())
+
+    def test_detail(self):
+        path = f'/api/books/{self.book.id}'
+        self.get(path)
+
+        response = self.get(path)
+        self.assertEqual('HIT', response['X-Cache'])
+        self.assertEqual('Book Title 1', response.data['title'])
+
+    def test_writes_invalidate(self):
+        self.get('/api/authors')
+        self.assertEqual('HIT', self.get('/api/authors')['X-Cache'])
+
+        # An author's books are part of the author list
+        self.book.title = 'Book Title 2'
+        self.book.save()
+
+        response = self.get('/api/authors')
+        self.assertEqual('MISS', response['X-Cache'])
+        self.assertEqual('Book Title 2', response.data['results'][0]['books'][0]['title'])
+
+        self.author.books.clear()
+        response = self.get('/api/authors')
+        self.assertEqual('MISS', response['X-Cache'])
+        self.assertEqual([], response.data['results'][0]['books'])
+
+    def test_unrelated_writes_keep_entries(self):
+        self.get('/api/genres')
+
+        create_author()
+        create_book(genre=self.book.genre)
+
+        self.assertEqual('HIT', self.get('/api/genres')['X-Cache'])
+
+    def test_roles_cached_apart(self):
+        """
+        Admins see due dates, so they never get a general user's copy
+        """
+        self.get('/api/books')
+
+        response = self.get('/api/books', user=self.admin_user)
+        self.assertEqual('MISS', response['X-Cache'])
+        self.assertIn('due_date', response.data['results'][0])
+
+    def test_errors_not_cached(self):
+        self.get('/api/books/999')
+
+        response = self.get('/api/books/999')
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        self.assertEqual(dict(hits=0, misses=2, coalesced=0, stale=0), get_stats())
+
+    def test_stale_response(self):
+        """
+        While a changed list is being built elsewhere, the list from before
+        the change is served with its own ETag
+        """
+        before = self.get('/api/genres')
+        create_genre()
+        # Somebody else holds the lease on the new list
+        with mock.patch.object(SingleFlight, 'lead', SingleFlight.follow):
+            response = self.get('/api/genres')
+
+        self.assertEqual('STALE', response['X-Cache'])
+        self.assertEqual(before['ETag'], response['ETag'])
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(before.data, response.data)
+
+    def test_stats(self):
+        self.get('/api/genres')
+        self.get('/api/genres')
+        self.get('/api/genres')
+
+        response = self.get('/api/cache-stats', user=self.admin_user)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(dict(hits=2, misses=1, coalesced=0, stale=0, hit_rate=0.667), response.data)
+
+        response = self.get('/api/cache-stats')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+
+class SingleFlightTest(SimpleTestCase):
+    """
+    Builds stand in for rendering a response, so the workers can be plain
+    threads without a database
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.flight = SingleFlight(wait=2, lease=10, poll=0.01)
+        self.builds = 0
+
+    def slow_build(self, value='fresh', delay=0.2):
+        def build():
+            self.builds += 1
+            time.sleep(delay)
+            return value
+        return build
+
+    def run_workers(self, count, work):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(work()))
+            for _ in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_threads_coalesce(self):
+        results = self.run_workers(8, lambda: self.flight.get('key', self.slow_build()))
+
+        self.assertEqual(1, self.builds)
+        self.assertCountEqual([MISS] + [COALESCED] * 7, [outcome for outcome, _ in results])
+        self.assertEqual({'fresh'}, {value for _, value in results})
+        self.assertEqual(dict(hits=0, misses=1, coalesced=7, stale=0), get_stats())
+        self.assertEqual((HIT, 'fresh'), self.flight.get('key', self.slow_build()))
+
+    def test_serve_stale(self):
+        """
+        Nobody waits while there's an older value to hand out
+        """
+        get_cache().set('stale', 'old')
+
+        results = self.run_workers(
+            4, lambda: self.flight.get('key', self.slow_build(), stale='stale'))
+
+        self.assertEqual(1, self.builds)
+        self.assertCountEqual(
+            [(MISS, 'fresh')] + [(STALE, 'old')] * 3, results)
+        self.assertEqual('fresh', get_cache().get('stale'))
+
+    def test_other_process_building(self):
+        """
+        A lease held elsewhere means waiting on the cache for its value
+        """
+        get_cache().add('key:lease', True)
+        threading.Timer(0.1, lambda: get_cache().set('key', 'theirs')).start()
+
+        self.assertEqual((COALESCED, 'theirs'), self.flight.get('key', self.slow_build()))
+        self.assertEqual(0, self.builds)
+
+    def test_give_up_waiting(self):
+        get_cache().add('key:lease', True)
+        flight = SingleFlight(wait=0.05, lease=10, poll=0.01)
+
+        self.assertEqual((MISS, 'fresh'), flight.get('key', self.slow_build(delay=0)))
+        self.assertEqual(1, self.builds)
+
+    def test_uncacheable(self):
+        self.assertEqual((MISS, None), self.flight.get('key', self.slow_build(None, delay=0)))
+        self.assertEqual((MISS, None), self.flight.get('key', self.slow_build(None, delay=0)))
+        self.assertEqual(2, self.builds)
+        self.assertIsNone(get_cache().get('key:lease'))
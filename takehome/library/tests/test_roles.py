@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import (
+    APIRequestFactory,
+    APITestCase,
+    force_authenticate
+)
+
+from library import roles, views
+from .test_data_helper import (
+    create_book,
+    create_checkout_leger,
+    create_default_groups,
+    create_group,
+    create_user,
+    get_permissions
+)
+
+
+class RolesTest(APITestCase):
+
+    def setUp(self):
+        self.admin_group, self.editor_group, self.general_group = create_default_groups()
+        self.factory = APIRequestFactory()
+
+    def test_resolve_general_role(self):
+        user = create_user(groups=[self.general_group])
+
+        with self.assertNumQueries(1):
+            role = roles.resolve_role(user)
+
+        self.assertEqual(roles.GENERAL, role.name)
+        self.assertFalse(role.is_admin)
+        self.assertTrue(role.has_perm('library.view_book'))
+        self.assertFalse(role.has_perm('library.add_book'))
+
+    def test_most_privileged_group_wins(self):
+        user = create_user(groups=[self.general_group, self.admin_group])
+
+        role = roles.resolve_role(user)
+
+        self.assertEqual(roles.ADMINISTRATOR, role.name)
+        self.assertTrue(role.is_admin)
+        self.assertTrue(role.has_perms(('library.delete_book', 'auth.view_user')))
+
+    def test_direct_user_permissions(self):
+        user = create_user(groups=[self.general_group])
+        user.user_permissions.set(get_permissions('add_genre'))
+
+        role = roles.resolve_role(user)
+
+        self.assertTrue(role.has_perms(('library.add_genre', 'library.view_genre')))
+
+    def test_group_without_permissions(self):
+        user = create_user(groups=[create_group(name='Visitor')])
+
+        role = roles.resolve_role(user)
+
+        self.assertEqual('Visitor', role.name)
+        self.assertEqual(frozenset(), role.permissions)
+
+    def test_superuser(self):
+        user = create_user(is_superuser=True)
+
+        with self.assertNumQueries(0):
+            role = roles.resolve_role(user)
+
+        self.assertTrue(role.is_admin)
+        self.assertTrue(role.has_perm('library.delete_genre'))
+
+    def test_inactive_user_has_no_permissions(self):
+        user = create_user(groups=[self.admin_group], is_active=False)
+
+        role = roles.resolve_role(user)
+
+        self.assertFalse(role.is_admin)
+        self.assertFalse(role.has_perm('library.view_book'))
+
+    def test_role_resolved_once_per_request(self):
+        """
+        The permission class and the view share one role lookup
+        """
+        admin_user = create_user(groups=[self.admin_group])
+        create_checkout_leger(
+            book=create_book(),
+            user=create_user(groups=[self.general_group]),
+            return_time=None
+        )
+
+        request = self.factory.delete('/book-checkouts/')
+        force_authenticate(
+            request, user=get_user_model().objects.get(pk=admin_user.pk))
+        view = views.CheckoutsViewSet.as_view({'delete': 'destroy'})
+        # role, the checkout lookup, the update and the version bump
+        with self.assertNumQueries(4):
+            response = view(request, pk=1)
+
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
@@ -0,0 +1,214 @@
+import base64
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections, router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from library import models
+from library.cache import get_cache
+from library.routers import PRIMARY, ReplicaMiddleware, ReplicaRouter, use_primary
+from .test_data_helper import create_book, create_user
+
+
+@override_settings(LIBRARY_REPLICAS=['replica_1', 'replica_2'], LIBRARY_PRIMARY_STICKY_SECONDS=10)
+class ReplicaRouterTest(SimpleTestCase):
+    """
+    Only the aliases are routed here, no query is run against the replicas
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def read_during(self, request, *read_models):
+        """
+        Send the request through the middleware and return the databases
+        the models would be read from while it's handled
+        """
+        databases = []
+
+        def view(request):
+            databases.extend(router.db_for_read(model) for model in read_models)
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        ReplicaMiddleware(view)(request)
+        return databases
+
+    def stream_during(self, request, read_model):
+        """
+        Send the request through the middleware to a view streaming three
+        chunks, and return the databases the model is read from as the
+        streamed content is consumed, after the middleware has returned
+        """
+        def chunks():
+            for _ in range(3):
+                yield router.db_for_read(read_model)
+
+        def view(request):
+            return StreamingHttpResponse(chunks())
+
+        response = ReplicaMiddleware(view)(request)
+        return [chunk.decode() for chunk in response.streaming_content]
+
+    def test_catalog_reads_go_to_a_replica(self):
+        for model in (models.Book, models.Author, models.Genre, models.CatalogVersion):
+            with self.subTest(model=model.__name__):
+                self.assertIn(self.router.db_for_read(model), ('replica_1', 'replica_2'))
+
+    def test_checkouts_and_writes_go_to_the_primary(self):
+        self.assertEqual(PRIMARY, self.router.db_for_read(models.CheckoutLeger))
+        self.assertEqual(PRIMARY, self.router.db_for_read(models.AccessToken))
+        self.assertEqual(PRIMARY, self.router.db_for_write(models.Book))
+        with use_primary():
+            self.assertEqual(PRIMARY, self.router.db_for_read(models.Book))
+
+    def test_related_reads_follow_the_instance(self):
+        book = models.Book(title='Book Title 1')
+        book._state.db = 'replica_2'
+        self.assertEqual('replica_2', self.router.db_for_read(models.Author, instance=book))
+
+    def test_one_replica_per_request(self):
+        for _ in range(10):
+            databases = self.read_during(
+                self.factory.get('/api/books'), models.Book, models.Author, models.CatalogVersion)
+            self.assertEqual(1, len(set(databases)), databases)
+
+    def test_reads_your_writes(self):
+        headers = {'HTTP_AUTHORIZATION': 'Bearer writer'}
+        self.assertEqual(
+            [PRIMARY], self.read_during(self.factory.post('/api/books', **headers), models.Book))
+        self.assertEqual(
+            [PRIMARY], self.read_during(self.factory.get('/api/books', **headers), models.Book))
+
+        # Someone else, and the writer once the window is over, read a replica
+        other = self.factory.get('/api/books', HTTP_AUTHORIZATION='Bearer reader')
+        self.assertNotEqual([PRIMARY], self.read_during(other, models.Book))
+        get_cache().clear()
+        self.assertNotEqual(
+            [PRIMARY], self.read_during(self.factory.get('/api/books', **headers), models.Book))
+
+    def test_streamed_reads_keep_the_route(self):
+        headers = {'HTTP_AUTHORIZATION': 'Bearer writer'}
+        databases = self.stream_during(self.factory.get('/api/export/books.csv', **headers), models.Book)
+        self.assertEqual(1, len(set(databases)), databases)
+        self.assertNotEqual(PRIMARY, databases[0])
+
+        self.read_during(self.factory.post('/api/books', **headers), models.Book)
+        self.assertEqual(
+            [PRIMARY] * 3,
+            self.stream_during(self.factory.get('/api/export/books.csv', **headers), models.Book)
+        )
+
+    async def test_async_streamed_reads_keep_the_route(self):
+        async def chunks():
+            for _ in range(3):
+                yield router.db_for_read(models.Book)
+
+        async def view(request):
+            return StreamingHttpResponse(chunks())
+
+        response = await ReplicaMiddleware(view)(self.factory.get('/api/export/books.csv'))
+        databases = [chunk.decode() async for chunk in response.streaming_content]
+        self.assertEqual(1, len(set(databases)), databases)
+
+    def test_failed_write_does_not_stick(self):
+        headers = {'HTTP_AUTHORIZATION': 'Bearer writer'}
+
+        def view(request):
+            return HttpResponse(status=400)
+
+        ReplicaMiddleware(view)(self.factory.post('/api/books', **headers))
+        self.assertNotEqual(
+            [PRIMARY], self.read_during(self.factory.get('/api/books', **headers), models.Book))
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica_1', 'library'))
+        self.assertIsNone(self.router.allow_migrate(PRIMARY, 'library'))
+
+    @override_settings(LIBRARY_REPLICAS=[])
+    def test_sync_without_replicas(self):
+        with self.assertRaises(CommandError):
+            call_command('sync_replicas')
+
+
+@override_settings(LIBRARY_REPLICAS=['replica_1'])
+class StaleReplicaTest(TransactionTestCase):
+    """
+    Requests against a replica copied from the primary before the test's
+    own writes, which it never catches up with
+    """
+    # Takes in the replica, which is only set up as the class is
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        connections.settings['replica_1'] = {
+            **connections.settings[PRIMARY],
+            'NAME': os.path.join(directory.name, 'replica.sqlite3'),
+        }
+        cls.addClassCleanup(cls.remove_replica)
+        super().setUpClass()
+
+    @classmethod
+    def remove_replica(cls):
+        connections['replica_1'].close()
+        del connections['replica_1']
+        del connections.settings['replica_1']
+
+    def setUp(self):
+        get_cache().clear()
+        self.admin_user = create_user(username='admin', is_superuser=True)
+        self.old_user = create_user(username='old')
+        call_command('sync_replicas', stdout=StringIO())
+
+    def basic_auth(self, username):
+        credentials = base64.b64encode(f'{username}:12345'.encode()).decode()
+        return self.client.get(reverse('library:accesstoken-list'), HTTP_AUTHORIZATION=f'Basic {credentials}')
+
+    def test_credentials_are_read_from_the_primary(self):
+        create_user(username='new')
+        get_user_model().objects.filter(pk=self.old_user.pk).update(is_active=False)
+
+        self.assertTrue(self.client.login(username='new', password='12345'))
+        self.client.logout()
+        self.assertFalse(self.client.login(username='old', password='12345'))
+        self.assertEqual(status.HTTP_200_OK, self.basic_auth('new').status_code)
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, self.basic_auth('old').status_code)
+
+    def test_user_list_reads_the_replica(self):
+        create_user(username='new')
+        self.client.force_login(self.admin_user)
+
+        response = self.client.get(reverse('library:user-list'))
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertCountEqual(
+            [self.admin_user.pk, self.old_user.pk], [user['id'] for user in response.data['results']])
+
+    def test_pinned_export_reads_the_primary(self):
+        """
+        A client that has just written streams its export from the primary,
+        however long after the view returned the rows are read
+        """
+        self.client.force_login(self.admin_user)
+        response = self.client.post(reverse('library:accesstoken-list'), {'name': 'export'})
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        book = create_book()
+
+        response = self.client.get(reverse('library:export', kwargs={'resource': 'books', 'fmt': 'ndjson'}))
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([book.pk], [json.loads(line)['id'] for line in lines])
@@ -0,0 +1,77 @@
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.models import Count, F
+from django.test import TestCase
+
+from library import models
+from library.seed import LibrarySeeder
+from .test_data_helper import create_default_groups
+
+
+class SeedLibraryCommandTest(TestCase):
+
+    def seed(self, **options):
+        defaults = dict(books=300, authors=50, genres=10, users=20, checkouts=2000, today=date(2024, 6, 1))
+        defaults.update(options)
+        call_command('seed_library', stdout=StringIO(), **defaults)
+
+    def test_sizes(self):
+        create_default_groups()
+        self.seed()
+
+        self.assertEqual(300, models.Book.objects.count())
+        self.assertEqual(50, models.Author.objects.count())
+        self.assertEqual(10, models.Genre.objects.count())
+        self.assertEqual(20, User.objects.count())
+        self.assertFalse(models.Book.objects.filter(authors=None).exists())
+        self.assertFalse(User.objects.filter(groups=None).exists())
+        # The history ends at `today`, so not every loan fits in it
+        self.assertAlmostEqual(2000, models.CheckoutLeger.objects.count(), delta=400)
+
+    def test_checkout_history(self):
+        self.seed()
+        leger = models.CheckoutLeger.objects.all()
+        open_loans = leger.filter(return_time=None)
+
+        self.assertTrue(open_loans.exists())
+        self.assertTrue(open_loans.filter(due_date__lt=date(2024, 6, 1)).exists())
+        self.assertTrue(leger.filter(return_time__date__gt=F('due_date')).exists())
+        self.assertTrue(leger.filter(return_time__date__lte=F('due_date')).exists())
+        self.assertFalse(leger.filter(return_time__lt=F('checkout_time')).exists())
+        self.assertFalse(leger.filter(checkout_time__date__gt=date(2024, 6, 1)).exists())
+        self.assertFalse(
+            open_loans.values('book').annotate(count=Count('id')).filter(count__gt=1).exists())
+
+    def test_shared_password(self):
+        self.seed(books=0, authors=0, checkouts=0, password='secret')
+
+        self.assertEqual(1, User.objects.values('password').distinct().count())
+        self.assertTrue(User.objects.first().check_password('secret'))
+
+    def test_same_seed_same_library(self):
+        def library(seed):
+            with transaction.atomic():
+                seeder = LibrarySeeder(seed, date(2024, 6, 1))
+                books = seeder.books(50, seeder.authors(10), seeder.genres(5))
+                seeder.checkouts(200, books, seeder.users(5, 'secret'))
+                rows = (
+                    list(models.Book.objects.order_by('id').values_list(
+                        'title', 'publish_year', 'genre__name')),
+                    list(models.CheckoutLeger.objects.order_by('id').values_list(
+                        'book__title', 'user__username', 'checkout_time', 'return_time', 'due_date')),
+                )
+                transaction.set_rollback(True)
+            return rows
+
+        self.assertEqual(library(1), library(1))
+        self.assertNotEqual(library(1), library(2))
+
+    def test_checkouts_need_books_and_users(self):
+        with self.assertRaises(CommandError):
+            self.seed(users=0)
+        self.assertFalse(models.Book.objects.exists())
@@ -0,0 +1,87 @@
+import json
+
+from django.db import connection
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from library.cache import get_cache
+from library.timing import server_timing
+from .test_data_helper import create_book, create_default_groups, create_user
+
+
+def parse_server_timing(header):
+    """
+    Map each metric to its duration and description
+    """
+    metrics = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        metrics[name] = (float(params['dur']), params.get('desc', '').strip('"'))
+    return metrics
+
+
+@override_settings(LIBRARY_TIMING_SAMPLE_RATE=1)
+class ServerTimingTest(APITestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        admin_group, editor_group, general_group = create_default_groups()
+        self.user = create_user(username='general', groups=[general_group])
+        create_book()
+
+    def test_phases_and_queries(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('library.timing') as logs, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('library:book-list'))
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertEqual(['auth', 'permissions', 'serialize', 'view', 'render', 'db', 'total'], list(metrics))
+        self.assertEqual(f'{len(queries)} queries', metrics['db'][1])
+        self.assertLessEqual(metrics['serialize'][0], metrics['view'][0])
+        self.assertLessEqual(metrics['view'][0], metrics['total'][0])
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual('library:book-list', line['route'])
+        self.assertEqual(200, line['status'])
+        self.assertEqual(len(queries), line['queries'])
+        self.assertEqual(round(metrics['total'][0], 1), round(line['total_ms'], 1))
+
+    def test_turned_away(self):
+        with self.assertLogs('library.timing'):
+            response = self.client.get(reverse('library:book-list'))
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertIn('permissions', metrics)
+        self.assertNotIn('view', metrics)
+
+    @override_settings(LIBRARY_TIMING_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        self.client.force_login(self.user)
+        with self.assertNoLogs('library.timing'):
+            response = self.client.get(reverse('library:book-list'))
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    async def test_async_view(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        with self.assertLogs('library.timing'):
+            response = await client.get(reverse('library:async-book-list'))
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertEqual(['auth', 'permissions', 'serialize', 'view', 'render', 'db', 'total'], list(metrics))
+        self.assertNotEqual('0 queries', metrics['db'][1])
+
+    def test_header(self):
+        self.assertEqual(
+            'auth;dur=0.8, db;dur=6.4;desc="5 queries", total;dur=14.2',
+            server_timing({'auth': 0.81, 'db': 6.44, 'total': 14.2}, 5)
+        )
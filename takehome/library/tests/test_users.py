@@ -1,3 +1,5 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
 from rest_framework import status
 from rest_framework.test import (
     APIRequestFactory,
@@ -152,5 +154,54 @@ class UsersTest(APITestCase):
                 'role': 'Administrator',
                 'books': []
             }],
-            response.data
+            response.data['results']
         )
+
+    def test_list_users_query_count(self):
+        """
+        The user report costs the same number of queries however many users
+        and loans there are, and returned loans are left out
+        """
+        for _ in range(3):
+            create_checkout_leger(user=self.general_user)
+            create_checkout_leger(user=self.editor_user, return_time=None)
+        for _ in range(5):
+            create_checkout_leger(
+                user=create_user(groups=list(self.general_user.groups.all())),
+                return_time=None
+            )
+
+        request = self.factory.get('/users/')
+        force_authenticate(
+            request, user=get_user_model().objects.get(pk=self.admin_user.pk))
+        view = views.UserViewSet.as_view({'get': 'list'})
+        with self.assertNumQueries(3):
+            response = view(request)
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        books = {user['id']: user['books'] for user in response.data['results']}
+        self.assertEqual(8, len(books))
+        self.assertEqual([], books[self.general_user.pk])
+        self.assertEqual(3, len(books[self.editor_user.pk]))
+
+    def test_role_is_most_privileged_group(self):
+        """
+        A user in several groups is listed with the most privileged one,
+        whichever was created first
+        """
+        Group.objects.all().delete()
+        general_group = create_group(name='General')
+        editor_group = create_group(name='Editor')
+        admin_group = create_group(name='Administrator')
+        editor = create_user(groups=[general_group, editor_group])
+        admin = create_user(groups=[general_group, editor_group, admin_group])
+
+        request = self.factory.get('/users/')
+        force_authenticate(request, user=create_user(is_superuser=True))
+        view = views.UserViewSet.as_view({'get': 'list'})
+        response = view(request)
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        roles = {user['id']: user['role'] for user in response.data['results']}
+        self.assertEqual('Editor', roles[editor.pk])
+        self.assertEqual('Administrator', roles[admin.pk])
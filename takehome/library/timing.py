@@ -0,0 +1,160 @@
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger('library.timing')
+
+'''
+The timer of the request being handled, None unless it was sampled. A
+context variable follows the request onto the worker thread a sync view
+runs on under ASGI.
+'''
+_timer = ContextVar('library_timer', default=None)
+
+
+class RequestTimer:
+    """
+    How long each phase of a request took, and how many queries it ran
+    and for how long. Phases add up when they happen more than once, e.g.
+    permissions checked for the view and then for an object.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.queries = 0
+        self.sql = 0.0
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def metrics(self):
+        """
+        Every timing in milliseconds, the phases first, then the queries and
+        the whole request
+        """
+        metrics = {name: seconds * 1000 for name, seconds in self.phases.items()}
+        metrics['db'] = self.sql * 1000
+        metrics['total'] = (time.perf_counter() - self.start) * 1000
+        return metrics
+
+
+def get_timer():
+    return _timer.get()
+
+
+def phase(name):
+    """
+    Time a phase of the request, if it's sampled
+    """
+    timer = _timer.get()
+    return nullcontext() if timer is None else timer.phase(name)
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    A database execute wrapper counting the queries of sampled requests
+    and the time spent in them. It's installed on every connection, and
+    costs a context variable lookup for the rest.
+    """
+    timer = _timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.queries += 1
+        timer.sql += time.perf_counter() - start
+
+
+def server_timing(metrics, queries):
+    """
+    The `Server-Timing` header value, e.g.
+    `auth;dur=0.8, view;dur=12.1, db;dur=6.4;desc="5 queries", total;dur=14.2`
+    """
+    entries = []
+    for name, milliseconds in metrics.items():
+        entry = f'{name};dur={milliseconds:.1f}'
+        if name == 'db':
+            entry += f';desc="{queries} queries"'
+        entries.append(entry)
+    return ', '.join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Time a sample of the requests, `LIBRARY_TIMING_SAMPLE_RATE` of them,
+    and send the timings back in a `Server-Timing` header, which browser
+    dev tools show alongside the request. Each is also logged to
+    `library.timing` as one JSON line.
+
+    The middleware only times the request as a whole and its queries, the
+    views time their own phases (see `TimingMixin`). Requests that aren't
+    sampled cost one random number. A streamed response is timed until its
+    first byte.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        timer = RequestTimer()
+        token = _timer.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            _timer.reset(token)
+        self.report(request, response, timer)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        timer = RequestTimer()
+        token = _timer.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timer.reset(token)
+        self.report(request, response, timer)
+        return response
+
+    def sampled(self):
+        rate = getattr(settings, 'LIBRARY_TIMING_SAMPLE_RATE', 0)
+        return rate > 0 and random.random() < rate
+
+    def report(self, request, response, timer):
+        metrics = timer.metrics()
+        response['Server-Timing'] = server_timing(metrics, timer.queries)
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'route': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': timer.queries,
+            **{f'{name}_ms': round(milliseconds, 3) for name, milliseconds in metrics.items()},
+        }))
@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def write_atomic(using=DEFAULT_DB_ALIAS):
+    """
+    An atomic block for a transaction that reads before it writes.
+
+    SQLite starts transactions deferred, so read-only blocks never take the
+    write lock. A deferred transaction that has read and then tries to write
+    can't wait for the lock, though: if another connection wrote meanwhile
+    its snapshot is stale, and SQLite fails it with `database is locked`
+    straight away instead of waiting out the busy timeout. This block takes
+    the write lock as it begins, with `BEGIN IMMEDIATE`, so it waits its
+    turn instead. Nested in another atomic block it's a plain savepoint.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    connection.ensure_connection()
+    mode = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            # BEGIN has run, later transactions go back to the default
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
@@ -1,4 +1,4 @@
-from . import views
+from . import async_views, views
 
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
@@ -10,8 +10,18 @@ router.register(r'book-checkouts', views.CheckoutsViewSet)
 router.register(r'authors', views.AuthorViewSet)
 router.register(r'genres', views.GenreViewSet)
 router.register(r'users', views.UserViewSet)
+router.register(r'auth-tokens', views.AccessTokenViewSet)
 
 app_name = 'library'
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('export/<str:resource>.<str:fmt>', views.ExportView.as_view(), name='export'),
+    path('cache-stats', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('async/books', async_views.AsyncBookView.as_view(), name='async-book-list'),
+    path('async/books/<int:pk>', async_views.AsyncBookView.as_view(), name='async-book-detail'),
+    path('async/authors', async_views.AsyncAuthorView.as_view(), name='async-author-list'),
+    path('async/authors/<int:pk>', async_views.AsyncAuthorView.as_view(), name='async-author-detail'),
+    path('async/genres', async_views.AsyncGenreView.as_view(), name='async-genre-list'),
+    path('async/genres/<int:pk>', async_views.AsyncGenreView.as_view(), name='async-genre-detail'),
+    path('async/book-checkouts', async_views.AsyncCheckoutsView.as_view(), name='async-checkout-list'),
 ]
@@ -0,0 +1,39 @@
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CatalogVersion
+
+'''
+The catalog tables with a change counter
+'''
+BOOK = 'book'
+AUTHOR = 'author'
+GENRE = 'genre'
+CHECKOUT = 'checkout'
+
+
+def bump(*resources):
+    """
+    Count a change to each of the tables. Do it in the transaction making
+    the change, so readers see the new rows and the new versions together.
+    """
+    now = timezone.now()
+    updated = CatalogVersion.objects.filter(resource__in=resources).update(
+        version=F('version') + 1, changed_at=now)
+    if updated < len(set(resources)):
+        # The counters are gone, e.g. after a flush, so start them over
+        CatalogVersion.objects.bulk_create([
+            CatalogVersion(resource=resource, version=1, changed_at=now)
+            for resource in resources
+        ], ignore_conflicts=True)
+
+
+def get_versions(resources):
+    """
+    Map each of the tables to its `(version, changed_at)`
+    """
+    return {
+        resource: (version, changed_at)
+        for resource, version, changed_at in CatalogVersion.objects.filter(
+            resource__in=resources).values_list('resource', 'version', 'changed_at')
+    }
@@ -1,19 +1,81 @@
 from datetime import date, timedelta
 
+from django.contrib.auth.models import Group
+from django.db import IntegrityError
+from django.db.models import Exists, OuterRef, Prefetch, Subquery
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import viewsets, mixins, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from .authentication import generate_key, hash_key
+from .cache import get_stats
+from .export import CONTENT_TYPES, FORMATS, RESOURCES, export
+from .filters import AuthorFilter, BookFilter, get_int_param
+from .ingest import ingest_books
+from .mixins import CachedResponseMixin, RoleMixin, TimingMixin
+from .pagination import *
+from .search import BookSearch
 from .permissions import *
+from .roles import role_precedence
+from .routers import read_database
 from .serializers import *
+from .streaming import json_array_stream
+from .transactions import write_atomic
+from .versions import AUTHOR, BOOK, CHECKOUT, GENRE, bump
 from .models import *
 
 
-class BookViewSet(viewsets.ModelViewSet):
+OVERDUE_FIELDS = (
+    'id',
+    'due_date',
+    'book_id',
+    'book__title',
+    'user_id',
+    'user__first_name',
+    'user__last_name'
+)
+
+# A hundred years, further back than any loan and well within what a date can hold
+MAX_OVERDUE_DAYS = 36500
+
+
+def overdue_entry(row):
+    """
+    Shape a leger row projected with `OVERDUE_FIELDS` like `CheckoutsSerializer`
+    """
+    return dict(
+        book_id=row['book_id'],
+        book_title=row['book__title'],
+        due_date=row['due_date'].isoformat(),
+        user=dict(
+            id=row['user_id'],
+            first_name=row['user__first_name'],
+            last_name=row['user__last_name']
+        )
+    )
+
+
+class BookViewSet(TimingMixin, RoleMixin, CachedResponseMixin, viewsets.ModelViewSet):
     
-    queryset = Book.objects.all()
+    queryset = Book.objects.select_related('genre').prefetch_related('authors').annotate(
+        checkout_due_date=Subquery(
+            CheckoutLeger.objects.filter(
+                book=OuterRef('pk'),
+                return_time__isnull=True
+            ).values('due_date')[:1]
+        )
+    )
     permission_classes = (IsAuthenticated, BookPermissions)
+    pagination_class = BookPagination
+    filter_backends = (BookFilter, OrderingFilter)
+    ordering_fields = ('title', 'publish_year')
+    catalog_resources = (BOOK, AUTHOR, GENRE, CHECKOUT)
     
     def get_serializer_class(self):
         if self.action in ('create', 'update', 'destroy', 'partial_update'):
@@ -23,22 +85,117 @@ class BookViewSet(viewsets.ModelViewSet):
     @action(methods=['POST'], detail=True)
     def checkout(self, request, pk, *args, **kwargs):
         """
-        Checkout a book only if it's available, i.e. not already checkout out
+        Checkout a book only if it's available, i.e. not already checkout out.
+        The leger only allows one unreturned entry per book, so the insert
+        itself is the availability check and two requests can't both win.
+        The write lock is taken first, so the checkout is stamped after the
+        return it may have waited for.
         """
-        book_is_available = not CheckoutLeger.objects.filter(
-            book_id=pk,
-            return_time__isnull=True).exists()
-        if book_is_available:
-            CheckoutLeger.objects.create(user=request.user, book_id=pk)
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        else:
+        try:
+            with write_atomic():
+                CheckoutLeger.objects.create(user=request.user, book_id=pk)
+        except IntegrityError:
+            if not Book.objects.filter(pk=pk).exists():
+                return Response(status=status.HTTP_404_NOT_FOUND)
             return Response(
                 data='This book is currently checked out',
-                status=status.HTTP_400_BAD_REQUEST
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(methods=['POST'], detail=False, url_path='checkout')
+    def bulk_checkout(self, request, *args, **kwargs):
+        """
+        Checkout a batch of books at once, e.g. a stack at a self-checkout
+        station, and report what happened to each of them
+        """
+        serializer = BookIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        book_ids = serializer.validated_data['books']
+        
+        with write_atomic():
+            books = dict(Book.objects.filter(pk__in=book_ids).annotate(
+                checked_out=Exists(CheckoutLeger.objects.filter(
+                    book=OuterRef('pk'),
+                    return_time__isnull=True
+                ))
+            ).values_list('id', 'checked_out'))
+            available = [
+                book_id for book_id, checked_out in books.items() if not checked_out]
+            # Anything checked out since the read above is skipped by the
+            # constraint rather than failing the whole batch
+            CheckoutLeger.objects.bulk_create(
+                [CheckoutLeger(user=request.user, book_id=book_id) for book_id in available],
+                ignore_conflicts=True
             )
+            if available:
+                bump(CHECKOUT)
+            checked_out = set(CheckoutLeger.objects.filter(
+                book_id__in=available,
+                user=request.user,
+                return_time__isnull=True
+            ).values_list('book_id', flat=True))
+        
+        results = []
+        for book_id in book_ids:
+            if book_id not in books:
+                result = 'not_found'
+            elif book_id in checked_out:
+                result = 'checked_out'
+            else:
+                result = 'conflict'
+            results.append(dict(book_id=book_id, status=result))
+        return Response(data=results)
+    
+    @action(methods=['GET'], detail=False)
+    def search(self, request, *args, **kwargs):
+        """
+        Find books by words from their title or author names, best match
+        first. Every word matches as a prefix, so `?q=hobb tolk` will do.
+        """
+        search = BookSearch(request.query_params.get('q', ''))
+        if not search:
+            raise ValidationError({'q': 'Give at least one word to search for.'})
+        paginator = SearchPagination()
+        book_ids = paginator.paginate_queryset(search, request, view=self)
+        books = self.get_queryset().in_bulk(book_ids)
+        serializer = self.get_serializer(
+            [books[book_id] for book_id in book_ids if book_id in books], many=True)
+        return paginator.get_paginated_response(serializer.data)
     
+    @action(methods=['POST'], detail=False)
+    def ingest(self, request, *args, **kwargs):
+        """
+        Add a whole shipment of books in one go, creating any authors and
+        genres that don't exist yet. Each record gets back either the id of
+        its new book or the reasons it was rejected.
+        """
+        serializer = IngestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = []
+        records = []
+        for index, data in enumerate(serializer.validated_data['books']):
+            record = IngestBookSerializer(data=data)
+            if record.is_valid():
+                records.append(record.validated_data)
+                results.append(dict(index=index))
+            else:
+                results.append(dict(index=index, errors=record.errors))
+        
+        books = iter(ingest_books(records) if records else [])
+        for result in results:
+            if 'errors' not in result:
+                result['id'] = next(books).id
+        return Response(
+            data=dict(created=len(records), results=results),
+            status=status.HTTP_201_CREATED if records else status.HTTP_400_BAD_REQUEST
+        )
     
-class CheckoutsViewSet(mixins.ListModelMixin,
+    
+class CheckoutsViewSet(TimingMixin,
+                       RoleMixin,
+                       mixins.ListModelMixin,
                        mixins.RetrieveModelMixin,
                        mixins.UpdateModelMixin,
                        mixins.DestroyModelMixin,
@@ -48,6 +205,7 @@ class CheckoutsViewSet(mixins.ListModelMixin,
         return_time__isnull=True)
     serializer_class = CheckoutsSerializer
     permission_classes = (IsAuthenticated, CheckoutPermissions)
+    pagination_class = CheckoutPagination
 
     def retrieve(self, request, pk, *args, **kwargs):
         """
@@ -55,7 +213,7 @@ class CheckoutsViewSet(mixins.ListModelMixin,
         if you're an admin
         """
         user = request.user
-        is_admin = user.groups.filter(name='Administrator').exists()
+        is_admin = self.role.is_admin
         checkout_entry = self.get_queryset().filter(book_id=pk).first()
         if checkout_entry is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
@@ -78,6 +236,8 @@ class CheckoutsViewSet(mixins.ListModelMixin,
         """
         Return a list of the users checked out books
         """
+        page = self.paginate_queryset(
+            self.get_queryset().filter(user=request.user))
         entries = [
             dict(
                 book_id=leger.book.id,
@@ -88,17 +248,15 @@ class CheckoutsViewSet(mixins.ListModelMixin,
                     first_name=leger.user.first_name,
                     last_name=leger.user.last_name
                 )
-            ) for leger in self.get_queryset().filter(user=request.user)]
+            ) for leger in page]
         serializer = self.get_serializer(entries, many=True)
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
     def partial_update(self, request, pk, *args, **kwargs):
         """
         Update a checked out book's due date if you're the admin
         """
-        user = request.user
-        is_admin = user.groups.filter(name='Administrator').exists()
-        if is_admin:
+        if self.role.is_admin:
             checkout_entry = self.get_queryset().filter(book_id=pk).first()
             serializer = self.get_serializer(
                 checkout_entry, data=request.data, partial=True)
@@ -117,7 +275,7 @@ class CheckoutsViewSet(mixins.ListModelMixin,
         admin that needs to change the status to returned
         """
         user = request.user
-        is_admin = user.groups.filter(name='Administrator').exists()
+        is_admin = self.role.is_admin
         checkout_entry = self.get_queryset().filter(book_id=pk).first()
         if checkout_entry is None:
             return Response(
@@ -126,7 +284,7 @@ class CheckoutsViewSet(mixins.ListModelMixin,
             )
         else:
             if is_admin or checkout_entry.user == user:
-                checkout_entry.return_time = datetime.utcnow()
+                checkout_entry.return_time = timezone.now()
                 checkout_entry.save()
                 return Response(status=status.HTTP_204_NO_CONTENT)
             else:
@@ -135,37 +293,75 @@ class CheckoutsViewSet(mixins.ListModelMixin,
                     status=status.HTTP_403_FORBIDDEN
                 )
 
+    @action(methods=['POST'], detail=False, url_path='return')
+    def bulk_return(self, request, *args, **kwargs):
+        """
+        Return a batch of books at once. Like returning a single book, you
+        can only return the ones you checked out unless you're an admin
+        """
+        serializer = BookIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        book_ids = serializer.validated_data['books']
+        is_admin = self.role.is_admin
+        
+        with write_atomic():
+            borrowers = dict(self.get_queryset().filter(
+                book_id__in=book_ids).values_list('book_id', 'user_id'))
+            returnable = [
+                book_id for book_id, user_id in borrowers.items()
+                if is_admin or user_id == request.user.pk
+            ]
+            entries = self.get_queryset().filter(book_id__in=returnable)
+            if not is_admin:
+                entries = entries.filter(user=request.user)
+            if entries.update(return_time=timezone.now()):
+                bump(CHECKOUT)
+        
+        results = []
+        for book_id in book_ids:
+            if book_id not in borrowers:
+                result = 'not_checked_out'
+            elif book_id in returnable:
+                result = 'returned'
+            else:
+                result = 'forbidden'
+            results.append(dict(book_id=book_id, status=result))
+        return Response(data=results)
+
     @action(methods=['GET'], detail=False)
     def overdue(self, request, *args, **kwargs):
         """
-        Only as an admin, list all overdue books
+        Only as an admin, list all overdue books. Optionally only the ones
+        more than `older_than_days` overdue or checked out by `user`, and
+        with `stream=true` the whole report at once instead of a page.
         """
-        user = request.user
-        is_admin = user.groups.filter(name='Administrator').exists()
-        if not is_admin:
+        if not self.role.is_admin:
             return Response(status=status.HTTP_403_FORBIDDEN)
-        now = datetime.utcnow()
-        leger_entries = self.get_queryset().filter(due_date__lt=now)
-        raw_data = [
-            dict(
-                book_id=entry.book.id,
-                book_title=entry.book.title,
-                due_date=entry.due_date,
-                user=dict(
-                    id=entry.user.id,
-                    first_name=entry.user.first_name,
-                    last_name=entry.user.last_name
-                )
-            ) for entry in leger_entries]
-        serializer = self.get_serializer(data=raw_data, many=True)
-        serializer.is_valid()
-        return Response(data=serializer.data)
+        cutoff = timezone.now().date() - timedelta(
+            days=get_int_param(request, 'older_than_days', default=0, maximum=MAX_OVERDUE_DAYS))
+        leger_entries = self.get_queryset().filter(due_date__lt=cutoff)
+        if 'user' in request.query_params:
+            leger_entries = leger_entries.filter(user_id=get_int_param(request, 'user'))
+        rows = leger_entries.values(*OVERDUE_FIELDS)
+        
+        if request.query_params.get('stream') == 'true':
+            entries = map(overdue_entry, rows.order_by('due_date', 'id').iterator(chunk_size=2000))
+            return StreamingHttpResponse(
+                json_array_stream(entries),
+                content_type='application/json'
+            )
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response([overdue_entry(row) for row in page])
 
 
-class AuthorViewSet(viewsets.ModelViewSet):
+class AuthorViewSet(TimingMixin, RoleMixin, CachedResponseMixin, viewsets.ModelViewSet):
     
-    queryset = Author.objects.all()
+    queryset = Author.objects.prefetch_related('books')
     permission_classes = (IsAuthenticated, AuthorPermissions)
+    pagination_class = AuthorPagination
+    filter_backends = (AuthorFilter, OrderingFilter)
+    ordering_fields = ('last_name', 'first_name')
+    catalog_resources = (AUTHOR, BOOK)
     
     def get_serializer_class(self):
         if self.action in ('create', 'update', 'destroy', 'partial_update'):
@@ -173,7 +369,11 @@ class AuthorViewSet(viewsets.ModelViewSet):
         return AuthorSerializer
 
 
-class GenreViewSet(mixins.ListModelMixin,
+class GenreViewSet(TimingMixin,
+                   RoleMixin,
+                   CachedResponseMixin,
+                   mixins.ListModelMixin,
+                   mixins.RetrieveModelMixin,
                    mixins.CreateModelMixin,
                    mixins.DestroyModelMixin,
                    viewsets.GenericViewSet):
@@ -181,14 +381,107 @@ class GenreViewSet(mixins.ListModelMixin,
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = (IsAuthenticated, GenrePermissions)
+    catalog_resources = (GENRE,)
 
 
-class UserViewSet(mixins.ListModelMixin,
+class UserViewSet(TimingMixin,
+                  RoleMixin,
+                  mixins.ListModelMixin,
                   viewsets.GenericViewSet):
     
-    queryset = User.objects.all().prefetch_related(
-        'checkout_leger',
-        'checkout_leger__book'
+    queryset = User.objects.annotate(
+        role=Subquery(
+            Group.objects.filter(user=OuterRef('pk')).order_by(
+                role_precedence(), 'pk').values('name')[:1]
+        )
+    ).prefetch_related(
+        Prefetch(
+            'checkout_leger',
+            queryset=CheckoutLeger.objects.filter(
+                return_time__isnull=True,
+                book__isnull=False
+            ).select_related('book').only(
+                'user', 'book', 'book__title'
+            ).order_by('id'),
+            to_attr='active_checkouts'
+        )
     )
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticated, UserPermissions)
+    
+    def get_queryset(self):
+        # Users are read from the primary everywhere else, so logging in
+        # never sees an old copy, but the list can be a little behind
+        return super().get_queryset().using(read_database())
+
+
+class AccessTokenViewSet(TimingMixin,
+                         RoleMixin,
+                         mixins.ListModelMixin,
+                         mixins.CreateModelMixin,
+                         mixins.DestroyModelMixin,
+                         viewsets.GenericViewSet):
+    """
+    Issue and revoke bearer tokens. Everyone manages their own tokens and
+    an admin can revoke anybody's
+    """
+    
+    queryset = AccessToken.objects.all()
+    serializer_class = AccessTokenSerializer
+    permission_classes = (IsAuthenticated,)
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'destroy' and self.role.is_admin:
+            return queryset
+        return queryset.filter(user=self.request.user)
+    
+    def create(self, request, *args, **kwargs):
+        """
+        Create a token for the requesting user. The key is only ever
+        returned in this response
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        key = generate_key()
+        serializer.save(user=request.user, digest=hash_key(key))
+        return Response(
+            data=dict(serializer.data, token=key),
+            status=status.HTTP_201_CREATED
+        )
+
+
+class ExportView(TimingMixin, APIView):
+    """
+    Stream a whole table as NDJSON or CSV, e.g. `/export/books.ndjson`
+    """
+    
+    permission_classes = (IsAuthenticated, ExportPermissions)
+    
+    def get(self, request, resource, fmt, *args, **kwargs):
+        if resource not in RESOURCES or fmt not in FORMATS:
+            raise Http404
+        response = StreamingHttpResponse(
+            export(resource, fmt),
+            content_type=CONTENT_TYPES[fmt]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{fmt}"'
+        return response
+
+
+class CacheStatsView(TimingMixin, RoleMixin, APIView):
+    """
+    Only as an admin, see how often catalog responses come from the cache
+    """
+    
+    def get(self, request, *args, **kwargs):
+        if not self.role.is_admin:
+            return Response(status=status.HTTP_403_FORBIDDEN)
+        stats = get_stats()
+        # Waiting on another worker's build or getting an older response
+        # spares the database just as much as a hit
+        lookups = sum(stats.values())
+        return Response(data=dict(
+            stats,
+            hit_rate=round((lookups - stats['misses']) / lookups, 3) if lookups else None
+        ))
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,11 +45,13 @@ INSTALLED_APPS = [
 ] + APPS
 
 MIDDLEWARE = [
+    'library.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'library.routers.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,6 +87,55 @@ DATABASES = {
     }
 }
 
+# Settings layered over the default database, picked with LIBRARY_DB_PROFILE.
+# `production` keeps each worker's connection open between requests, and
+# switches SQLite to write ahead logging so readers never wait on a writer.
+# With WAL, `synchronous=NORMAL` can only lose the last transactions on a
+# power cut, never corrupt the database. Transactions stay deferred, so a
+# long read-only one (e.g. a report) never holds up writers; the ones that
+# read before they write use `library.transactions.write_atomic` to take the
+# write lock up front instead of failing on a lock upgrade midway.
+DATABASE_PROFILES = {
+    'development': {
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'OPTIONS': {},
+    },
+    'production': {
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'init_command': ';'.join((
+                'PRAGMA journal_mode=WAL',
+                'PRAGMA synchronous=NORMAL',
+                'PRAGMA cache_size=-20000',
+                'PRAGMA mmap_size=134217728',
+                'PRAGMA temp_store=MEMORY',
+            )),
+        },
+    },
+}
+LIBRARY_DB_PROFILE = os.environ.get('LIBRARY_DB_PROFILE', 'development')
+DATABASES['default'].update(DATABASE_PROFILES[LIBRARY_DB_PROFILE])
+
+# Catalog reads go to the replicas, when there are any. To try it locally
+# give a comma separated list of SQLite files and fill them from the
+# primary with `manage.py sync_replicas`.
+LIBRARY_REPLICAS = []
+for index, name in enumerate(filter(None, os.environ.get('LIBRARY_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    LIBRARY_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['library.routers.ReplicaRouter']
+
+# How long a client's reads stay on the primary after it writes
+LIBRARY_PRIMARY_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -133,10 +185,60 @@ LOGOUT_REDIRECT_URL = '/api-auth/login'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.BasicAuthentication',
+        'library.authentication.BearerTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
+        # Only meant for fetching a token, every request with it runs a full password hash
+        'rest_framework.authentication.BasicAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'library.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+}
+
+# Verified bearer tokens are cached in each process; a revoked token keeps
+# working in other processes for at most ACCESS_TOKEN_CACHE_TTL seconds
+ACCESS_TOKEN_CACHE_SIZE = 10000
+ACCESS_TOKEN_CACHE_TTL = 60
+
+# Catalog responses are cached in LIBRARY_CACHE, in process memory unless
+# LIBRARY_CACHE_DIR points the cache at a directory shared by every process
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'library',
+    },
+}
+if os.environ.get('LIBRARY_CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['LIBRARY_CACHE_DIR'],
+    }
+LIBRARY_CACHE = 'default'
+LIBRARY_CACHE_TIMEOUT = 300
+# While one worker builds a missing response the others get the one from
+# before the latest change (kept for LIBRARY_STALE_TIMEOUT), or wait up to
+# LIBRARY_CACHE_WAIT seconds for it. A worker that dies while building
+# holds up the other processes for at most LIBRARY_CACHE_LEASE seconds.
+LIBRARY_STALE_TIMEOUT = 60 * 60
+LIBRARY_CACHE_WAIT = 2
+LIBRARY_CACHE_LEASE = 10
+# Fragments are keyed by the versions of the rows they're built from, so
+# they never go stale and only expire to make room
+LIBRARY_FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# ServerTimingMiddleware times this share of requests, e.g. 0.01 for one in
+# a hundred, and adds a Server-Timing header and a library.timing log line
+LIBRARY_TIMING_SAMPLE_RATE = float(os.environ.get('LIBRARY_TIMING_SAMPLE_RATE', '0'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'library.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
 }